@@ -0,0 +1,331 @@
+"""
+End-to-end benchmark of AgentManager.run_all_agents against local stand-in marketplaces and an SMTP sink
+(see benchmarks/standins.py). Needs no network; Carfax, AutoNation and any blocked fast-path search still
+start Chromium, so `playwright install chromium` first or leave those out with --sources.
+
+    python -m benchmarks.e2e --runs 3 --listings 20 --latency-ms 50 --block-rate 0.05 --output e2e.json
+    python -m benchmarks.e2e --compare e2e.json --max-regression 0.15
+    python -m benchmarks.e2e --sources cars_com,bringatrailer,marketcheck --database-url postgresql+asyncpg://.../bench
+
+Every run uses the same database, so run 1 stores everything it finds (cold) and later runs mostly dedupe,
+storing only the share of each page the stand-ins churned in between (warm). Each run reports wall time,
+CPU, peak RSS, browser launches, DB round trips, and emails and SMTP connections made to the sink.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import structlog
+from prometheus_client import REGISTRY
+from sqlalchemy import event, select
+
+from benchmarks.micro import _git_commit, _result, compare
+from benchmarks.standins import MarketplaceConfig, SmtpSink, StandInMarketplaces
+from src.core.agent_manager import AgentManager
+from src.core.config_watcher import disable_agents, upsert_agents
+from src.storage.database import Agent, get_session_factory, init_db
+from src.utils.config import AgentConfig, AppSettings, load_agents_from_yaml
+from src.utils.tracing import setup_tracing, shutdown_tracing
+
+
+def _metric_total(name: str, **labels) -> float:
+    """Sum of a metric's samples across label sets (optionally restricted to `labels`)."""
+    total = 0.0
+    for family in REGISTRY.collect():
+        for sample in family.samples:
+            if sample.name == name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                total += sample.value
+    return total
+
+
+class _RssSampler:
+    """Peak resident set size over a block, sampled from /proc; falls back to the process high-water mark."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self) -> Optional[int]:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss() or 0)
+
+    def __enter__(self):
+        if self._rss() is not None:
+            self.peak = self._rss()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self.peak = max(self.peak, self._rss() or 0)
+        else:
+            # ru_maxrss: kilobytes on Linux, bytes on macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class _RoundTrips:
+    """Counts statements and commits sent to the database."""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._on_statement)
+        event.listen(sync_engine, "commit", self._on_commit)
+
+    def _on_statement(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    @property
+    def total(self) -> int:
+        return self.statements + self.commits
+
+
+def _select_agents(args) -> List[AgentConfig]:
+    agents = [a for a in load_agents_from_yaml(args.config) if a.enabled]
+    if args.agent:
+        agents = [a for a in agents if a.id in args.agent]
+    sources = [s for s in (args.sources or "").split(",") if s]
+    for agent in agents:
+        if sources:
+            agent.sources = [s for s in agent.sources if s in sources] or sources
+        if args.vehicles and agent.parameters.vehicles:
+            agent.parameters.vehicles = agent.parameters.vehicles[:args.vehicles]
+    return agents
+
+
+def _settings(args, database_url: str, smtp_host: str, smtp_port: int) -> AppSettings:
+    return AppSettings(
+        DATABASE_URL=database_url,
+        GMAIL_USER="bench@example.com",
+        GMAIL_APP_PASSWORD="bench",
+        SMTP_HOST=smtp_host,
+        SMTP_PORT=smtp_port,
+        SMTP_MAX_PER_MINUTE=0,
+        DIGEST_WINDOW="immediate", # Deliver each run's alerts when it is drained, not at the next window
+        MARKETCHECK_API_KEY="bench",
+        SCRAPE_DELAY_SECONDS=args.delay,
+        HTTP_FAST_PATH=not args.no_fast_path,
+        MAX_CONCURRENT_AGENT_RUNS=args.concurrent_agents,
+        RUN_TIME_BUDGET_MINUTES=0,
+        ADAPTIVE_POLLING=False,
+        SCRAPER_PROCESSES=0, # Providers must run in this process to be pointed at the stand-ins
+        PROVIDER_FIXTURES_MODE="off",
+        TRACING_EXPORTER="file" if args.trace else "off",
+        TRACING_FILE=args.trace or "",
+    )
+
+
+async def _prepare_agents(session_factory, agents: List[AgentConfig]):
+    """Stores the benchmark agents and disables every other agent, so run_all_agents runs exactly these."""
+    await upsert_agents(session_factory, agents)
+    async with session_factory() as session:
+        others = (await session.execute(select(Agent.id).where(Agent.enabled == True))).scalars().all()
+    await disable_agents(session_factory, [a for a in others if a not in {cfg.id for cfg in agents}])
+
+
+async def bench_run_all_agents(args, agents: List[AgentConfig], database_url: str) -> List[Dict]:
+    vehicles = []
+    for agent in agents:
+        for v in agent.parameters.vehicles:
+            if (v.make, v.model, v.year_min) not in vehicles:
+                vehicles.append((v.make, v.model, v.year_min))
+
+    config = MarketplaceConfig(
+        listings=args.listings,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        block_rate=args.block_rate,
+        churn=args.churn,
+        seed=args.seed,
+    )
+    engine = await init_db(database_url)
+    round_trips = _RoundTrips(engine)
+    session_factory = get_session_factory(engine)
+    runs = []
+    try:
+        with StandInMarketplaces(config, vehicles) as sites, SmtpSink() as smtp:
+            await _prepare_agents(session_factory, agents)
+            settings = _settings(args, database_url, *smtp.address)
+            setup_tracing(settings, "luxelink-e2e-benchmark")
+            manager = AgentManager(session_factory, settings, agents)
+            sites.point(manager.providers)
+            try:
+                for run in range(1, args.runs + 1):
+                    if run > 1:
+                        sites.next_generation()
+                    runs.append(await _measure_run(run, manager, sites, smtp, round_trips))
+                    print(_describe(runs[-1]), file=sys.stderr)
+            finally:
+                await manager.email_client.close()
+                await manager.close()
+    finally:
+        await engine.dispose()
+        shutdown_tracing()
+    return runs
+
+
+def _counters(sites: StandInMarketplaces, smtp: SmtpSink, round_trips: _RoundTrips) -> Dict[str, float]:
+    counts = sites.counts().values()
+    return {
+        "searches": _metric_total("luxelink_provider_search_seconds_count"),
+        "browser_launches": _metric_total("luxelink_browser_launches_total"),
+        "fast_path_used": _metric_total("luxelink_fast_path_total", outcome="used"),
+        "new_listings": _metric_total("luxelink_new_listings_total"),
+        "email_failures": _metric_total("luxelink_emails_total", status="failed"),
+        "db_round_trips": round_trips.total,
+        "db_commits": round_trips.commits,
+        "emails": smtp.messages,
+        "smtp_connections": smtp.connections,
+        "http_requests": sum(c["requests"] for c in counts),
+        "http_blocked": sum(c["blocked"] for c in counts),
+    }
+
+
+async def _measure_run(run: int, manager: AgentManager, sites: StandInMarketplaces, smtp: SmtpSink,
+                       round_trips: _RoundTrips) -> Dict:
+    before = _counters(sites, smtp, round_trips)
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    with _RssSampler() as rss:
+        started = time.perf_counter()
+        await manager.run_all_agents()
+        wall = time.perf_counter() - started
+        # Alerts were queued in the outbox; the daemon's dispatcher would send them in the background
+        await manager.outbox.drain()
+        dispatch = time.perf_counter() - started - wall
+
+    end_self = resource.getrusage(resource.RUSAGE_SELF)
+    end_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    after = _counters(sites, smtp, round_trips)
+    return {
+        "run": run,
+        "wall_seconds": round(wall, 4),
+        "dispatch_seconds": round(dispatch, 4),
+        # Browsers are children of the Playwright driver, so their CPU only shows once it exits
+        "cpu_user_seconds": round(end_self.ru_utime - usage_self.ru_utime, 4),
+        "cpu_system_seconds": round(end_self.ru_stime - usage_self.ru_stime, 4),
+        "cpu_children_seconds": round(
+            (end_children.ru_utime + end_children.ru_stime) - (usage_children.ru_utime + usage_children.ru_stime), 4
+        ),
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        **{key: int(after[key] - before[key]) for key in after},
+    }
+
+
+def _describe(run: Dict) -> str:
+    return (
+        f"run {run['run']}: {run['wall_seconds']:.2f}s wall, "
+        f"{run['cpu_user_seconds'] + run['cpu_system_seconds']:.2f}s cpu, {run['peak_rss_mb']} MB peak rss, "
+        f"{run['searches']} searches ({run['fast_path_used']} browserless), {run['browser_launches']} browser launches, "
+        f"{run['db_round_trips']} db round trips, {run['new_listings']} new listings, {run['emails']} emails "
+        f"over {run['smtp_connections']} smtp connection(s)"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end run_all_agents benchmark against local stand-in marketplaces")
+    parser.add_argument("--config", default="config/agents.yaml")
+    parser.add_argument("--agent", action="append", help="agent id to include (repeatable; default: all enabled)")
+    parser.add_argument("--sources", default=None, help="comma-separated sources to search (default: each agent's own)")
+    parser.add_argument("--vehicles", type=int, default=None, help="use only the first N vehicles of each agent")
+    parser.add_argument("--database-url", default=None,
+                        help="scratch database (default: temporary SQLite file); other agents in it are disabled")
+    parser.add_argument("--runs", type=int, default=3, help="consecutive run_all_agents calls on the same database")
+    parser.add_argument("--listings", type=int, default=20, help="listings per results page")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stand-in response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random latency, 0..N ms")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="share of requests answered with a 403 bot wall")
+    parser.add_argument("--churn", type=float, default=0.2, help="share of each page that is new on every later run")
+    parser.add_argument("--delay", type=float, default=0.0, help="SCRAPE_DELAY_SECONDS between a scraper's searches")
+    parser.add_argument("--concurrent-agents", type=int, default=2, help="MAX_CONCURRENT_AGENT_RUNS")
+    parser.add_argument("--no-fast-path", action="store_true", help="HTTP_FAST_PATH=false: always use the browser")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--trace", default=None, help="write the runs' tracing spans to this OTLP/JSON file")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", default=None, help="write results JSON to this path")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(getattr(logging, args.log_level.upper())))
+
+    agents = _select_agents(args)
+    if not agents:
+        print("no matching agents", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmpdir, 'e2e.db')}"
+        runs = asyncio.run(bench_run_all_agents(args, agents, database_url))
+
+    # Run 1 stores every listing; later runs are the steady state the daemon spends its time in
+    results = [_result("e2e.run_all_agents.cold", runs[0]["searches"], runs[0]["wall_seconds"], **runs[0])]
+    if len(runs) > 1:
+        warm = min(runs[1:], key=lambda r: r["wall_seconds"])
+        results.append(_result("e2e.run_all_agents.warm", warm["searches"], warm["wall_seconds"], **warm))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": "sqlite" if not args.database_url else args.database_url.split(":", 1)[0],
+            "agents": [a.id for a in agents],
+            "sources": sorted({s for a in agents for s in a.sources}),
+            "listings": args.listings,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "block_rate": args.block_rate,
+            "churn": args.churn,
+            "fast_path": not args.no_fast_path,
+        },
+        "runs": runs,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Micro-benchmarks for the matching hot path, the store/dedup path and alert rendering.
+
+    python -m benchmarks.micro --sizes 1000,10000,100000 --output bench.json
+    python -m benchmarks.micro --compare bench.json --max-regression 0.15
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.synthetic import SyntheticListingGenerator, default_parameters
+from src.core.agent_manager import AgentManager
+from src.core.filter_engine import FilterEngine
+from src.data.base_provider import ListingRecord, RawListing
+from src.notifications.email_client import EmailClient
+from src.storage.database import Listing, get_session_factory, init_db
+from src.utils.config import AgentConfig, AppSettings
+
+# Generated listings are fed to the timed section in chunks so 1M-listing runs fit in memory.
+CHUNK_SIZE = 10000
+
+
+def _parse_sizes(value: str) -> List[int]:
+    return [int(v.replace("_", "")) for v in value.split(",") if v.strip()]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def _result(name: str, size: int, seconds: float, **extra) -> Dict:
+    return {
+        "name": name,
+        "size": size,
+        "seconds": round(seconds, 6),
+        "ops_per_sec": round(size / seconds, 1) if seconds > 0 else None,
+        "us_per_op": round(seconds / size * 1e6, 3) if size else None,
+        **extra,
+    }
+
+
+def _best_of(repeat: int, fn: Callable[[], float]) -> float:
+    return min(fn() for _ in range(repeat))
+
+
+def bench_filter(sizes: List[int], seed: int, repeat: int, adaptive_order: bool = False) -> List[Dict]:
+    results = []
+    name = "filter.evaluate_adaptive" if adaptive_order else "filter.evaluate"
+    params = default_parameters()
+    generator = SyntheticListingGenerator(seed=seed)
+    for size in sizes:
+        def run() -> float:
+            engine = FilterEngine(adaptive_order=adaptive_order)
+            elapsed = 0.0
+            chunk = []
+            for listing in generator.iter_listings(size):
+                chunk.append(listing)
+                if len(chunk) == CHUNK_SIZE:
+                    elapsed += _time_evaluate(engine, chunk, params)
+                    chunk = []
+            if chunk:
+                elapsed += _time_evaluate(engine, chunk, params)
+            return elapsed
+
+        seconds = _best_of(repeat, run)
+        sample = generator.listings(min(size, CHUNK_SIZE))
+        matches = sum(1 for l in sample if FilterEngine().evaluate(l, params)[0])
+        results.append(_result(name, size, seconds, match_rate=round(matches / len(sample), 4)))
+        print(f"{name:<20} n={size:>9,}  {size / seconds:>12,.0f} listings/s", file=sys.stderr)
+    return results
+
+
+def _time_evaluate(engine: FilterEngine, listings, params) -> float:
+    evaluate = engine.evaluate
+    start = time.perf_counter()
+    for listing in listings:
+        evaluate(listing, params)
+    return time.perf_counter() - start
+
+
+async def _bench_store_once(size: int, seed: int, database_url: Optional[str]) -> Dict:
+    tmpdir = None
+    if not database_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    engine = await init_db(database_url)
+    try:
+        settings = AppSettings(DATABASE_URL=database_url, GMAIL_USER="bench@example.com", GMAIL_APP_PASSWORD="")
+        agent_cfg = AgentConfig(
+            id=f"bench_{seed}_{size}",
+            name="Benchmark Agent",
+            parameters=default_parameters(),
+            sources=[],
+            notifications={},
+        )
+        manager = AgentManager(get_session_factory(engine), settings, [agent_cfg])
+        listings = SyntheticListingGenerator(seed=seed).listings(size)
+
+        start = time.perf_counter()
+        inserted = await manager.ingest(agent_cfg, listings)
+        first_pass = time.perf_counter() - start
+
+        # Second pass sees the same cards again, which is what every scheduled re-scrape looks like.
+        start = time.perf_counter()
+        duplicates = await manager.ingest(agent_cfg, listings)
+        dedup_pass = time.perf_counter() - start
+    finally:
+        await engine.dispose()
+        if tmpdir:
+            tmpdir.cleanup()
+
+    return {
+        "insert_seconds": first_pass,
+        "dedup_seconds": dedup_pass,
+        "inserted": len(inserted),
+        "reinserted": len(duplicates),
+    }
+
+
+def bench_store(sizes: List[int], seed: int, database_url: Optional[str]) -> List[Dict]:
+    results = []
+    for size in sizes:
+        run = asyncio.run(_bench_store_once(size, seed, database_url))
+        results.append(_result("store.insert", size, run["insert_seconds"], inserted=run["inserted"]))
+        results.append(_result("store.dedup", size, run["dedup_seconds"], reinserted=run["reinserted"]))
+        print(
+            f"store.insert/dedup   n={size:>9,}  {run['insert_seconds']:.3f}s / {run['dedup_seconds']:.3f}s",
+            file=sys.stderr,
+        )
+    return results
+
+
+def bench_email(sizes: List[int], seed: int, repeat: int) -> List[Dict]:
+    results = []
+    client = EmailClient(hostname="localhost", port=25, username="bench@example.com", password="")
+    for size in sizes:
+        listings = [
+            Listing(
+                agent_id="bench", source=r.source, external_id=r.external_id, url=r.url, title=r.title,
+                price=r.price, mileage=r.mileage, year=r.year, make=r.make, model=r.model, raw_json=r.raw_data,
+            )
+            for r in SyntheticListingGenerator(seed=seed).iter_listings(size)
+        ]
+
+        def run() -> float:
+            start = time.perf_counter()
+            client.build_listing_alert(["client@example.com"], "Benchmark Agent", listings).as_string()
+            return time.perf_counter() - start
+
+        seconds = _best_of(repeat, run)
+        results.append(_result("email.render", size, seconds))
+        print(f"email.render         n={size:>9,}  {seconds * 1000:.2f} ms", file=sys.stderr)
+    return results
+
+
+def bench_records(sizes: List[int], seed: int, repeat: int) -> List[Dict]:
+    """Cost of building the per-card listing object the providers emit, per record type."""
+    results = []
+    record_types = {
+        "records.pydantic_validated": RawListing,
+        "records.dataclass_slots": ListingRecord,
+    }
+    for size in sizes:
+        fields = list(SyntheticListingGenerator(seed=seed).iter_fields(size))
+        for name, record_type in record_types.items():
+            def run() -> float:
+                start = time.perf_counter()
+                records = [record_type(**f) for f in fields]
+                elapsed = time.perf_counter() - start
+                del records
+                return elapsed
+
+            seconds = _best_of(repeat, run)
+
+            tracemalloc.start()
+            records = [record_type(**f) for f in fields]
+            allocated, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del records
+
+            results.append(_result(name, size, seconds, bytes_per_record=round(allocated / size, 1)))
+            print(
+                f"{name:<28} n={size:>9,}  {seconds * 1000:8.2f} ms  {allocated / size:8.1f} B/record",
+                file=sys.stderr,
+            )
+    return results
+
+
+def compare(results: List[Dict], baseline_path: str, max_regression: float) -> List[str]:
+    """Returns a description of every benchmark that got slower than the baseline by more than max_regression."""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in results:
+        base = baseline.get((r["name"], r["size"]))
+        if not base or not base["seconds"]:
+            continue
+        change = (r["seconds"] - base["seconds"]) / base["seconds"]
+        line = f"{r['name']:<20} n={r['size']:>9,}  {base['seconds']:.4f}s -> {r['seconds']:.4f}s ({change:+.1%})"
+        print(line, file=sys.stderr)
+        if change > max_regression:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="LuxeLink micro-benchmarks")
+    parser.add_argument("--sizes", type=_parse_sizes, default=_parse_sizes("1000,10000,100000"),
+                        help="listing counts for FilterEngine.evaluate (up to 1_000_000)")
+    parser.add_argument("--store-sizes", type=_parse_sizes, default=_parse_sizes("1000,5000"),
+                        help="listing counts for the store/dedup path")
+    parser.add_argument("--email-sizes", type=_parse_sizes, default=_parse_sizes("10,100,1000"),
+                        help="listings per rendered alert email")
+    parser.add_argument("--record-sizes", type=_parse_sizes, default=_parse_sizes("10000"),
+                        help="listing counts for the record construction benchmark")
+    parser.add_argument("--only", choices=["filter", "store", "email", "records"], action="append",
+                        help="run a subset of the suites (repeatable)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of N runs")
+    parser.add_argument("--database-url", default=None,
+                        help="database for the store benchmark (default: temporary SQLite file)")
+    parser.add_argument("--output", default=None, help="write results JSON to this path")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="fail if any benchmark is slower than the baseline by more than this fraction")
+    args = parser.parse_args(argv)
+
+    suites = args.only or ["filter", "store", "email", "records"]
+    results: List[Dict] = []
+    if "filter" in suites:
+        results += bench_filter(args.sizes, args.seed, args.repeat)
+        results += bench_filter(args.sizes, args.seed, args.repeat, adaptive_order=True)
+    if "store" in suites:
+        results += bench_store(args.store_sizes, args.seed, args.database_url)
+    if "email" in suites:
+        results += bench_email(args.email_sizes, args.seed, args.repeat)
+    if "records" in suites:
+        results += bench_records(args.record_sizes, args.seed, args.repeat)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
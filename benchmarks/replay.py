@@ -0,0 +1,178 @@
+"""
+Offline provider and pipeline benchmarks from recorded pages (see src/data/fixtures.py).
+
+Record once against the live sites, then replay as often as needed without network access:
+
+    python -m benchmarks.replay record --agent porsche_hunter
+    python -m benchmarks.replay replay --repeat 3 --output replay.json
+    python -m benchmarks.replay replay --compare replay.json
+
+`replay` times every planned provider search (fetch + parse) and a full run_agent per agent
+(search, filter, store, alert) against a temporary SQLite database. Alerts go to --smtp; if nothing
+listens there the send fails and is logged, which does not affect the run.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from benchmarks.micro import _git_commit, _result, compare
+from src.core.agent_manager import AgentManager
+from src.core.search_plan import plan_searches
+from src.data.fixtures import RECORD, REPLAY
+from src.storage.database import get_session_factory, init_db
+from src.utils.config import AgentConfig, AppSettings, load_agents_from_yaml
+
+
+def _settings(mode: str, fixtures_dir: str, database_url: str, smtp: str) -> AppSettings:
+    host, _, port = smtp.partition(":")
+    overrides = dict(
+        DATABASE_URL=database_url,
+        GMAIL_USER="bench@example.com",
+        GMAIL_APP_PASSWORD="",
+        SMTP_HOST=host,
+        SMTP_PORT=int(port or 25),
+        SMTP_MAX_PER_MINUTE=0,
+        DIGEST_WINDOW="immediate", # Deliver each run's alerts when it is drained, not at the next window
+        PROVIDER_FIXTURES_MODE=mode,
+        PROVIDER_FIXTURES_DIR=fixtures_dir,
+        RUN_TIME_BUDGET_MINUTES=0,
+        SCRAPER_PROCESSES=0,
+    )
+    settings = AppSettings(**overrides)
+    if mode == REPLAY and not settings.MARKETCHECK_API_KEY:
+        # The recorded API responses don't need a key, but the provider refuses to search without one
+        settings.MARKETCHECK_API_KEY = "replay"
+    return settings
+
+
+async def _with_manager(mode: str, fixtures_dir: str, smtp: str, fn):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tmpdir, 'replay.db')}"
+        engine = await init_db(database_url)
+        try:
+            manager = AgentManager(get_session_factory(engine), _settings(mode, fixtures_dir, database_url, smtp), [])
+            try:
+                return await fn(manager)
+            finally:
+                await manager.close()
+        finally:
+            await engine.dispose()
+
+
+async def bench_searches(agents: List[AgentConfig], mode: str, fixtures_dir: str, smtp: str) -> List[Dict]:
+    async def run(manager: AgentManager):
+        seconds = defaultdict(float)
+        searches = defaultdict(int)
+        cards = defaultdict(int)
+        for agent_cfg in agents:
+            for task in plan_searches(agent_cfg):
+                if task.source not in manager.providers:
+                    continue
+                start = time.perf_counter()
+                raw = await manager.execute_search(task)
+                seconds[task.source] += time.perf_counter() - start
+                searches[task.source] += 1
+                cards[task.source] += len(raw)
+        return [
+            _result(f"provider.{source}", searches[source], seconds[source], cards=cards[source])
+            for source in sorted(searches)
+        ]
+
+    return await _with_manager(mode, fixtures_dir, smtp, run)
+
+
+async def bench_pipeline(agents: List[AgentConfig], fixtures_dir: str, smtp: str) -> List[Dict]:
+    async def run(manager: AgentManager):
+        results = []
+        for agent_cfg in agents:
+            counts = {}
+
+            async def progress(done: int, total: int, new_listings: int):
+                counts.update(searches=total, new_listings=new_listings)
+
+            start = time.perf_counter()
+            await manager.run_agent(agent_cfg, force=True, progress=progress)
+            await manager.outbox.drain()
+            elapsed = time.perf_counter() - start
+            results.append(_result(
+                f"pipeline.run_agent.{agent_cfg.id}",
+                counts.get("searches", 0),
+                elapsed,
+                new_listings=counts.get("new_listings", 0),
+            ))
+        return results
+
+    return await _with_manager(REPLAY, fixtures_dir, smtp, run)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record provider pages, or benchmark providers and run_agent offline from them")
+    parser.add_argument("mode", choices=[RECORD, REPLAY])
+    parser.add_argument("--config", default="config/agents.yaml")
+    parser.add_argument("--agent", action="append", help="agent id to include (repeatable; default: all enabled)")
+    parser.add_argument("--fixtures", default="fixtures/providers", help="fixture store directory")
+    parser.add_argument("--smtp", default="127.0.0.1:1025", help="host:port alert emails are sent to during replay")
+    parser.add_argument("--repeat", type=int, default=1, help="replay: report the best of N runs")
+    parser.add_argument("--output", default=None, help="write results JSON to this path")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    agents = [a for a in load_agents_from_yaml(args.config) if a.enabled]
+    if args.agent:
+        agents = [a for a in agents if a.id in args.agent]
+    if not agents:
+        print("no matching agents", file=sys.stderr)
+        return 1
+
+    if args.mode == RECORD:
+        results = asyncio.run(bench_searches(agents, RECORD, args.fixtures, args.smtp))
+        print(f"recorded into {args.fixtures}", file=sys.stderr)
+    else:
+        best: Dict[str, Dict] = {}
+        for _ in range(max(1, args.repeat)):
+            run = asyncio.run(bench_searches(agents, REPLAY, args.fixtures, args.smtp))
+            run += asyncio.run(bench_pipeline(agents, args.fixtures, args.smtp))
+            for result in run:
+                if result["name"] not in best or result["seconds"] < best[result["name"]]["seconds"]:
+                    best[result["name"]] = result
+        results = list(best.values())
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": args.mode,
+            "fixtures": args.fixtures,
+            "agents": [a.id for a in agents],
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
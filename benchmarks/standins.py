@@ -0,0 +1,387 @@
+"""
+Local stand-ins for the marketplaces and the SMTP relay, used by the end-to-end benchmark (benchmarks/e2e.py).
+
+Each marketplace is a threaded HTTP server on 127.0.0.1 serving results pages in the markup its provider
+parses (cards for the scrapers, JSON for Marketcheck). Pages are generated deterministically from the
+search query, with configurable size, latency and block rate. Every `next_generation()` replaces a share
+of each page (`churn`) with listings the database hasn't seen, like a real marketplace between polls.
+"""
+import base64
+import html
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+CURRENT_YEAR = 2026
+
+BLOCK_PAGE = b"<html><head><title>Access Denied</title></head><body>Pardon Our Interruption</body></html>"
+
+
+@dataclass
+class MarketplaceConfig:
+    listings: int = 20 # Per results page (Bring a Trailer: per vehicle, on its single auctions page)
+    latency_ms: float = 50.0 # Added to every response
+    jitter_ms: float = 0.0 # Uniform extra latency, 0..jitter_ms
+    block_rate: float = 0.0 # Share of requests answered with a 403 bot wall
+    churn: float = 0.2 # Share of each page replaced by new listings every generation
+    seed: int = 42
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", (text or "").lower())
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+class StandInMarketplace:
+    """One marketplace: subclasses map a request path + query to a results page."""
+
+    source = ""
+
+    def __init__(self, config: MarketplaceConfig, vehicles: List[Tuple[str, str, Optional[int]]]):
+        self.config = config
+        self.vehicles = vehicles
+        self.generation = 0
+        self.requests = 0
+        self.blocked = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(f"{config.seed}:{self.source}")
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        marketplace = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, content_type, body = marketplace.handle(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=f"standin-{self.source}", daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def handle(self, raw_path: str) -> Tuple[int, str, bytes]:
+        with self._lock:
+            self.requests += 1
+            blocked = self._rng.random() < self.config.block_rate
+            delay = self.config.latency_ms + self._rng.uniform(0, self.config.jitter_ms)
+            if blocked:
+                self.blocked += 1
+        time.sleep(delay / 1000)
+        if blocked:
+            return 403, "text/html", BLOCK_PAGE
+        parts = urlsplit(raw_path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        return self.page(parts.path, query)
+
+    def page(self, path: str, query: Dict[str, str]) -> Tuple[int, str, bytes]:
+        raise NotImplementedError
+
+    def point(self, provider):
+        """Aims a provider from build_providers at this server."""
+        raise NotImplementedError
+
+    # Listing generation
+
+    def resolve(self, make_hint: str, model_hint: str) -> Tuple[str, str, Optional[int]]:
+        """The configured vehicle a query refers to, so titles carry the agent's spelling."""
+        make_key, model_key = _norm(make_hint), _norm(model_hint)
+        for make, model, year_min in self.vehicles:
+            if _norm(make) == make_key and model_key in (_norm(model), _norm(make + model)):
+                return make, model, year_min
+        return make_hint.replace("-", " ").title(), model_hint.replace("-", " ").title(), None
+
+    def listings(self, make: str, model: str, year_min: Optional[int]) -> List[dict]:
+        n = self.config.listings
+        offset = self.generation * int(round(n * self.config.churn))
+        first_year = year_min or 2015
+        key = zlib.crc32(f"{self.source}|{make}|{model}".encode())
+        items = []
+        for index in range(offset, offset + n):
+            rng = random.Random(f"{key}:{index}")
+            year = first_year + index % max(1, CURRENT_YEAR - first_year + 1)
+            title = f"{year} {make} {model}"
+            if index % 10 == 9:
+                title += " Rebuilt Title" # Rejected by the usual exclude_keywords
+            items.append({
+                "id": f"{key % 1000000:06d}{index:06d}",
+                "title": title,
+                "year": year,
+                "make": make,
+                "model": model,
+                "price": round(rng.uniform(40000, 400000), -2),
+                "miles": rng.randint(100, 60000),
+            })
+        return items
+
+    @staticmethod
+    def html_page(cards: List[str], empty_marker: str = "") -> Tuple[int, str, bytes]:
+        body = "\n".join(cards) if cards else empty_marker
+        return 200, "text/html; charset=utf-8", f"<html><head><title>Results</title></head><body><main>{body}</main></body></html>".encode()
+
+    @staticmethod
+    def not_found() -> Tuple[int, str, bytes]:
+        return 404, "text/html", b"<html><body>Not found</body></html>"
+
+
+class CarsComStandIn(StandInMarketplace):
+    source = "cars_com"
+
+    def page(self, path, query):
+        if path == "/":
+            return self.html_page([], "<h1>Cars for sale</h1>")
+        if not path.startswith("/shopping/results"):
+            return self.not_found()
+        make, model, year_min = self.resolve(query.get("makes[]", ""), query.get("models[]", ""))
+        cards = [
+            f'<div class="vehicle-card"><a class="vehicle-card-link" href="/vehicledetail/{i["id"]}/">'
+            f'<h2 class="title">{html.escape(i["title"])}</h2></a>'
+            f'<span class="primary-price">${i["price"]:,.0f}</span><div class="mileage">{i["miles"]:,} mi.</div></div>'
+            for i in self.listings(make, model, int(query.get("year_min") or 0) or year_min)
+        ]
+        return self.html_page(cards, '<div class="no-results">No results</div>')
+
+    def point(self, provider):
+        provider.site_url = self.url
+        provider.base_url = self.url + "/shopping/results/"
+
+
+class CarfaxStandIn(StandInMarketplace):
+    source = "carfax"
+
+    def page(self, path, query):
+        segments = [s for s in path.split("/") if s]
+        if not segments or segments[0] != "cars-for-sale":
+            return self.html_page([])
+        make_hint = segments[1] if len(segments) > 1 else ""
+        model_hint = segments[2] if len(segments) > 2 else ""
+        make, model, year_min = self.resolve(make_hint, model_hint)
+        cards = [
+            f'<article class="srp-list-item"><a href="/vehicle/{i["id"]}"><h4>{html.escape(i["title"])}</h4></a>'
+            f'<div class="srp-list-item-price">${i["price"]:,.0f}</div>'
+            f'<div class="srp-list-item-basic-info-mileage">{i["miles"]:,} miles</div></article>'
+            for i in self.listings(make, model, int(query.get("yearMin") or 0) or year_min)
+        ]
+        return self.html_page(cards)
+
+    def point(self, provider):
+        provider.site_url = self.url
+        provider.base_url = self.url + "/cars-for-sale"
+
+
+class AutoNationStandIn(StandInMarketplace):
+    source = "autonation"
+
+    def page(self, path, query):
+        if not path.startswith("/cars-for-sale"):
+            return self.not_found()
+        make, model, year_min = self.resolve(query.get("make", ""), query.get("model", ""))
+        cards = [
+            f'<div class="vehicle-card"><a href="/cars/{i["id"]}"><h3 class="vehicle-title">{html.escape(i["title"])}</h3></a>'
+            f'<span class="price">${i["price"]:,.0f}</span><span class="mileage">{i["miles"]:,} miles</span></div>'
+            for i in self.listings(make, model, year_min)
+        ]
+        return self.html_page(cards)
+
+    def point(self, provider):
+        provider.site_url = self.url
+        provider.base_url = self.url + "/cars-for-sale"
+
+
+class BringATrailerStandIn(StandInMarketplace):
+    source = "bringatrailer"
+
+    def page(self, path, query):
+        if not path.startswith("/auctions"):
+            return self.not_found()
+        items = []
+        for make, model, year_min in self.vehicles:
+            items.extend(self.listings(make, model, year_min))
+        for item in items:
+            item["url"] = f"{self.url}/listing/{_slug(item['title'])}-{item['id']}/"
+        cards = [
+            f'<a class="listing-card" href="{i["url"]}"><h3 class="listing-card-title">{html.escape(i["title"])}</h3>'
+            f'<div class="listing-card-price">Bid: ${i["price"]:,.0f}</div></a>'
+            for i in items
+        ]
+        initial_data = {
+            "items": [
+                {"title": i["title"], "url": i["url"], "year": str(i["year"]), "current_bid": i["price"],
+                 "current_bid_formatted": f"USD ${i['price']:,.0f}", "thumbnail_url": ""}
+                for i in items
+            ]
+        }
+        script = f"<script>var auctionsCurrentInitialData = {json.dumps(initial_data)};</script>"
+        return self.html_page(cards + [script])
+
+    def point(self, provider):
+        provider.site_url = self.url
+        provider.base_url = self.url + "/auctions/"
+
+
+class MarketcheckStandIn(StandInMarketplace):
+    source = "marketcheck"
+
+    def page(self, path, query):
+        if path != "/v2/search/car/active":
+            return 404, "application/json", b'{"error": "not found"}'
+        make, model, year_min = self.resolve(query.get("make", ""), query.get("model", ""))
+        items = self.listings(make, model, int(query.get("year_start") or 0) or year_min)
+        rows = int(query.get("rows") or 50)
+        listings = [
+            {"id": i["id"], "vdp_url": f"{self.url}/vdp/{i['id']}", "heading": i["title"], "price": i["price"],
+             "miles": i["miles"], "year": i["year"], "make": i["make"], "model": i["model"], "city": "Chicago", "state": "IL"}
+            for i in items[:rows]
+        ]
+        return 200, "application/json", json.dumps({"num_found": len(items), "listings": listings}).encode()
+
+    def point(self, provider):
+        provider.base_url = self.url + "/v2/search/car/active"
+
+
+STAND_INS = {cls.source: cls for cls in (
+    CarsComStandIn, CarfaxStandIn, AutoNationStandIn, BringATrailerStandIn, MarketcheckStandIn
+)}
+
+
+class StandInMarketplaces:
+    """All stand-in marketplaces, started together and pointed at an AgentManager's providers."""
+
+    def __init__(self, config: MarketplaceConfig, vehicles: List[Tuple[str, str, Optional[int]]]):
+        self.sites = {source: cls(config, vehicles) for source, cls in STAND_INS.items()}
+
+    def __enter__(self):
+        for site in self.sites.values():
+            site.start()
+        return self
+
+    def __exit__(self, *exc):
+        for site in self.sites.values():
+            site.stop()
+
+    def point(self, providers: Dict[str, object]):
+        for source, provider in providers.items():
+            if source in self.sites:
+                self.sites[source].point(provider)
+
+    def next_generation(self):
+        for site in self.sites.values():
+            site.generation += 1
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        return {source: {"requests": s.requests, "blocked": s.blocked} for source, s in self.sites.items()}
+
+
+class SmtpSink:
+    """
+    Minimal SMTP server that accepts any AUTH and every message and only counts them.
+    Speaks enough ESMTP for aiosmtplib over a plain connection (no STARTTLS).
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def __enter__(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, text: str):
+                self.wfile.write(text.encode() + b"\r\n")
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                self.reply("220 standin ESMTP")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    verb, _, arg = line.decode(errors="replace").strip().partition(" ")
+                    verb = verb.upper()
+                    if verb == "EHLO":
+                        self.reply("250-standin\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 52428800")
+                    elif verb == "HELO":
+                        self.reply("250 standin")
+                    elif verb == "AUTH":
+                        self.authenticate(arg)
+                    elif verb == "RCPT":
+                        with sink._lock:
+                            sink.recipients += 1
+                        self.reply("250 OK")
+                    elif verb in ("MAIL", "RSET", "NOOP"):
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        size = 0
+                        for data in iter(self.rfile.readline, b""):
+                            if data in (b".\r\n", b".\n"):
+                                break
+                            size += len(data)
+                        with sink._lock:
+                            sink.messages += 1
+                            sink.bytes += size
+                        self.reply("250 OK: queued")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+            def authenticate(self, arg: str):
+                mechanism, _, initial = arg.partition(" ")
+                prompts = {"PLAIN": 0 if initial else 1, "LOGIN": 1 if initial else 2}.get(mechanism.upper())
+                if prompts is None:
+                    self.reply("504 Unrecognized authentication type")
+                    return
+                for prompt in ("Username:", "Password:")[-prompts:] if prompts else ():
+                    self.reply("334 " + base64.b64encode(prompt.encode()).decode())
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="standin-smtp", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
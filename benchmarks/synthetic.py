@@ -0,0 +1,129 @@
+import random
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from src.data.base_provider import ListingRecord
+from src.utils.config import AgentParameters, VehicleCriteria
+
+# (make, model, first model year, typical new price) for the cars our clients actually search for.
+TARGET_VEHICLES: List[Tuple[str, str, int, float]] = [
+    ("BMW", "M3", 2015, 85000),
+    ("BMW", "M4", 2015, 90000),
+    ("BMW", "M5 Competition", 2018, 120000),
+    ("BMW", "M8 Competition", 2020, 140000),
+    ("Cadillac", "Escalade V", 2023, 150000),
+    ("Cadillac", "CT5-V Blackwing", 2022, 95000),
+    ("McLaren", "720S", 2018, 300000),
+    ("McLaren", "765LT", 2020, 380000),
+    ("Porsche", "911", 2005, 130000),
+    ("Porsche", "Cayenne Turbo GT", 2022, 190000),
+    ("Mercedes-Benz", "G63", 2012, 180000),
+    ("Mercedes-Benz", "C63", 2012, 80000),
+    ("Ford", "Mustang Shelby GT500", 2020, 80000),
+    ("Ford", "F-150 Raptor", 2017, 75000),
+    ("Ford", "Bronco Raptor", 2022, 85000),
+    ("Lamborghini", "Urus", 2019, 240000),
+    ("Lamborghini", "Huracan LP 610-4", 2015, 260000),
+    ("Audi", "R8", 2010, 160000),
+    ("Audi", "RS7", 2014, 125000),
+    ("Nissan", "GT-R", 2009, 115000),
+    ("Ferrari", "F8 Tributo", 2020, 280000),
+    ("Ferrari", "458 Italia", 2010, 240000),
+    ("Ferrari", "488 GTB", 2016, 250000),
+    ("Ram", "1500 TRX", 2021, 90000),
+]
+
+# Everyday inventory that makes up most of a marketplace results page and should be rejected.
+FILLER_VEHICLES: List[Tuple[str, str, int, float]] = [
+    ("Toyota", "Camry", 2000, 28000),
+    ("Honda", "Civic", 2000, 25000),
+    ("Honda", "Accord", 2000, 29000),
+    ("Chevrolet", "Silverado 1500", 2000, 45000),
+    ("Ford", "F-150", 2000, 45000),
+    ("Nissan", "Altima", 2000, 26000),
+    ("Hyundai", "Tucson", 2005, 29000),
+    ("Jeep", "Grand Cherokee", 2000, 40000),
+    ("Subaru", "Outback", 2000, 30000),
+    ("Tesla", "Model 3", 2017, 42000),
+    ("Kia", "Telluride", 2020, 38000),
+    ("Volkswagen", "Jetta", 2000, 24000),
+]
+
+TRIMS = ["", "", "", "Base", "Competition", "xDrive", "Launch Edition", "Carbon Package", "Premium", "Sport"]
+TITLE_NOISE = ["", "", "", "", "Certified", "One Owner", "Clean Carfax", "No Reserve:", "Salvage", "Rebuilt Title"]
+SOURCES = ["bringatrailer", "cars_com", "carfax", "autonation", "marketcheck"]
+CITIES = ["Chicago, IL", "Miami, FL", "Dallas, TX", "Los Angeles, CA", "Seattle, WA", "Denver, CO", ""]
+
+
+def default_parameters() -> AgentParameters:
+    """Search parameters shaped like the production dream-car profile."""
+    return AgentParameters(
+        vehicles=[
+            VehicleCriteria(make=make, model=model.split()[0], year_min=max(first_year, 2018))
+            for make, model, first_year, _ in TARGET_VEHICLES
+        ],
+        price_max=350000,
+        mileage_max=40000,
+        exclude_keywords=["salvage", "rebuilt", "accident"],
+    )
+
+
+class SyntheticListingGenerator:
+    """
+    Seeded generator of realistic scraped listings.
+    The same seed always produces the same sequence, so benchmark runs are comparable.
+    """
+
+    def __init__(self, seed: int = 42, target_ratio: float = 0.35, missing_rate: float = 0.15, current_year: int = 2026):
+        self.seed = seed
+        self.target_ratio = target_ratio
+        self.missing_rate = missing_rate
+        self.current_year = current_year
+
+    def iter_listings(self, count: int, record_type: Callable[..., Any] = ListingRecord) -> Iterator[Any]:
+        """record_type receives the listing fields as keyword arguments (e.g. ListingRecord or RawListing)."""
+        for fields in self.iter_fields(count):
+            yield record_type(**fields)
+
+    def listings(self, count: int, record_type: Callable[..., Any] = ListingRecord) -> List[Any]:
+        return list(self.iter_listings(count, record_type))
+
+    def iter_fields(self, count: int) -> Iterator[Dict[str, Any]]:
+        rng = random.Random(self.seed)
+        for i in range(count):
+            yield self._make_fields(rng, i)
+
+    def _make_fields(self, rng: random.Random, index: int) -> Dict[str, Any]:
+        pool = TARGET_VEHICLES if rng.random() < self.target_ratio else FILLER_VEHICLES
+        make, model, first_year, new_price = rng.choice(pool)
+        source = rng.choice(SOURCES)
+
+        year = rng.randint(first_year, self.current_year)
+        age = self.current_year - year
+        mileage = max(0, int(rng.gauss(6000 * age + 1500, 3000 + 2000 * age)))
+        price = round(new_price * (0.88 ** age) * rng.uniform(0.8, 1.2), -2)
+
+        trim = rng.choice(TRIMS)
+        noise = rng.choice(TITLE_NOISE)
+        title = " ".join(part for part in (noise, str(year), make, model, trim) if part)
+
+        # Scrapers rarely parse make/model and often miss price or mileage ("Contact for price", auctions).
+        has_structured = source == "marketcheck" or rng.random() < 0.3
+        missing_price, missing_mileage, missing_year = (rng.random() < self.missing_rate for _ in range(3))
+
+        external_id = f"{source}-{self.seed}-{index:08d}"
+        return {
+            "external_id": external_id,
+            "source": source,
+            "url": f"https://example.com/{source}/listing/{external_id}",
+            "title": title,
+            "price": None if missing_price else price,
+            "mileage": None if missing_mileage or source == "bringatrailer" else mileage,
+            "year": None if missing_year else year,
+            "make": make if has_structured else None,
+            "model": model if has_structured else None,
+            "location": rng.choice(CITIES) or None,
+            "raw_data": {"price_text": f"${price:,.0f}", "mileage_text": f"{mileage:,} mi."},
+        }
+
+
+def generate_listings(count: int, seed: int = 42, missing_rate: float = 0.15) -> List[ListingRecord]:
+    return SyntheticListingGenerator(seed=seed, missing_rate=missing_rate).listings(count)
@@ -1,12 +1,19 @@
 import asyncio
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from src.utils.config import AppSettings, load_agents_from_yaml
-from src.storage.database import init_db, get_session_factory, Agent
+from src.storage.database import init_db, get_session_factory
 from src.core.agent_manager import AgentManager
+from src.core.scheduler import AgentScheduler
+from src.core.work_queue import WorkQueue
+from src.core.control import ControlChannel
+from src.core.config_watcher import ConfigWatcher, upsert_agents
+from src.utils.metrics import instrument_engine, start_metrics_server
+from src.utils.tracing import setup_tracing, shutdown_tracing
 import structlog
 
 logger = structlog.get_logger()
 
+AGENTS_CONFIG_PATH = "config/agents.yaml"
+
 async def main():
     # 1. Load Settings
     settings = AppSettings()
@@ -20,55 +27,109 @@ async def main():
 
     # 2. Initialize Database
     engine = await init_db(settings.DATABASE_URL)
+    instrument_engine(engine)
     session_factory = get_session_factory(engine)
 
+    if settings.METRICS_PORT:
+        start_metrics_server(settings.METRICS_PORT, settings.METRICS_HOST)
+    setup_tracing(settings)
+
     # 3. Load Agents from YAML and sync to DB (so first run has agents)
-    agents_config = load_agents_from_yaml("config/agents.yaml")
+    agents_config = load_agents_from_yaml(AGENTS_CONFIG_PATH)
     if not agents_config:
         logger.error("no_agents_found_in_config")
         return
 
-    async with session_factory() as session:
-        for ac in agents_config:
-            existing = await session.get(Agent, ac.id)
-            config_json = ac.model_dump()
-            if existing:
-                existing.name = ac.name
-                existing.enabled = ac.enabled
-                existing.config_json = config_json
-            else:
-                session.add(Agent(id=ac.id, name=ac.name, enabled=ac.enabled, config_json=config_json))
-        await session.commit()
+    await upsert_agents(session_factory, agents_config)
     logger.info("agents_synced_from_yaml", count=len(agents_config))
 
     # 4. Initialize Manager
     manager = AgentManager(session_factory, settings, agents_config)
+    scheduler = control = watcher = None
 
-    # 5. Setup Scheduler
-    scheduler = AsyncIOScheduler()
-    
-    # Run all active agents from database every 4 hours (default)
-    # The manager.run_all_agents now pulls directly from the DB
-    scheduler.add_job(
-        manager.run_all_agents,
-        'interval',
-        hours=4
-    )
-    
-    # Also run once immediately on startup
-    await manager.run_all_agents()
+    # Ctrl-C reaches asyncio.run as a cancellation of this task, so clean up in `finally`
+    try:
+        # 5. Setup Scheduler
+        # Every enabled agent (YAML or dashboard-created) gets its own cron job from its `schedule`,
+        # offset per agent so they don't all hit the providers at once
+        if settings.WORK_QUEUE_ENABLED:
+            # Searches are queued for `python -m src.worker` processes instead of running here
+            queue = WorkQueue(
+                session_factory,
+                lease_seconds=settings.WORK_LEASE_SECONDS,
+                max_attempts=settings.WORK_MAX_ATTEMPTS,
+            )
 
-    scheduler.start()
-    logger.info("scheduler_started")
+            async def enqueue_agent(agent_id: str, force: bool = False) -> int:
+                agent_cfg = await manager.load_agent(agent_id)
+                if not agent_cfg:
+                    return 0
+                tasks, deferred = await manager.plan_queued_run(agent_cfg, force)
+                queued = await queue.enqueue_agent(agent_cfg, tasks)
+                if queued:
+                    await manager.search_stats.record_deferred(deferred)
+                return queued
 
-    # Keep the script running
-    try:
+            scheduler = AgentScheduler(manager, settings, run_agent=enqueue_agent)
+            control = ControlChannel(
+                manager,
+                poll_interval=settings.CONTROL_POLL_SECONDS,
+                enqueue_agent=lambda agent_id: enqueue_agent(agent_id, force=True),
+            )
+            await scheduler.sync_from_db()
+
+            # Also queue a run immediately on startup
+            for agent_id in scheduler.scheduled_agent_ids():
+                await enqueue_agent(agent_id)
+        else:
+            scheduler = AgentScheduler(manager, settings)
+            control = ControlChannel(manager, poll_interval=settings.CONTROL_POLL_SECONDS)
+            await scheduler.sync_from_db()
+
+        # Dashboard "Run Now" requests are picked up from the control_commands table
+        control.start()
+
+        # Alerts queued in the notification outbox (by this process or by queue workers) are emailed here
+        manager.outbox.start()
+
+        # Edits to config/agents.yaml are applied while running; new or edited agents run right away
+        if settings.WORK_QUEUE_ENABLED:
+            run_changed_agent = lambda agent_id: enqueue_agent(agent_id, force=True)
+        else:
+            run_changed_agent = lambda agent_id: manager.run_agent_by_id(agent_id, force=True)
+        watcher = ConfigWatcher(
+            AGENTS_CONFIG_PATH,
+            session_factory,
+            scheduler,
+            agents_config,
+            on_changed=run_changed_agent,
+            poll_interval=settings.CONFIG_WATCH_SECONDS,
+        )
+        watcher.start()
+
+        if not settings.WORK_QUEUE_ENABLED:
+            # Also run once immediately on startup (at most MAX_CONCURRENT_AGENT_RUNS at a time)
+            await manager.run_all_agents()
+
+        scheduler.start()
+        logger.info("scheduler_started")
+
+        # Keep the script running
         while True:
             await asyncio.sleep(1)
-    except (KeyboardInterrupt, SystemExit):
+    finally:
         logger.info("shutting_down")
-        scheduler.shutdown()
+        if scheduler:
+            scheduler.shutdown()
+        if control:
+            control.shutdown()
+        if watcher:
+            watcher.shutdown()
+        manager.outbox.shutdown()
+        await manager.email_client.close()
+        await manager.close()
         await engine.dispose()
+        shutdown_tracing()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,121 +1,470 @@
 import asyncio
-from typing import List
+import math
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.storage.database import Agent, Listing
 from src.utils.config import AgentConfig
 from src.core.filter_engine import FilterEngine
+from src.core.search_plan import SearchTask, plan_searches
+from src.core.process_pool import ProcessSearchPool
+from src.core.search_priority import SearchQueue, SearchStats, within_budget
+from src.core.run_state import RunLog, SourceStats, DEFERRED, FAILED, SKIPPED
+from src.core.market_stats import MarketStats, market_key, resolve_make_model
+from pydantic import ValidationError
+from src.data.base_provider import BaseProvider, ListingRecord
+from src.data.fixtures import ProviderFixtures, fixtures_from_settings
 from src.data.providers.bring_a_trailer import BringATrailerProvider
 from src.data.providers.cars_com import CarsComProvider
 from src.data.providers.carfax import CarfaxProvider
 from src.data.providers.autonation import AutoNationProvider
 from src.data.providers.marketcheck import MarketcheckProvider
 from src.notifications.email_client import EmailClient
+from src.notifications.outbox import DigestPolicy, OutboxDispatcher, enqueue_alerts, recipient_windows
+from src.utils import metrics, tracing
+from src.utils.profiling import RunProfiler, profiled_agents
 import structlog
 
 logger = structlog.get_logger()
 
+ProgressCallback = Callable[[int, int, int], Awaitable[None]]
+
+class _ProgressTracker:
+    """Counts finished searches across a run's concurrent search chains and reports them."""
+
+    def __init__(self, total: int, callback: Optional[ProgressCallback]):
+        self.total = total
+        self.done = 0
+        self.new_listings = 0
+        self.callback = callback
+
+    async def advance(self, new_listings: int):
+        self.done += 1
+        self.new_listings += new_listings
+        await self.report()
+
+    async def report(self):
+        if not self.callback:
+            return
+        try:
+            await self.callback(self.done, self.total, self.new_listings)
+        except Exception as e:
+            logger.warn("progress_report_failed", error=str(e))
+
+class SourceHealth:
+    """
+    Consecutive failed or empty vehicle searches per source. A scraper that keeps coming back empty is
+    most likely blocked or down, so its searches are held back: for the rest of the run in-process,
+    or for `cooldown_seconds` on a queue worker. Rare vehicles often return 0 results, so a few empty
+    searches in a row are normal.
+    """
+    EMPTY_STREAK_LIMIT = 10
+    # APIs and auction listings that are legitimately empty for long stretches
+    EXEMPT_SOURCES = ("marketcheck", "bringatrailer")
+
+    def __init__(self, cooldown_seconds: Optional[float] = None):
+        self.cooldown_seconds = cooldown_seconds
+        self._streaks = defaultdict(int)
+        self._blocked_until: Dict[str, float] = {}
+        self._block_reasons: Dict[str, str] = {}
+
+    def is_blocked(self, source: str) -> bool:
+        until = self._blocked_until.get(source)
+        if until is None:
+            return False
+        if time.monotonic() < until:
+            return True
+        del self._blocked_until[source]
+        self._streaks[source] = 0
+        return False
+
+    def block_reason(self, source: str) -> Optional[str]:
+        return self._block_reasons.get(source)
+
+    def failed(self, task: SearchTask):
+        self._streaks[task.source] += 1
+
+    def finished(self, task: SearchTask, cards: int) -> bool:
+        """Records a search's result; True when it makes the source look blocked."""
+        if not task.vehicle:
+            return False
+        if cards:
+            self._streaks[task.source] = 0
+        else:
+            self._streaks[task.source] += 1
+        if self._streaks[task.source] < self.EMPTY_STREAK_LIMIT or task.source in self.EXEMPT_SOURCES:
+            return False
+        logger.warn("provider_likely_blocked_skipping", source=task.source)
+        metrics.BLOCKS_DETECTED.labels(task.source, "empty_streak").inc()
+        cooldown = self.cooldown_seconds if self.cooldown_seconds is not None else math.inf
+        self._blocked_until[task.source] = time.monotonic() + cooldown
+        self._block_reasons[task.source] = f"source looks blocked ({self._streaks[task.source]} empty searches in a row)"
+        return True
+
+def build_providers(marketcheck_api_key: Optional[str], fixtures: Optional[ProviderFixtures] = None,
+                    http_fast_path: bool = True) -> Dict[str, BaseProvider]:
+    providers = {
+        "bringatrailer": BringATrailerProvider(),
+        "cars_com": CarsComProvider(),
+        "carfax": CarfaxProvider(),
+        "autonation": AutoNationProvider(),
+        "marketcheck": MarketcheckProvider(api_key=marketcheck_api_key)
+    }
+    for provider in providers.values():
+        provider.fixtures = fixtures
+        provider.http_fast_path = http_fast_path
+    return providers
+
 class AgentManager:
     def __init__(self, session_factory, settings, agents_config: List[AgentConfig]):
         self.session_factory = session_factory
         self.settings = settings
         self.agents_config = agents_config
-        self.filter_engine = FilterEngine()
+        self.filter_engine = FilterEngine(
+            adaptive_order=settings.FILTER_ADAPTIVE_ORDER, collect_stats=settings.FILTER_COLLECT_STATS
+        )
+        self.market_stats = MarketStats()
+        self.run_log = RunLog(session_factory, resume_max_age_hours=settings.RUN_RESUME_MAX_AGE_HOURS)
+        self.search_stats = SearchStats(
+            session_factory,
+            adaptive=settings.ADAPTIVE_POLLING,
+            min_interval=settings.POLL_INTERVAL_MIN_MINUTES,
+            max_interval=settings.POLL_INTERVAL_MAX_MINUTES,
+            target_new=settings.POLL_TARGET_NEW_LISTINGS,
+        )
+        # Global cap on concurrent agent runs, shared by scheduled and on-demand runs
+        self._run_slots = asyncio.Semaphore(settings.MAX_CONCURRENT_AGENT_RUNS)
+        self._running = set()
+        self._profiled_agents = profiled_agents(settings.PROFILE_AGENTS)
         self.email_client = EmailClient(
-            hostname="smtp.gmail.com",
-            port=587,
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
             username=settings.GMAIL_USER,
-            password=settings.GMAIL_APP_PASSWORD
+            password=settings.GMAIL_APP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+            max_per_minute=settings.SMTP_MAX_PER_MINUTE,
+            keepalive_seconds=settings.SMTP_KEEPALIVE_SECONDS,
+            idle_close_seconds=settings.SMTP_IDLE_CLOSE_SECONDS,
+        )
+        # Alerts are queued by ingest and delivered by this dispatcher, started by the daemon
+        self.outbox = OutboxDispatcher(
+            session_factory,
+            self.email_client,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            poll_interval=settings.OUTBOX_POLL_SECONDS,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            retry_backoff_seconds=settings.OUTBOX_RETRY_BACKOFF_SECONDS,
+            max_backoff_seconds=settings.OUTBOX_MAX_BACKOFF_SECONDS,
+        )
+        self.digest_policy = DigestPolicy(
+            window=settings.DIGEST_WINDOW,
+            immediate_deal_score=settings.DIGEST_IMMEDIATE_DEAL_SCORE,
+            daily_hour=settings.DIGEST_DAILY_HOUR,
+            recipient_windows=recipient_windows(settings.DIGEST_RECIPIENT_WINDOWS),
         )
         
         # Initialize providers
-        self.providers = {
-            "bringatrailer": BringATrailerProvider(),
-            "cars_com": CarsComProvider(),
-            "carfax": CarfaxProvider(),
-            "autonation": AutoNationProvider(),
-            "marketcheck": MarketcheckProvider(api_key=settings.MARKETCHECK_API_KEY)
-        }
+        self.fixtures = fixtures_from_settings(settings)
+        self.providers = build_providers(settings.MARKETCHECK_API_KEY, self.fixtures, settings.HTTP_FAST_PATH)
+
+        # Optionally run the searches themselves in worker processes (see ProcessSearchPool)
+        self.search_pool = None
+        if settings.SCRAPER_PROCESSES > 0:
+            self.search_pool = ProcessSearchPool(settings.SCRAPER_PROCESSES, settings)
+
+    async def close(self):
+        if self.search_pool:
+            self.search_pool.shutdown()
+        for provider in self.providers.values():
+            await provider.close()
 
     async def run_all_agents(self):
-        logger.info("starting_all_agents_run")
+        with tracing.span("run_all_agents") as current:
+            logger.info("starting_all_agents_run")
         
-        # Load agents from database to ensure we have the latest modular profiles
-        async with self.session_factory() as session:
-            stmt = select(Agent).where(Agent.enabled == True)
-            result = await session.execute(stmt)
-            db_agents = result.scalars().all()
+            # Load agents from database to ensure we have the latest modular profiles
+            async with self.session_factory() as session:
+                stmt = select(Agent).where(Agent.enabled == True)
+                result = await session.execute(stmt)
+                db_agents = result.scalars().all()
             
-        tasks = []
-        for db_agent in db_agents:
-            try:
-                agent_cfg = AgentConfig(**db_agent.config_json)
-                tasks.append(self.run_agent(agent_cfg))
-            except Exception as e:
-                logger.error("failed_to_parse_agent_config", agent_id=db_agent.id, error=str(e))
+            tasks = []
+            for db_agent in db_agents:
+                try:
+                    agent_cfg = AgentConfig(**db_agent.config_json)
+                    tasks.append(self.run_agent(agent_cfg))
+                except Exception as e:
+                    logger.error("failed_to_parse_agent_config", agent_id=db_agent.id, error=str(e))
         
-        if tasks:
-            await asyncio.gather(*tasks)
-        logger.info("finished_all_agents_run")
+            current.set_attribute("agents", len(tasks))
+            if tasks:
+                await asyncio.gather(*tasks)
+            if self.filter_engine.collect_stats:
+                logger.info("finished_all_agents_run", filter_stats=self.filter_engine.stats())
+            else:
+                logger.info("finished_all_agents_run")
+
+    async def load_agent(self, agent_id: str) -> Optional[AgentConfig]:
+        """The latest enabled profile from the DB; it may have been edited or disabled in the dashboard."""
+        async with self.session_factory() as session:
+            db_agent = await session.get(Agent, agent_id)
+        if not db_agent or not db_agent.enabled:
+            logger.info("agent_skipped_disabled", agent_id=agent_id)
+            return None
+        try:
+            return AgentConfig(**db_agent.config_json)
+        except Exception as e:
+            logger.error("failed_to_parse_agent_config", agent_id=agent_id, error=str(e))
+            return None
+
+    async def run_agent_by_id(self, agent_id: str, force: bool = False):
+        agent_cfg = await self.load_agent(agent_id)
+        if agent_cfg:
+            await self.run_agent(agent_cfg, force=force)
 
-    async def run_agent(self, agent_cfg: AgentConfig):
+    async def run_agent(self, agent_cfg: AgentConfig, force: bool = False,
+                        progress: Optional[ProgressCallback] = None, profile: bool = False) -> bool:
+        """
+        Runs the agent unless it is already running (returns False then).
+        force: run every search, not only those due under adaptive polling.
+        progress: awaited with (searches_done, searches_total, new_listings) as searches finish.
+        profile: capture a sampling profile of this run (as PROFILE_AGENTS does for every run).
+        """
+        if agent_cfg.id in self._running:
+            logger.info("agent_already_running", agent_id=agent_cfg.id)
+            return False
+        self._running.add(agent_cfg.id)
+        try:
+            async with self._run_slots:
+                with metrics.AGENT_RUN_SECONDS.time(), tracing.span("run_agent", **{"agent.id": agent_cfg.id, "force": force}):
+                    await self._run_agent(agent_cfg, force, progress, profile)
+        finally:
+            self._running.discard(agent_cfg.id)
+        return True
+
+    async def _run_agent(self, agent_cfg: AgentConfig, force: bool = False,
+                         progress: Optional[ProgressCallback] = None, profile: bool = False):
         logger.info("running_agent", agent_id=agent_cfg.id)
-        
-        all_raw_listings = []
-        params_dict = agent_cfg.parameters.model_dump()
-        
-        for source in agent_cfg.sources:
-            provider = self.providers.get(source)
-            if not provider:
-                continue
-                
+
+        run = await self.run_log.find_unfinished(agent_cfg.id)
+        if run:
+            # A previous process died mid-run: continue at its first unfinished search
+            tasks = await self.run_log.resume(run)
+            logger.info("resuming_interrupted_run", agent_id=agent_cfg.id, run_id=run.id, remaining=len(tasks))
+        else:
+            tasks, stats = await self.plan_run(agent_cfg, force)
+            if not tasks:
+                logger.info("no_searches_due", agent_id=agent_cfg.id)
+                return
+            # Fix the priority order up front so a resumed run keeps it
+            tasks = list(SearchQueue(tasks, stats).drain())
+            run = await self.run_log.start(agent_cfg.id, tasks)
+
+        profiler = None
+        if profile or agent_cfg.id in self._profiled_agents or "*" in self._profiled_agents:
+            profiler = RunProfiler(self.settings.PROFILE_DIR, self.settings.PROFILE_INTERVAL_MS)
+            if not profiler.start():
+                profiler = None
+
+        try:
+            budget = self.settings.RUN_TIME_BUDGET_MINUTES * 60
+            deadline = time.monotonic() + budget if budget > 0 else None
+
+            if self.search_pool:
+                # Each site is still searched one vehicle at a time, but different sites run side by side
+                tasks_by_source = defaultdict(list)
+                for task in tasks:
+                    tasks_by_source[task.source].append(task)
+                queues = [SearchQueue(source_tasks, {}) for source_tasks in tasks_by_source.values()]
+            else:
+                queues = [SearchQueue(tasks, {})]
+
+            tracker = _ProgressTracker(len(tasks), progress)
+            source_stats = SourceStats(run.id, agent_cfg.id)
+            await tracker.report()
             try:
-                # Some providers (like BaT) return all listings at once and don't need per-vehicle loops
-                if source == "bringatrailer":
-                    raw = await provider.search(params_dict)
-                    all_raw_listings.extend(raw)
+                await asyncio.gather(*(
+                    self._run_searches(agent_cfg, queue, deadline, tracker, source_stats) for queue in queues
+                ))
+            finally:
+                await self.save_source_stats(source_stats)
+
+            self.notify(agent_cfg, tracker.new_listings)
+            await self.run_log.finish(run.id)
+        finally:
+            if profiler:
+                path = profiler.save(run.id, agent_cfg.id)
+                if path:
+                    await self.run_log.attach_profile(run.id, path)
+
+    async def plan_run(self, agent_cfg: AgentConfig, force: bool = False):
+        """The agent's searches that should run now (all of them unless adaptive polling is on), with their stats."""
+        tasks = [task for task in plan_searches(agent_cfg) if task.source in self.providers]
+        stats = await self.search_stats.load(agent_cfg.id)
+        if force:
+            return tasks, stats
+        return self.search_stats.due(tasks, stats), stats
+
+    async def plan_queued_run(self, agent_cfg: AgentConfig, force: bool = False) -> Tuple[List[SearchTask], List[SearchTask]]:
+        """
+        The searches to queue for workers, best-yield first (workers claim jobs in queue order), and
+        those left for a later run: queued searches stop where their recorded durations add up to
+        RUN_TIME_BUDGET_MINUTES. Record the deferred ones once the run is actually queued.
+        """
+        tasks, stats = await self.plan_run(agent_cfg, force)
+        tasks = list(SearchQueue(tasks, stats).drain())
+        budget = self.settings.RUN_TIME_BUDGET_MINUTES * 60
+        if budget <= 0:
+            return tasks, []
+        tasks, deferred = within_budget(tasks, stats, budget)
+        if deferred:
+            logger.info("queued_run_over_budget", agent_id=agent_cfg.id, queued=len(tasks), deferred=len(deferred))
+        return tasks, deferred
+
+    async def _run_searches(self, agent_cfg: AgentConfig, queue: SearchQueue, deadline: Optional[float],
+                            tracker: "_ProgressTracker", source_stats: Optional[SourceStats] = None):
+        """
+        Runs searches best-yield first and ingests (and checkpoints) each one's results as it finishes.
+        Once the run's deadline passes, the remaining searches are deferred to the next run. Searches of a
+        source that looks blocked are skipped, with the reason on their run_searches row.
+        Each search's duration, page loads, cards, matches, errors and blocks are added to `source_stats`.
+        """
+        health = SourceHealth()
+        deferred = []
+        postponed = []
+        skipped = defaultdict(list)  # source -> searches held back because it looks blocked
+
+        while queue:
+            task = queue.pop()
+            if health.is_blocked(task.source):
+                skipped[task.source].append(task)
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                for t in [task, *queue.drain()]:
+                    if health.is_blocked(t.source):
+                        skipped[t.source].append(t)
+                    else:
+                        deferred.append(t)
+                logger.warn("run_budget_exhausted", agent_id=agent_cfg.id, deferred=len(deferred))
+                break
+
+            started = time.monotonic()
+            with metrics.counting_search() as counters:
+                try:
+                    raw = await self.execute_search(task)
+                except Exception as e:
+                    if task.vehicle:
+                        logger.error("vehicle_search_failed", source=task.source, vehicle=task.vehicle["model"], error=str(e))
+                    else:
+                        logger.error("provider_search_failed", source=task.source, error=str(e))
+                    if source_stats:
+                        source_stats.add(task, time.monotonic() - started, counters, error=True)
+                    health.failed(task)
+                    postponed.append(task)
+                    await tracker.advance(0)
                     continue
 
-                # If specific vehicles are defined, we may need multiple searches per provider
-                if agent_cfg.parameters.vehicles:
-                    consecutive_failures = 0
-                    for vehicle in agent_cfg.parameters.vehicles:
-                        # Create a temporary params dict for this specific vehicle search
-                        v_params = params_dict.copy()
-                        v_params["makes"] = [vehicle.make]
-                        v_params["models"] = [vehicle.model]
-                        v_params["year_min"] = vehicle.year_min
-                        v_params["year_max"] = vehicle.year_max
-                        
-                        try:
-                            raw = await provider.search(v_params)
-                            if raw:
-                                all_raw_listings.extend(raw)
-                                consecutive_failures = 0
-                            else:
-                                consecutive_failures += 1
-                            
-                            # If a scraper fails 5 times in a row, it's likely blocked or down
-                            # Increased from 3 to 5 because rare vehicles often return 0 results
-                            # We only skip if we are reasonably sure it's a block, not just 0 results.
-                            # For now, we'll keep the counter but maybe we should check provider-specific block flags.
-                            if consecutive_failures >= 10 and source not in ["marketcheck", "bringatrailer"]:
-                                logger.warn("provider_likely_blocked_skipping", source=source)
-                                break
-                                
-                            # Add a small human-like delay between vehicle searches for scrapers
-                            if source != "marketcheck":
-                                await asyncio.sleep(2)
-                        except Exception as e:
-                            logger.error("vehicle_search_failed", source=source, vehicle=vehicle.model, error=str(e))
-                            consecutive_failures += 1
-                else:
-                    raw = await provider.search(params_dict)
-                    all_raw_listings.extend(raw)
+                new = await self.ingest(agent_cfg, raw, task)
+            duration = time.monotonic() - started
+            if source_stats:
+                source_stats.add(task, duration, counters, cards=len(raw), new_listings=len(new))
+            await self.record_search(task, len(new), duration)
+            await tracker.advance(len(new))
+
+            if health.finished(task, len(raw)):
+                continue
+            await self.pause_between_searches(task)
+
+        held_back = [t for source_tasks in skipped.values() for t in source_tasks]
+        if deferred or postponed or held_back:
+            await self.run_log.mark(deferred, DEFERRED)
+            await self.run_log.mark(postponed, FAILED)
+            for source, source_tasks in skipped.items():
+                await self.run_log.mark(source_tasks, SKIPPED, health.block_reason(source))
+            try:
+                await self.search_stats.record_deferred(deferred)
+                await self.search_stats.postpone(postponed + held_back)
             except Exception as e:
-                logger.error("provider_search_failed", source=source, error=str(e))
+                logger.error("search_stats_update_failed", agent_id=agent_cfg.id, error=str(e))
+
+    async def pause_between_searches(self, task: SearchTask):
+        """A small human-like delay after a scraper's vehicle search (none for the API, or when replaying fixtures)."""
+        if task.vehicle and task.source != "marketcheck" and not (self.fixtures and self.fixtures.replaying):
+            await asyncio.sleep(self.settings.SCRAPE_DELAY_SECONDS)
 
-        # Filter and Store
+    async def save_source_stats(self, source_stats: SourceStats):
+        try:
+            await self.run_log.save_source_stats(source_stats)
+        except Exception as e:
+            # Execution history is for tuning only; never fail a run over it
+            logger.error("run_source_stats_save_failed", run_id=source_stats.run_id, error=str(e))
+
+    async def record_search(self, task: SearchTask, new_listings: int, duration: float):
+        try:
+            await self.search_stats.record(task, new_listings, duration)
+        except Exception as e:
+            # Yield history only affects ordering; never fail a search over it
+            logger.error("search_stats_update_failed", agent_id=task.agent_id, source=task.source, error=str(e))
+
+    async def execute_search(self, task: SearchTask) -> List[ListingRecord]:
+        started = time.perf_counter()
+        with tracing.span("provider.search", source=task.source, vehicle=task.vehicle_key,
+                          process_pool=bool(self.search_pool)) as current:
+            try:
+                if self.search_pool:
+                    raw = await self.search_pool.search(task.source, task.params)
+                else:
+                    raw = await self.providers[task.source].search(task.params)
+            except Exception:
+                metrics.SEARCH_ERRORS.labels(task.source).inc()
+                tracing.set_status(current, "error")
+                raise
+            finally:
+                metrics.SEARCH_SECONDS.labels(task.source).observe(time.perf_counter() - started)
+            current.set_attribute("cards", len(raw))
+            tracing.set_status(current, "ok" if raw else "empty")
+        metrics.CARDS_PARSED.labels(task.source).inc(len(raw))
+        return raw
+
+    def notify(self, agent_cfg: AgentConfig, new_listings: int):
+        """
+        Alerts for new listings are already in the outbox (queued by ingest); this only wakes the
+        dispatcher so they go out now rather than at its next poll. Delivery never blocks the run.
+        """
+        if new_listings:
+            logger.info("new_matches_found", agent_id=agent_cfg.id, count=new_listings)
+            self.outbox.wake()
+
+    def _alert_worthy(self, agent_cfg: AgentConfig, listings: List[Listing]) -> List[Listing]:
+        # With deal_score_min set, only alert on cars that are cheap for their market.
+        # Listings without enough market data to score are still alerted.
+        threshold = agent_cfg.parameters.deal_score_min
+        if threshold is None:
+            return listings
+        return [l for l in listings if l.deal_score is None or l.deal_score >= threshold]
+
+    async def ingest(self, agent_cfg: AgentConfig, raw_listings: List[ListingRecord],
+                     task: Optional[SearchTask] = None) -> List[Listing]:
+        """
+        Filters scraped listings against the agent and stores the matches that are not yet in the DB.
+        If `task` belongs to a tracked run, its checkpoint is committed with them.
+        Returns the newly stored listings.
+        """
+        with tracing.span("ingest", **{"agent.id": agent_cfg.id, "source": task.source if task else None}):
+            try:
+                return await self._ingest(agent_cfg, raw_listings, task)
+            except IntegrityError:
+                # Another worker stored one of these listings between our existence check and commit.
+                # A second pass sees it and only inserts what is still missing.
+                logger.info("ingest_conflict_retrying", agent_id=agent_cfg.id)
+                self.market_stats.forget()
+                return await self._ingest(agent_cfg, raw_listings, task)
+
+    async def _ingest(self, agent_cfg: AgentConfig, raw_listings: List[ListingRecord],
+                      task: Optional[SearchTask] = None) -> List[Listing]:
         new_matches = []
         async with self.session_factory() as session:
             # Ensure agent exists in DB
@@ -125,40 +474,81 @@ class AgentManager:
                 session.add(db_agent)
                 await session.commit()
 
-            for raw in all_raw_listings:
-                is_match, score = self.filter_engine.evaluate(raw, agent_cfg.parameters)
-                if is_match:
-                    # Check if already exists
-                    stmt = select(Listing).where(Listing.external_id == raw.external_id)
-                    result = await session.execute(stmt)
-                    existing = result.scalar_one_or_none()
+            matched = 0
+            params = agent_cfg.parameters
+            # Cards with a known market feed it, matched or not, so deal scores rank against more than the matches.
+            # Only cards that passed the cheap checks are observed; the rest were never fuzzy-matched to a vehicle.
+            cards = {}
+            with tracing.span("filter", evaluated=len(raw_listings)) as current:
+                for raw in raw_listings:
+                    outcome = self.filter_engine.check(raw, params)
+                    make_model = resolve_make_model(raw, outcome.vehicle) if outcome.passed_cheap_checks else None
+                    if make_model and raw.year and market_key(*make_model, raw.year):
+                        cards.setdefault(raw.external_id, (*make_model, raw.year, raw.price, raw.mileage))
+                    if outcome.is_match:
+                        matched += 1
+                        metrics.LISTINGS_MATCHED.labels(raw.source).inc()
+                        # Check if already exists
+                        stmt = select(Listing).where(Listing.external_id == raw.external_id)
+                        result = await session.execute(stmt)
+                        existing = result.scalar_one_or_none()
                     
-                    if not existing:
-                        new_listing = Listing(
-                            agent_id=agent_cfg.id,
-                            source=raw.source,
-                            external_id=raw.external_id,
-                            url=raw.url,
-                            title=raw.title,
-                            price=raw.price,
-                            mileage=raw.mileage,
-                            year=raw.year,
-                            make=raw.make,
-                            model=raw.model,
-                            raw_json=raw.raw_data,
-                            match_score=score
-                        )
-                        session.add(new_listing)
-                        new_matches.append(new_listing)
-            
-            await session.commit()
-
-            if new_matches:
-                logger.info("new_matches_found", agent_id=agent_cfg.id, count=len(new_matches))
-                to_emails = agent_cfg.notifications.get("email_to", [self.settings.GMAIL_USER])
-                await self.email_client.send_listing_alerts(to_emails, agent_cfg.name, new_matches)
-                
-                # Mark as alerted
-                for m in new_matches:
-                    m.alerted = True
-                await session.commit()
+                        if not existing:
+                            # Providers emit unvalidated records; only matches are validated before storage
+                            try:
+                                valid = raw.validate()
+                            except ValidationError as e:
+                                logger.warn("invalid_listing_skipped", source=raw.source, external_id=raw.external_id, error=str(e))
+                                continue
+                            # Scored against the market before this batch's cards become part of it
+                            deal_score, key = None, None
+                            if make_model:
+                                make, model = make_model
+                                key = market_key(make, model, valid.year)
+                                deal_score = await self.market_stats.deal_score(session, make, model, valid.year, valid.price, valid.mileage)
+
+                            new_listing = Listing(
+                                agent_id=agent_cfg.id,
+                                source=valid.source,
+                                external_id=valid.external_id,
+                                url=valid.url,
+                                title=valid.title,
+                                price=valid.price,
+                                mileage=valid.mileage,
+                                year=valid.year,
+                                make=valid.make,
+                                model=valid.model,
+                                raw_json=valid.raw_data,
+                                match_score=outcome.score,
+                                deal_score=deal_score,
+                                market_key=key
+                            )
+                            session.add(new_listing)
+                            new_matches.append(new_listing)
+                            metrics.NEW_LISTINGS.labels(valid.source).inc()
+                current.set_attribute("matched", matched)
+                current.set_attribute("new", len(new_matches))
+            batch = await self.market_stats.observe_listings(session, cards)
+
+            try:
+                with tracing.span("db.commit", new_listings=len(new_matches)):
+                    await self.market_stats.flush(session, batch)
+                    to_alert = self._alert_worthy(agent_cfg, new_matches)
+                    if task is not None or to_alert:
+                        await session.flush()
+                    if task is not None:
+                        await self.run_log.checkpoint(session, task, len(raw_listings), new_matches)
+                    if to_alert:
+                        # Queued with the listings, so every stored listing's alert survives a crash
+                        to_emails = agent_cfg.notifications.get("email_to", [self.settings.GMAIL_USER])
+                        policy = DigestPolicy.for_agent(agent_cfg.notifications, self.digest_policy)
+                        enqueue_alerts(session, agent_cfg.id, to_alert, to_emails, policy)
+                    await session.commit()
+            except BaseException:
+                # Rolled back: the batch's listings were not recorded, so a retry must observe them again
+                self.market_stats.discard(batch)
+                raise
+            self.market_stats.committed(batch)
+        metrics.count_search("matches", matched)
+
+        return new_matches
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+from src.storage.database import Agent
+from src.utils.config import AgentConfig, load_agents_from_yaml
+import structlog
+
+logger = structlog.get_logger()
+
+
+async def upsert_agents(session_factory, agent_configs: List[AgentConfig]):
+    """Writes the given agents to the DB, creating or overwriting them."""
+    async with session_factory() as session:
+        for ac in agent_configs:
+            existing = await session.get(Agent, ac.id)
+            config_json = ac.model_dump()
+            if existing:
+                existing.name = ac.name
+                existing.enabled = ac.enabled
+                existing.config_json = config_json
+            else:
+                session.add(Agent(id=ac.id, name=ac.name, enabled=ac.enabled, config_json=config_json))
+        await session.commit()
+
+
+async def disable_agents(session_factory, agent_ids: List[str]):
+    async with session_factory() as session:
+        for agent_id in agent_ids:
+            existing = await session.get(Agent, agent_id)
+            if existing and existing.enabled:
+                existing.enabled = False
+                config_json = dict(existing.config_json)
+                config_json["enabled"] = False
+                existing.config_json = config_json
+        await session.commit()
+
+
+class ConfigWatcher:
+    """
+    Reloads config/agents.yaml when it changes and applies only the difference:
+    new and edited agents are upserted, agents removed from the file are disabled (their
+    listings are kept), the scheduler is re-synced, and `on_changed` is called for each
+    new or edited agent that is enabled so it can run right away.
+
+    The file's modification time is polled, so no extra dependency or OS notification API is needed.
+    """
+
+    def __init__(self, path: str, session_factory, scheduler, initial: List[AgentConfig],
+                 on_changed: Optional[Callable[[str], Awaitable[None]]] = None, poll_interval: float = 5.0):
+        self.path = path
+        self.session_factory = session_factory
+        self.scheduler = scheduler
+        self.on_changed = on_changed
+        self.poll_interval = poll_interval
+        self._configs: Dict[str, dict] = {cfg.id: cfg.model_dump() for cfg in initial}
+        self._mtime = self._read_mtime()
+        self._poller: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def start(self):
+        self._poller = asyncio.create_task(self._poll())
+
+    def shutdown(self):
+        if self._poller:
+            self._poller.cancel()
+
+    def _read_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            mtime = self._read_mtime()
+            if mtime is None or mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error("agent_config_reload_failed", path=self.path, error=str(e))
+
+    async def reload(self):
+        try:
+            configs = load_agents_from_yaml(self.path)
+        except Exception as e:
+            # A half-saved or invalid file keeps the current agents until the next save
+            logger.error("agent_config_invalid", path=self.path, error=str(e))
+            return
+
+        loaded = {cfg.id: cfg for cfg in configs}
+        added = [cfg for agent_id, cfg in loaded.items() if agent_id not in self._configs]
+        changed = [
+            cfg for agent_id, cfg in loaded.items()
+            if agent_id in self._configs and cfg.model_dump() != self._configs[agent_id]
+        ]
+        removed = [agent_id for agent_id in self._configs if agent_id not in loaded]
+
+        if not (added or changed or removed):
+            return
+
+        if added or changed:
+            await upsert_agents(self.session_factory, added + changed)
+        if removed:
+            await disable_agents(self.session_factory, removed)
+        self._configs = {agent_id: cfg.model_dump() for agent_id, cfg in loaded.items()}
+        await self.scheduler.sync_from_db()
+
+        logger.info(
+            "agent_config_reloaded",
+            added=[cfg.id for cfg in added],
+            changed=[cfg.id for cfg in changed],
+            removed=removed,
+        )
+
+        if self.on_changed:
+            for cfg in added + changed:
+                if cfg.enabled:
+                    task = asyncio.create_task(self._notify(cfg.id))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+    async def _notify(self, agent_id: str):
+        try:
+            await self.on_changed(agent_id)
+        except Exception as e:
+            logger.error("agent_config_change_run_failed", agent_id=agent_id, error=str(e))
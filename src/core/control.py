@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import select, update
+from src.storage.database import ControlCommand, utcnow
+import structlog
+
+logger = structlog.get_logger()
+
+RUN_AGENT = "run_agent"
+PROFILE_AGENT = "profile_agent" # run_agent with a sampling profile of the run
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+async def submit_command(session_factory, command: str, agent_id: Optional[str] = None) -> int:
+    """Queues a command for the daemon (used by the dashboard). Returns its id for polling with `get_command`."""
+    async with session_factory() as session:
+        cmd = ControlCommand(command=command, agent_id=agent_id, status=QUEUED, created_at=utcnow())
+        session.add(cmd)
+        await session.commit()
+        return cmd.id
+
+
+async def get_command(session_factory, command_id: int) -> Optional[ControlCommand]:
+    async with session_factory() as session:
+        return await session.get(ControlCommand, command_id)
+
+
+class ControlChannel:
+    """
+    Local control channel between the dashboard and the `main.py` daemon, over the `control_commands` table.
+
+    The daemon polls for queued commands and runs them on its own AgentManager, so an ad-hoc
+    "Run Now" reuses the warm DB engine, providers, market stats and search pool instead of
+    starting a new process. Progress is written back to the command row for the UI to poll.
+    """
+
+    def __init__(self, manager, poll_interval: float = 1.0, command_ttl_seconds: int = 600,
+                 enqueue_agent: Optional[Callable[[str], Awaitable[int]]] = None):
+        """enqueue_agent: set in work-queue mode, where runs are queued for workers instead of run here."""
+        self.manager = manager
+        self.session_factory = manager.session_factory
+        self.poll_interval = poll_interval
+        self.command_ttl_seconds = command_ttl_seconds
+        self.enqueue_agent = enqueue_agent
+        self._tasks = set()
+        self._poller: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._poller = asyncio.create_task(self._poll())
+
+    def shutdown(self):
+        if self._poller:
+            self._poller.cancel()
+        for task in self._tasks:
+            task.cancel()
+
+    async def _poll(self):
+        await self._recover()
+        while True:
+            try:
+                await self._dispatch_queued()
+            except Exception as e:
+                logger.error("control_poll_failed", error=str(e))
+            await asyncio.sleep(self.poll_interval)
+
+    async def _recover(self):
+        """Fails commands a previous daemon left running, and expires requests nobody picked up in time."""
+        now = utcnow()
+        cutoff = now - datetime.timedelta(seconds=self.command_ttl_seconds)
+        async with self.session_factory() as session:
+            await session.execute(
+                update(ControlCommand)
+                .where(ControlCommand.status == RUNNING)
+                .values(status=FAILED, message="Interrupted by a daemon restart", finished_at=now)
+            )
+            await session.execute(
+                update(ControlCommand)
+                .where(ControlCommand.status == QUEUED, ControlCommand.created_at < cutoff)
+                .values(status=FAILED, message="Expired before the daemon picked it up", finished_at=now)
+            )
+            await session.commit()
+
+    async def _dispatch_queued(self):
+        async with self.session_factory() as session:
+            stmt = select(ControlCommand.id).where(ControlCommand.status == QUEUED).order_by(ControlCommand.id)
+            command_ids = (await session.execute(stmt)).scalars().all()
+
+        for command_id in command_ids:
+            # Claim with a conditional update so a command is never started twice
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    update(ControlCommand)
+                    .where(ControlCommand.id == command_id, ControlCommand.status == QUEUED)
+                    .values(status=RUNNING, started_at=utcnow(), message="Starting")
+                )
+                await session.commit()
+                if result.rowcount != 1:
+                    continue
+                cmd = await session.get(ControlCommand, command_id)
+
+            task = asyncio.create_task(self._execute(cmd))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, cmd: ControlCommand):
+        logger.info("control_command_started", command_id=cmd.id, command=cmd.command, agent_id=cmd.agent_id)
+        try:
+            if cmd.command not in (RUN_AGENT, PROFILE_AGENT):
+                await self._update(cmd.id, status=FAILED, message=f"Unknown command: {cmd.command}", finished_at=utcnow())
+                return
+            await self._run_agent(cmd, profile=cmd.command == PROFILE_AGENT)
+        except Exception as e:
+            logger.error("control_command_failed", command_id=cmd.id, error=str(e))
+            await self._update(cmd.id, status=FAILED, message=str(e)[:500], finished_at=utcnow())
+
+    async def _run_agent(self, cmd: ControlCommand, profile: bool = False):
+        agent_cfg = await self.manager.load_agent(cmd.agent_id)
+        if agent_cfg is None:
+            await self._update(cmd.id, status=FAILED, message="Profile not found", finished_at=utcnow())
+            return
+
+        if self.enqueue_agent:
+            if profile:
+                message = "Runs are split across queue workers (WORK_QUEUE_ENABLED), so they can't be profiled"
+                await self._update(cmd.id, status=FAILED, message=message, finished_at=utcnow())
+                return
+            jobs = await self.enqueue_agent(cmd.agent_id)
+            message = f"Queued {jobs} searches for the workers" if jobs else "A run is already queued"
+            await self._update(cmd.id, status=DONE, message=message, searches_total=jobs, finished_at=utcnow())
+            return
+
+        async def progress(done: int, total: int, new_listings: int):
+            await self._update(
+                cmd.id,
+                message=f"Searched {done} of {total}",
+                searches_done=done,
+                searches_total=total,
+                new_listings=new_listings,
+            )
+
+        await self._update(cmd.id, message="Waiting for a free run slot")
+        ran = await self.manager.run_agent(agent_cfg, force=True, progress=progress, profile=profile)
+        if not ran:
+            await self._update(cmd.id, status=DONE, message="Already running; results will appear shortly", finished_at=utcnow())
+            return
+        message = "Finished"
+        if profile:
+            path = await self.manager.run_log.latest_profile(agent_cfg.id)
+            message = f"Finished; profile saved to {path}" if path else "Finished; no profile was captured"
+        await self._update(cmd.id, status=DONE, message=message, finished_at=utcnow())
+        logger.info("control_command_finished", command_id=cmd.id)
+
+    async def _update(self, command_id: int, **values):
+        async with self.session_factory() as session:
+            await session.execute(update(ControlCommand).where(ControlCommand.id == command_id).values(**values))
+            await session.commit()
@@ -1,123 +1,323 @@
-from typing import Tuple
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from rapidfuzz import fuzz
-from src.data.base_provider import RawListing
-from src.utils.config import AgentParameters
+from src.data.base_provider import ListingRecord
+from src.utils.config import AgentParameters, VehicleCriteria
 import structlog
 
 logger = structlog.get_logger()
 
+# A rule returns the score it contributes, or None to reject the listing.
+Rule = Callable[[ListingRecord, AgentParameters], Optional[float]]
+
+# Rough cost of each rule in nanoseconds (the unit of the measured timings), used to order rules
+# before any timings have been collected.
+STATIC_COST_NS = {
+    "price": 100,
+    "mileage": 100,
+    "year": 100,
+    "vehicle_year_bounds": 200,
+    "exclude_keywords": 300,
+    "make": 2000,
+    "model": 2000,
+    "vehicles": 5000,
+    "features_any": 300,
+}
+
+# With stats on, one evaluation in this many per rule is timed; counts are kept for all of them
+TIMING_SAMPLE = 16
+
+# The fuzzy make/model matches. Every other rule is a cheap check on a single field.
+FUZZY_RULES = frozenset({"vehicles", "make", "model"})
+
+
+@dataclass
+class FilterResult:
+    is_match: bool
+    score: float
+    # The entry of params.vehicles the listing matched (vehicle mode only)
+    vehicle: Optional[VehicleCriteria] = None
+    # The rule that rejected the listing
+    rejected_by: Optional[str] = None
+
+    @property
+    def passed_cheap_checks(self) -> bool:
+        """Matched, or rejected only by a fuzzy make/model match."""
+        return self.rejected_by is None or self.rejected_by in FUZZY_RULES
+
+
+@dataclass
+class RuleStats:
+    evaluations: int = 0
+    rejections: int = 0
+    timed: int = 0
+    time_ns: int = 0
+
+    @property
+    def rejection_rate(self) -> float:
+        return self.rejections / self.evaluations if self.evaluations else 0.0
+
+    @property
+    def avg_ns(self) -> float:
+        return self.time_ns / self.timed if self.timed else 0.0
+
+
 class FilterEngine:
-    def __init__(self):
-        pass
+    def __init__(self, adaptive_order: bool = False, collect_stats: bool = False, reorder_interval: int = 1000):
+        """
+        adaptive_order: run the independent hard filters cheapest/most selective first
+            (re-ranked from the observed per-rule cost and rejection rate every `reorder_interval` evaluations).
+            Every rule contributes a fixed amount to the score, so the order never changes the result.
+        collect_stats: keep per-rule evaluation and rejection counters and sampled timings (see `stats()`).
+            Always on with adaptive_order, which ranks rules by them.
+        """
+        self.adaptive_order = adaptive_order
+        self.collect_stats = collect_stats or adaptive_order
+        self.reorder_interval = reorder_interval
+        self._rules: Dict[str, Rule] = {
+            "vehicles": self._rule_vehicles,
+            "vehicle_year_bounds": self._rule_vehicle_year_bounds,
+            "make": self._rule_make,
+            "model": self._rule_model,
+            "year": self._rule_year,
+            "price": self._rule_price,
+            "mileage": self._rule_mileage,
+            "exclude_keywords": self._rule_exclude_keywords,
+            "features_any": self._rule_features_any,
+        }
+        self._stats: Dict[str, RuleStats] = {name: RuleStats() for name in self._rules}
+        self._year_bounds_cache: Dict[int, Tuple[AgentParameters, Optional[int], Optional[int]]] = {}
+        self._since_reorder = 0
+        # Set by the vehicles rule during check(), which never awaits, so evaluations cannot interleave
+        self._matched_vehicle: Optional[VehicleCriteria] = None
+
+        # Static order: cheap numeric checks before the fuzzy matches. vehicle_year_bounds rejects years no
+        # vehicle accepts before paying for a fuzzy match. features_any only ever adds score, so it always runs last.
+        self._vehicle_order = ["vehicle_year_bounds", "price", "mileage", "exclude_keywords", "vehicles"]
+        self._criteria_order = ["year", "price", "mileage", "exclude_keywords", "make", "model"]
+        if adaptive_order:
+            self._reorder()
 
-    def evaluate(self, listing: RawListing, params: AgentParameters) -> Tuple[bool, float]:
+    def evaluate(self, listing: ListingRecord, params: AgentParameters) -> Tuple[bool, float]:
         """
         Evaluates a listing against agent parameters.
         Returns (is_match, score).
         """
+        result = self.check(listing, params)
+        return result.is_match, result.score
+
+    def check(self, listing: ListingRecord, params: AgentParameters) -> FilterResult:
+        """Like evaluate, plus the vehicle that matched and the rule that rejected the listing."""
+        order = self._vehicle_order if params.vehicles else self._criteria_order
+        self._matched_vehicle = None
+
         score = 0.0
-        
-        # 0. Multi-Vehicle Criteria Match
-        if params.vehicles:
-            vehicle_match = False
-            for v in params.vehicles:
-                m_match = False
-                if listing.make and fuzz.partial_ratio(v.make.lower(), listing.make.lower()) > 90:
-                    m_match = True
-                elif not listing.make and fuzz.partial_ratio(v.make.lower(), listing.title.lower()) > 90:
-                    m_match = True
-                
-                if not m_match: continue
-                
-                mod_match = False
-                # Use a stricter check for model to avoid cross-matching (e.g. "Bronco" matching "Raptor" via some shared keyword)
-                # We check if the model name exists as a word in the title or model field
-                model_lower = v.model.lower()
-                target_text = (listing.model or listing.title).lower()
-                
-                if model_lower in target_text:
-                    mod_match = True
-                elif fuzz.partial_ratio(model_lower, target_text) > 90:
-                    mod_match = True
-                
-                if not mod_match: continue
-                
-                # Year check for this specific vehicle
-                if listing.year:
-                    if v.year_min and listing.year < v.year_min: continue
-                    if v.year_max and listing.year > v.year_max: continue
-                
-                vehicle_match = True
-                score += 30.0 # Combined make/model score
-                break
-            
-            if not vehicle_match:
-                return False, 0.0
+        for name in order:
+            points = self._run_rule(name, listing, params)
+            if points is None:
+                self._after_evaluation()
+                return FilterResult(False, 0.0, rejected_by=name)
+            score += points
+
+        score += self._run_rule("features_any", listing, params)
+        self._after_evaluation()
+        return FilterResult(True, score, vehicle=self._matched_vehicle)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-rule counters, e.g. {"price": {"evaluations": 10, "rejections": 4, ...}}."""
+        return {
+            name: {
+                "evaluations": s.evaluations,
+                "rejections": s.rejections,
+                "rejection_rate": round(s.rejection_rate, 4),
+                "avg_us": round(s.avg_ns / 1000, 3),
+                "total_ms": round(s.avg_ns * s.evaluations / 1e6, 3), # estimated from the sampled timings
+            }
+            for name, s in self._stats.items()
+            if s.evaluations
+        }
+
+    def rule_order(self) -> Dict[str, List[str]]:
+        return {"vehicles": list(self._vehicle_order), "criteria": list(self._criteria_order)}
+
+    def reset_stats(self):
+        self._stats = {name: RuleStats() for name in self._rules}
+        self._since_reorder = 0
+
+    def _run_rule(self, name: str, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
+        if not self.collect_stats:
+            return self._rules[name](listing, params)
+
+        stats = self._stats[name]
+        if stats.evaluations % TIMING_SAMPLE:
+            points = self._rules[name](listing, params)
         else:
-            # 1. Make Match (Fuzzy)
-            if params.makes:
-                make_match = False
-                for make in params.makes:
-                    if listing.make and fuzz.partial_ratio(make.lower(), listing.make.lower()) > 90:
-                        make_match = True
-                        break
-                    # Fallback to title check if make is not explicitly parsed
-                    if not listing.make and fuzz.partial_ratio(make.lower(), listing.title.lower()) > 90:
-                        make_match = True
-                        break
-                if not make_match:
-                    return False, 0.0
-                score += 10.0
-
-            # 2. Model Match (Fuzzy)
-            if params.models:
-                model_match = False
-                for model in params.models:
-                    if listing.model and fuzz.partial_ratio(model.lower(), listing.model.lower()) > 85:
-                        model_match = True
-                        break
-                    if not listing.model and fuzz.partial_ratio(model.lower(), listing.title.lower()) > 85:
-                        model_match = True
-                        break
-                if not model_match:
-                    return False, 0.0
-                score += 20.0
-
-            # 3. Year Range
+            start = time.perf_counter_ns()
+            points = self._rules[name](listing, params)
+            stats.time_ns += time.perf_counter_ns() - start
+            stats.timed += 1
+        stats.evaluations += 1
+        if points is None:
+            stats.rejections += 1
+        return points
+
+    def _after_evaluation(self):
+        if not self.adaptive_order:
+            return
+        self._since_reorder += 1
+        if self._since_reorder >= self.reorder_interval:
+            self._since_reorder = 0
+            self._reorder()
+
+    def _reorder(self):
+        # Rank by expected nanoseconds per rejection (cost / P(reject)). Until a rule has samples we fall back
+        # to its static cost and assume it rejects rarely, so the fuzzy matches start at the back.
+        def rank(name: str) -> float:
+            s = self._stats[name]
+            if s.evaluations < 50 or not s.timed:
+                return STATIC_COST_NS[name] / 0.05
+            return (s.avg_ns or 1.0) / max(s.rejection_rate, 1e-3)
+
+        self._vehicle_order.sort(key=rank)
+        self._criteria_order.sort(key=rank)
+
+    # --- Rules -----------------------------------------------------------------------------------
+
+    def match_vehicle(self, listing: ListingRecord, params: AgentParameters) -> Optional[VehicleCriteria]:
+        """The first of params.vehicles this listing matches, if any."""
+        # 0. Multi-Vehicle Criteria Match
+        for v in params.vehicles:
+            m_match = False
+            if listing.make and fuzz.partial_ratio(v.make.lower(), listing.make.lower()) > 90:
+                m_match = True
+            elif not listing.make and fuzz.partial_ratio(v.make.lower(), listing.title.lower()) > 90:
+                m_match = True
+
+            if not m_match: continue
+
+            mod_match = False
+            # Use a stricter check for model to avoid cross-matching (e.g. "Bronco" matching "Raptor" via some shared keyword)
+            # We check if the model name exists as a word in the title or model field
+            model_lower = v.model.lower()
+            target_text = (listing.model or listing.title).lower()
+
+            if model_lower in target_text:
+                mod_match = True
+            elif fuzz.partial_ratio(model_lower, target_text) > 90:
+                mod_match = True
+
+            if not mod_match: continue
+
+            # Year check for this specific vehicle
             if listing.year:
-                if params.year_min and listing.year < params.year_min:
-                    return False, 0.0
-                if params.year_max and listing.year > params.year_max:
-                    return False, 0.0
-                score += 5.0
+                if v.year_min and listing.year < v.year_min: continue
+                if v.year_max and listing.year > v.year_max: continue
+
+            return v
 
+        return None
+
+    def _rule_vehicles(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
+        self._matched_vehicle = self.match_vehicle(listing, params)
+        if self._matched_vehicle is None:
+            return None
+        return 30.0 # Combined make/model score
+
+    def _rule_vehicle_year_bounds(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
+        if not listing.year:
+            return 0.0
+        lo, hi = self._vehicle_year_bounds(params)
+        if lo and listing.year < lo:
+            return None
+        if hi and listing.year > hi:
+            return None
+        return 0.0
+
+    def _vehicle_year_bounds(self, params: AgentParameters) -> Tuple[Optional[int], Optional[int]]:
+        """Loosest year range accepted by any vehicle; None where at least one vehicle is unbounded."""
+        cached = self._year_bounds_cache.get(id(params))
+        if cached and cached[0] is params:
+            return cached[1], cached[2]
+
+        mins = [v.year_min for v in params.vehicles]
+        maxs = [v.year_max for v in params.vehicles]
+        lo = None if not all(mins) else min(mins)
+        hi = None if not all(maxs) else max(maxs)
+
+        if len(self._year_bounds_cache) > 64:
+            self._year_bounds_cache.clear()
+        # Keep a reference to params so a recycled id() can never return another agent's bounds.
+        self._year_bounds_cache[id(params)] = (params, lo, hi)
+        return lo, hi
+
+    def _rule_make(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
+        # 1. Make Match (Fuzzy)
+        if not params.makes:
+            return 0.0
+        for make in params.makes:
+            if listing.make and fuzz.partial_ratio(make.lower(), listing.make.lower()) > 90:
+                return 10.0
+            # Fallback to title check if make is not explicitly parsed
+            if not listing.make and fuzz.partial_ratio(make.lower(), listing.title.lower()) > 90:
+                return 10.0
+        return None
+
+    def _rule_model(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
+        # 2. Model Match (Fuzzy)
+        if not params.models:
+            return 0.0
+        for model in params.models:
+            if listing.model and fuzz.partial_ratio(model.lower(), listing.model.lower()) > 85:
+                return 20.0
+            if not listing.model and fuzz.partial_ratio(model.lower(), listing.title.lower()) > 85:
+                return 20.0
+        return None
+
+    def _rule_year(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
+        # 3. Year Range
+        if not listing.year:
+            return 0.0
+        if params.year_min and listing.year < params.year_min:
+            return None
+        if params.year_max and listing.year > params.year_max:
+            return None
+        return 5.0
+
+    def _rule_price(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
         # 4. Price Range
-        if listing.price:
-            if params.price_max and listing.price > params.price_max:
-                return False, 0.0
-            score += 10.0
+        if not listing.price:
+            return 0.0
+        if params.price_max and listing.price > params.price_max:
+            return None
+        return 10.0
 
+    def _rule_mileage(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
         # 5. Mileage Range
-        if listing.mileage:
-            if params.mileage_max and listing.mileage > params.mileage_max:
-                return False, 0.0
-            score += 5.0
+        if not listing.mileage:
+            return 0.0
+        if params.mileage_max and listing.mileage > params.mileage_max:
+            return None
+        return 5.0
 
+    def _rule_exclude_keywords(self, listing: ListingRecord, params: AgentParameters) -> Optional[float]:
         # 6. Exclude Keywords
         if params.exclude_keywords:
+            title = listing.title.lower()
             for kw in params.exclude_keywords:
-                if kw.lower() in listing.title.lower():
-                    return False, 0.0
+                if kw.lower() in title:
+                    return None
+        return 0.0
 
+    def _rule_features_any(self, listing: ListingRecord, params: AgentParameters) -> float:
         # 7. Features (Any)
+        # We don't necessarily fail if features_any isn't met,
+        # unless the user intended it as a hard filter.
+        # For now, we treat it as a score booster.
+        score = 0.0
         if params.features_any:
-            feature_found = False
+            title = listing.title.lower()
             for feature in params.features_any:
-                if feature.lower() in listing.title.lower():
-                    feature_found = True
+                if feature.lower() in title:
                     score += 5.0
-            # We don't necessarily fail if features_any isn't met, 
-            # unless the user intended it as a hard filter. 
-            # For now, we treat it as a score booster.
-
-        return True, score
+        return score
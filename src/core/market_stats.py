@@ -0,0 +1,303 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.data.base_provider import ListingRecord
+from src.storage.database import MarketObservation, MarketStat
+from src.utils.config import VehicleCriteria
+import structlog
+
+logger = structlog.get_logger()
+
+# Listings are grouped into 3-model-year bands (e.g. 2021-2023) so rare cars still collect enough samples.
+YEAR_BAND = 3
+# Below this many observations a percentile says more about noise than about the market.
+MIN_SAMPLES = 10
+# Listings observed by this process are remembered up to this many, then looked up in market_observations again
+_OBSERVED_CACHE_SIZE = 200_000
+
+# (make, model, year, price, mileage) of one scraped card
+Observation = Tuple[str, str, int, Optional[float], Optional[int]]
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with relative-error guarantees (DDSketch-style logarithmic buckets).
+
+    Every value lands in bucket ceil(log_gamma(value)), so any reported quantile is within
+    `relative_accuracy` of the true value. Prices from $5k to $5M need ~350 buckets at 1%,
+    and the counts are stored as one dense list, which keeps a sketch to a few hundred bytes of JSON.
+    Sketches are mergeable, so concurrent writers can fold their deltas into the stored one.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.offset = 0
+        self.counts: List[int] = []
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.counts)
+
+    def add(self, value: float, weight: int = 1):
+        if value <= 0:
+            self.zero_count += weight
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self._grow_to(index)
+        self.counts[max(0, index - self.offset)] += weight
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        self.zero_count += other.zero_count
+        for i, c in enumerate(other.counts):
+            if c:
+                self._grow_to(other.offset + i)
+                self.counts[max(0, other.offset + i - self.offset)] += c
+
+    def rank(self, value: float) -> float:
+        """Fraction of observed values <= value (0.0 - 1.0)."""
+        total = self.count
+        if not total:
+            return 0.0
+        if value <= 0:
+            return self.zero_count / total
+        index = math.ceil(math.log(value) / self._log_gamma)
+        below = self.zero_count + sum(self.counts[: max(0, index - self.offset + 1)])
+        return below / total
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if not total:
+            return None
+        target = q * (total - 1)
+        seen = self.zero_count
+        if target < seen:
+            return 0.0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen > target:
+                # Midpoint of the bucket in log space
+                return 2 * self._gamma ** (self.offset + i) / (self._gamma + 1)
+        return 2 * self._gamma ** (self.offset + len(self.counts) - 1) / (self._gamma + 1)
+
+    def _grow_to(self, index: int):
+        if not self.counts:
+            self.offset = index
+            self.counts = [0]
+            return
+        if index < self.offset:
+            self.counts[:0] = [0] * (self.offset - index)
+            self.offset = index
+        elif index >= self.offset + len(self.counts):
+            self.counts.extend([0] * (index - self.offset - len(self.counts) + 1))
+
+        # Collapse the lowest buckets if the range gets out of hand (keeps the upper quantiles exact).
+        while len(self.counts) > self.max_buckets:
+            lowest = self.counts.pop(0)
+            self.offset += 1
+            self.counts[0] += lowest
+
+    def to_dict(self) -> dict:
+        return {"a": self.relative_accuracy, "o": self.offset, "z": self.zero_count, "c": self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "QuantileSketch":
+        if not data:
+            return cls()
+        sketch = cls(relative_accuracy=data.get("a", 0.01))
+        sketch.offset = data.get("o", 0)
+        sketch.zero_count = data.get("z", 0)
+        sketch.counts = list(data.get("c", []))
+        return sketch
+
+
+def year_band(year: Optional[int]) -> Optional[str]:
+    if not year:
+        return None
+    start = int(year) // YEAR_BAND * YEAR_BAND
+    return f"{start}-{start + YEAR_BAND - 1}"
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", value.lower())
+
+
+def market_key(make: Optional[str], model: Optional[str], year: Optional[int]) -> Optional[str]:
+    band = year_band(year)
+    if not make or not model or not band:
+        return None
+    return f"{_slug(make)}|{_slug(model)}|{band}"
+
+
+class _Entry:
+    __slots__ = ("price", "mileage", "make", "model", "band")
+
+    def __init__(self, make: str, model: str, band: str, price: QuantileSketch, mileage: QuantileSketch):
+        self.make = make
+        self.model = model
+        self.band = band
+        self.price = price
+        self.mileage = mileage
+
+
+class MarketBatch:
+    """
+    The observations one ingest staged in its transaction. They reach the in-memory state only
+    through MarketStats.committed, so a rolled-back transaction leaves nothing behind.
+    """
+    __slots__ = ("external_ids", "deltas", "merged")
+
+    def __init__(self):
+        self.external_ids: List[str] = []
+        # Per market key: the sketches of this batch's observations, then (after flush) the merged rows
+        self.deltas: Dict[str, _Entry] = {}
+        self.merged: Dict[str, _Entry] = {}
+
+
+class MarketStats:
+    """
+    Per-(make, model, year band) price and mileage distributions, cached in memory and
+    persisted to the market_stats table. An ingest stages its observations in a MarketBatch
+    and merges them into the stored rows on flush, so several processes can update the same key.
+    Every scraped card with a known market that passes the agent's cheap checks (year, price,
+    mileage, keywords) is observed, matched or not, and each listing only once however often
+    it is re-scraped (see observe_listings).
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        # Listings whose observation has been committed, and those staged by transactions still open
+        self._observed: set = set()
+        self._pending: set = set()
+
+    async def _entry(self, session: AsyncSession, key: str, make: str, model: str, band: str) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is None:
+            row = await session.get(MarketStat, key)
+            entry = _Entry(
+                make, model, band,
+                QuantileSketch.from_dict(row.price_sketch if row else None),
+                QuantileSketch.from_dict(row.mileage_sketch if row else None),
+            )
+            self._entries[key] = entry
+        return entry
+
+    async def deal_score(self, session: AsyncSession, make: str, model: str, year: int,
+                         price: Optional[float], mileage: Optional[int]) -> Optional[float]:
+        """
+        0-100, higher is a better deal: how much of the market is more expensive (and, when known,
+        has more miles) than this car. None when the price is unknown or the market is too thin.
+        """
+        key = market_key(make, model, year)
+        if not key or not price:
+            return None
+        entry = await self._entry(session, key, make, model, year_band(year))
+        if entry.price.count < MIN_SAMPLES:
+            return None
+
+        price_rank = entry.price.rank(price)
+        if mileage and entry.mileage.count >= MIN_SAMPLES:
+            percentile = 0.7 * price_rank + 0.3 * entry.mileage.rank(mileage)
+        else:
+            percentile = price_rank
+        return round(100 * (1 - percentile), 1)
+
+    async def observe_listings(self, session: AsyncSession, cards: Dict[str, Observation]) -> MarketBatch:
+        """
+        Stages each card (keyed by external id) unless that listing is already in market_observations
+        or observed by this process, and records it there within the caller's transaction.
+        """
+        batch = MarketBatch()
+        ids = [external_id for external_id in cards if external_id not in self._observed and external_id not in self._pending]
+        recorded = set()
+        for start in range(0, len(ids), 500):
+            result = await session.execute(
+                select(MarketObservation.external_id).where(MarketObservation.external_id.in_(ids[start:start + 500]))
+            )
+            recorded.update(result.scalars())
+
+        for external_id in ids:
+            # Re-checked: another agent's ingest in this process may have staged it during the lookup
+            if external_id in recorded or external_id in self._observed or external_id in self._pending:
+                continue
+            make, model, year, price, mileage = cards[external_id]
+            key = market_key(make, model, year)
+            if not key:
+                continue
+            delta = batch.deltas.get(key)
+            if delta is None:
+                delta = batch.deltas[key] = _Entry(make, model, year_band(year), QuantileSketch(), QuantileSketch())
+            if price:
+                delta.price.add(price)
+            if mileage:
+                delta.mileage.add(mileage)
+            batch.external_ids.append(external_id)
+            self._pending.add(external_id)
+            session.add(MarketObservation(external_id=external_id, market_key=key))
+        return batch
+
+    async def flush(self, session: AsyncSession, batch: MarketBatch):
+        """Merges the batch's observations into market_stats within the caller's transaction."""
+        for key, delta in batch.deltas.items():
+            row = await session.get(MarketStat, key, with_for_update=True, populate_existing=True)
+            if row is None:
+                row = MarketStat(key=key, make=delta.make, model=delta.model, year_band=delta.band)
+                session.add(row)
+            price = QuantileSketch.from_dict(row.price_sketch)
+            price.merge(delta.price)
+            mileage = QuantileSketch.from_dict(row.mileage_sketch)
+            mileage.merge(delta.mileage)
+            row.price_sketch = price.to_dict()
+            row.mileage_sketch = mileage.to_dict()
+            row.count = price.count
+            batch.merged[key] = _Entry(delta.make, delta.model, delta.band, price, mileage)
+
+    def committed(self, batch: MarketBatch):
+        """Call once the batch's transaction committed: caches the merged sketches and its listings as observed."""
+        self._pending.difference_update(batch.external_ids)
+        if len(self._observed) > _OBSERVED_CACHE_SIZE:
+            self._observed.clear()
+        self._observed.update(batch.external_ids)
+        self._entries.update(batch.merged)
+
+    def discard(self, batch: MarketBatch):
+        """Call when the batch's transaction rolled back: its listings can be observed again."""
+        self._pending.difference_update(batch.external_ids)
+
+    def forget(self):
+        """Drops cached sketches so the next lookup re-reads what other processes wrote."""
+        self._entries = {}
+
+
+def summarize(row: Optional[MarketStat]) -> Optional[Dict[str, Optional[float]]]:
+    """p25/median/p75 of a stored market_stats row, for display."""
+    if row is None:
+        return None
+    price = QuantileSketch.from_dict(row.price_sketch)
+    mileage = QuantileSketch.from_dict(row.mileage_sketch)
+    return {
+        "count": price.count,
+        "price_p25": price.quantile(0.25),
+        "price_median": price.quantile(0.5),
+        "price_p75": price.quantile(0.75),
+        "mileage_median": mileage.quantile(0.5),
+    }
+
+
+def resolve_make_model(listing: ListingRecord, vehicle: Optional[VehicleCriteria]) -> Optional[Tuple[str, str]]:
+    """
+    The search criteria that matched, so every provider's spelling of a model lands in the same market;
+    the provider's parsed make/model otherwise.
+    """
+    if vehicle is not None:
+        return vehicle.make, vehicle.model
+    if listing.make and listing.model:
+        return listing.make, listing.model
+    return None
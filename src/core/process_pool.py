@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from src.data.base_provider import BaseProvider, ListingRecord
+from src.utils import metrics, tracing
+import structlog
+
+logger = structlog.get_logger()
+
+# Per-process state of a pool worker: its providers and its own event loop, reused across searches
+_providers: Dict[str, BaseProvider] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(settings):
+    global _providers, _loop
+    from src.core.agent_manager import build_providers
+    from src.data.fixtures import fixtures_from_settings
+
+    _providers = build_providers(settings.MARKETCHECK_API_KEY, fixtures_from_settings(settings), settings.HTTP_FAST_PATH)
+    tracing.setup_tracing(settings, "luxelink-search-worker", batch=False)
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+    # Ctrl-C reaches the whole process group; the daemon shuts the pool down, and each worker then
+    # exits through _close_worker instead of dying mid-search
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    """Runs when a worker process exits: closes its providers' browsers and clients, flushes its spans."""
+    try:
+        for source, provider in _providers.items():
+            try:
+                _loop.run_until_complete(provider.close())
+            except Exception as e:
+                logger.warn("worker_provider_close_failed", source=source, error=str(e))
+        _loop.close()
+        tracing.shutdown_tracing()
+    finally:
+        # Drops this process's live gauges (open browser contexts) from the aggregated /metrics
+        metrics.mark_process_dead(os.getpid())
+
+
+def _search_in_worker(source: str, params: dict, trace_carrier: dict) -> Tuple[List[Tuple], dict]:
+    with tracing.attached(trace_carrier), metrics.counting_search() as counters:
+        listings = _loop.run_until_complete(_providers[source].search(params))
+    # Tuples pickle far smaller and faster than dataclass instances
+    return [listing.to_row() for listing in listings], counters.to_dict()
+
+
+class ProcessSearchPool:
+    """
+    Runs provider searches in N worker processes, each with its own event loop and browsers,
+    so page parsing uses every core. Listings come back over the executor's pipe as plain tuples;
+    filtering, dedup, storage and notifications stay in the calling process.
+    """
+
+    def __init__(self, processes: int, settings):
+        self.processes = processes
+        # spawn: Playwright and asyncio state must not be inherited through fork
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings,),
+        )
+        logger.info("search_process_pool_started", processes=processes)
+        if settings.METRICS_PORT and not metrics.multiprocess_enabled():
+            logger.warn("search_process_metrics_not_collected",
+                           reason="set PROMETHEUS_MULTIPROC_DIR to include the worker processes' metrics in /metrics")
+
+    async def search(self, source: str, params: dict) -> List[ListingRecord]:
+        loop = asyncio.get_running_loop()
+        rows, counts = await loop.run_in_executor(
+            self._executor, _search_in_worker, source, params, tracing.context_carrier()
+        )
+        # The worker's page loads and blocks count towards the calling search's run stats
+        counters = metrics.current_search_counters()
+        if counters is not None:
+            counters.merge(counts)
+        return [ListingRecord.from_row(row) for row in rows]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,185 @@
+import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert, select, update
+from src.core.search_plan import SearchTask
+from src.storage.database import Listing, Run, RunSearch, RunSourceStat, utcnow
+from src.utils.metrics import SearchCounters
+import structlog
+
+logger = structlog.get_logger()
+
+RUNNING = "running"
+COMPLETED = "completed"
+ABANDONED = "abandoned"
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+DEFERRED = "deferred"
+SKIPPED = "skipped"
+
+
+class SourceStats:
+    """A run's search stats per (source, vehicle), kept in memory and saved in one insert by RunLog.save_source_stats."""
+
+    def __init__(self, run_id: int, agent_id: str):
+        self.run_id = run_id
+        self.agent_id = agent_id
+        self._rows: Dict[Tuple[str, str], dict] = {}
+
+    def add(self, task: SearchTask, duration: float, counters: SearchCounters, cards: int = 0,
+            new_listings: int = 0, error: bool = False):
+        key = (task.source, task.vehicle_key)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = dict(
+                run_id=self.run_id, agent_id=self.agent_id, source=task.source, vehicle_key=task.vehicle_key,
+                started_at=utcnow() - datetime.timedelta(seconds=duration), searches=0, duration_seconds=0.0,
+                pages_loaded=0, cards_parsed=0, matches=0, new_listings=0, errors=0, blocks=0,
+            )
+        row["searches"] += 1
+        row["duration_seconds"] += duration
+        row["pages_loaded"] += counters.pages_loaded
+        row["matches"] += counters.matches
+        row["blocks"] += counters.blocks
+        row["cards_parsed"] += cards
+        row["new_listings"] += new_listings
+        row["errors"] += int(error)
+
+    def rows(self) -> List[dict]:
+        return list(self._rows.values())
+
+
+class RunLog:
+    """
+    Durable state of in-process agent runs (`runs` + `run_searches`).
+
+    A run records its planned searches up front. Each finished search is checkpointed in the same
+    transaction that stores its new listings and queues their alerts (see `checkpoint`), so after a
+    crash the run resumes at its first pending search and no listing or alert is lost.
+    """
+
+    def __init__(self, session_factory, resume_max_age_hours: int = 12):
+        self.session_factory = session_factory
+        self.resume_max_age_hours = resume_max_age_hours
+
+    async def start(self, agent_id: str, tasks: List[SearchTask]) -> Run:
+        async with self.session_factory() as session:
+            run = Run(agent_id=agent_id, status=RUNNING, started_at=utcnow(), resumed_count=0)
+            session.add(run)
+            await session.flush()
+            rows = [
+                RunSearch(
+                    run_id=run.id,
+                    seq=seq,
+                    source=task.source,
+                    vehicle_key=task.vehicle_key,
+                    task_json=task.to_dict(),
+                    status=PENDING,
+                    listings_found=0,
+                )
+                for seq, task in enumerate(tasks)
+            ]
+            session.add_all(rows)
+            await session.commit()
+
+        for task, row in zip(tasks, rows):
+            task.checkpoint_id = row.id
+        return run
+
+    async def find_unfinished(self, agent_id: str) -> Optional[Run]:
+        """The agent's latest run left running by a previous process, if it is recent enough to resume."""
+        async with self.session_factory() as session:
+            stmt = (
+                select(Run)
+                .where(Run.agent_id == agent_id, Run.status == RUNNING)
+                .order_by(Run.id.desc())
+            )
+            runs = (await session.execute(stmt)).scalars().all()
+            if not runs:
+                return None
+
+            cutoff = utcnow() - datetime.timedelta(hours=self.resume_max_age_hours)
+            latest = runs[0]
+            stale = [run.id for run in runs if run is not latest or run.started_at < cutoff]
+            if stale:
+                await session.execute(
+                    update(Run).where(Run.id.in_(stale)).values(status=ABANDONED, finished_at=utcnow())
+                )
+                await session.commit()
+                logger.info("stale_runs_abandoned", agent_id=agent_id, run_ids=stale)
+            return None if latest.id in stale else latest
+
+    async def resume(self, run: Run) -> List[SearchTask]:
+        """Pending searches of an interrupted run, in their original order."""
+        async with self.session_factory() as session:
+            await session.execute(update(Run).where(Run.id == run.id).values(resumed_count=Run.resumed_count + 1))
+            stmt = (
+                select(RunSearch)
+                .where(RunSearch.run_id == run.id, RunSearch.status == PENDING)
+                .order_by(RunSearch.seq)
+            )
+            rows = (await session.execute(stmt)).scalars().all()
+            await session.commit()
+
+        tasks = []
+        for row in rows:
+            task = SearchTask.from_dict(row.task_json)
+            task.checkpoint_id = row.id
+            tasks.append(task)
+        return tasks
+
+    async def checkpoint(self, session, task: SearchTask, listings_found: int, new_listings: List[Listing]):
+        """Marks the search done inside the caller's ingest transaction (new listings must be flushed)."""
+        if task.checkpoint_id is None:
+            return
+        await session.execute(
+            update(RunSearch)
+            .where(RunSearch.id == task.checkpoint_id)
+            .values(
+                status=DONE,
+                listings_found=listings_found,
+                new_listing_ids=[listing.id for listing in new_listings],
+                finished_at=utcnow(),
+            )
+        )
+
+    async def mark(self, tasks: List[SearchTask], status: str, error: Optional[str] = None):
+        ids = [task.checkpoint_id for task in tasks if task.checkpoint_id is not None]
+        if not ids:
+            return
+        async with self.session_factory() as session:
+            await session.execute(
+                update(RunSearch).where(RunSearch.id.in_(ids)).values(status=status, error=error, finished_at=utcnow())
+            )
+            await session.commit()
+
+    async def finish(self, run_id: int):
+        async with self.session_factory() as session:
+            await session.execute(
+                update(Run).where(Run.id == run_id).values(status=COMPLETED, finished_at=utcnow())
+            )
+            await session.commit()
+
+    async def save_source_stats(self, stats: SourceStats):
+        rows = stats.rows()
+        if not rows:
+            return
+        async with self.session_factory() as session:
+            await session.execute(insert(RunSourceStat), rows)
+            await session.commit()
+
+    async def attach_profile(self, run_id: int, path: str):
+        async with self.session_factory() as session:
+            await session.execute(update(Run).where(Run.id == run_id).values(profile_path=path))
+            await session.commit()
+
+    async def latest_profile(self, agent_id: str) -> Optional[str]:
+        async with self.session_factory() as session:
+            stmt = (
+                select(Run.profile_path)
+                .where(Run.agent_id == agent_id, Run.profile_path.is_not(None))
+                .order_by(Run.id.desc())
+                .limit(1)
+            )
+            return (await session.execute(stmt)).scalar_one_or_none()
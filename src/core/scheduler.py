@@ -0,0 +1,144 @@
+import asyncio
+import datetime
+import hashlib
+from typing import Awaitable, Callable, Dict, List, Optional
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import select
+from src.storage.database import Agent
+from src.utils.config import AgentConfig
+from src.utils import metrics
+import structlog
+
+logger = structlog.get_logger()
+
+JOB_PREFIX = "agent:"
+
+
+def stagger_offset(agent_id: str, spread_seconds: int) -> int:
+    """Deterministic per-agent delay in [0, spread_seconds) so agents sharing a cron expression don't start together."""
+    if spread_seconds <= 0:
+        return 0
+    digest = hashlib.sha1(agent_id.encode()).digest()
+    return int.from_bytes(digest[:4], "big") % spread_seconds
+
+
+class AgentScheduler:
+    """
+    Registers one cron job per enabled agent from AgentConfig.schedule.
+    Each run is delayed by a stable per-agent offset (plus optional random jitter), and
+    AgentManager caps how many agent runs execute at once.
+
+    With ADAPTIVE_POLLING the agents are instead checked every POLL_TICK_MINUTES, and each
+    run only performs the searches whose own polling interval is due (see SearchStats).
+    """
+
+    def __init__(self, manager, settings, scheduler: AsyncIOScheduler = None,
+                 run_agent: Optional[Callable[[str], Awaitable[None]]] = None):
+        """run_agent: what a due agent triggers (default: run it in-process; the work queue enqueues it instead)."""
+        self.manager = manager
+        self.settings = settings
+        self.run_agent = run_agent or manager.run_agent_by_id
+        self.scheduler = scheduler or AsyncIOScheduler()
+        self._schedules: Dict[str, str] = {}
+
+    def sync(self, agent_configs: List[AgentConfig]):
+        """Adds, reschedules or removes agent jobs so they match the given configs."""
+        wanted = {cfg.id: cfg for cfg in agent_configs if cfg.enabled}
+
+        for agent_id in list(self._schedules):
+            if agent_id not in wanted:
+                self.scheduler.remove_job(JOB_PREFIX + agent_id)
+                del self._schedules[agent_id]
+                logger.info("agent_unscheduled", agent_id=agent_id)
+
+        for agent_id, cfg in wanted.items():
+            schedule = self._schedule_for(cfg)
+            if self._schedules.get(agent_id) == schedule:
+                continue
+            try:
+                trigger = self._trigger(cfg)
+            except ValueError as e:
+                logger.error("invalid_agent_schedule", agent_id=agent_id, schedule=schedule, error=str(e))
+                continue
+            if self.settings.SCHEDULE_JITTER_SECONDS:
+                trigger.jitter = self.settings.SCHEDULE_JITTER_SECONDS
+
+            self.scheduler.add_job(
+                self._run_scheduled,
+                trigger,
+                args=[agent_id],
+                id=JOB_PREFIX + agent_id,
+                replace_existing=True,
+                coalesce=True,
+                max_instances=1,
+                misfire_grace_time=600,
+            )
+            self._schedules[agent_id] = schedule
+            logger.info(
+                "agent_scheduled",
+                agent_id=agent_id,
+                schedule=schedule,
+                offset_seconds=stagger_offset(agent_id, self.settings.SCHEDULE_SPREAD_SECONDS),
+            )
+
+    def _schedule_for(self, cfg: AgentConfig) -> str:
+        if self.settings.ADAPTIVE_POLLING:
+            return f"every {self.settings.POLL_TICK_MINUTES}m"
+        return cfg.schedule
+
+    def _trigger(self, cfg: AgentConfig):
+        if self.settings.ADAPTIVE_POLLING:
+            return IntervalTrigger(minutes=self.settings.POLL_TICK_MINUTES)
+        return CronTrigger.from_crontab(cfg.schedule)
+
+    async def sync_from_db(self):
+        """Picks up profiles created, toggled or deleted from the dashboard."""
+        async with self.manager.session_factory() as session:
+            result = await session.execute(select(Agent))
+            db_agents = result.scalars().all()
+
+        configs = []
+        for db_agent in db_agents:
+            try:
+                cfg = AgentConfig(**db_agent.config_json)
+            except Exception as e:
+                logger.error("failed_to_parse_agent_config", agent_id=db_agent.id, error=str(e))
+                continue
+            cfg.enabled = db_agent.enabled
+            configs.append(cfg)
+        self.sync(configs)
+
+    def scheduled_agent_ids(self) -> List[str]:
+        return list(self._schedules)
+
+    def start(self):
+        self.scheduler.add_job(
+            self.sync_from_db,
+            "interval",
+            minutes=self.settings.SCHEDULE_REFRESH_MINUTES,
+            id="refresh_agent_schedules",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+        )
+        self.scheduler.add_listener(self._on_job_submitted, EVENT_JOB_SUBMITTED)
+        self.scheduler.start()
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+
+    def _on_job_submitted(self, event):
+        # The per-agent stagger offset is deliberate and not counted; this is time lost in the scheduler itself
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for scheduled in event.scheduled_run_times:
+            metrics.SCHEDULER_LAG_SECONDS.observe(max(0.0, (now - scheduled).total_seconds()))
+
+    async def _run_scheduled(self, agent_id: str):
+        offset = stagger_offset(agent_id, self.settings.SCHEDULE_SPREAD_SECONDS)
+        if offset:
+            await asyncio.sleep(offset)
+        await self.run_agent(agent_id)
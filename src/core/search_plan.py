@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from typing import List, Optional
+from src.utils.config import AgentConfig
+
+# Providers that return every live listing in one request instead of searching per vehicle
+SINGLE_SEARCH_SOURCES = {"bringatrailer"}
+
+
+@dataclass
+class SearchTask:
+    """One provider search for one agent: a single vehicle, or the whole profile."""
+    agent_id: str
+    source: str
+    params: dict
+    vehicle: Optional[dict] = None
+    # RunSearch row this search is checkpointed to, when it runs as part of a tracked run
+    checkpoint_id: Optional[int] = None
+
+    @property
+    def vehicle_key(self) -> str:
+        if not self.vehicle:
+            return "*"
+        return f"{self.vehicle['make']}|{self.vehicle['model']}|{self.vehicle.get('year_min') or ''}|{self.vehicle.get('year_max') or ''}"
+
+    def to_dict(self) -> dict:
+        return {"agent_id": self.agent_id, "source": self.source, "params": self.params, "vehicle": self.vehicle}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SearchTask":
+        return cls(**data)
+
+
+def plan_searches(agent_cfg: AgentConfig) -> List[SearchTask]:
+    """Expands an agent into its provider searches, in source order then vehicle order."""
+    tasks = []
+    params_dict = agent_cfg.parameters.model_dump()
+
+    for source in agent_cfg.sources:
+        # Some providers (like BaT) return all listings at once and don't need per-vehicle loops
+        if source in SINGLE_SEARCH_SOURCES or not agent_cfg.parameters.vehicles:
+            tasks.append(SearchTask(agent_cfg.id, source, params_dict))
+            continue
+
+        # If specific vehicles are defined, we need one search per vehicle
+        for vehicle in agent_cfg.parameters.vehicles:
+            v_params = params_dict.copy()
+            v_params["makes"] = [vehicle.make]
+            v_params["models"] = [vehicle.model]
+            v_params["year_min"] = vehicle.year_min
+            v_params["year_max"] = vehicle.year_max
+            tasks.append(SearchTask(agent_cfg.id, source, v_params, vehicle=vehicle.model_dump()))
+
+    return tasks
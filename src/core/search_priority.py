@@ -0,0 +1,170 @@
+import datetime
+import heapq
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import select
+from src.core.search_plan import SearchTask
+from src.storage.database import SearchStat, utcnow
+import structlog
+
+logger = structlog.get_logger()
+
+# Weight of the latest search in the yield average
+YIELD_ALPHA = 0.3
+# Expected yield of a search that has never run, so new vehicles get tried early
+UNSEEN_YIELD = 1.0
+# Priority added per run a search was deferred, so low-yield searches still run eventually
+DEFERRAL_BOOST = 0.25
+
+StatKey = Tuple[str, str]  # (source, vehicle_key)
+
+
+class SearchQueue:
+    """Priority queue of an agent's searches, highest expected yield first (ties keep plan order)."""
+
+    def __init__(self, tasks: List[SearchTask], stats: Dict[StatKey, SearchStat]):
+        self._heap = []
+        for seq, task in enumerate(tasks):
+            heapq.heappush(self._heap, (-expected_yield(stats.get((task.source, task.vehicle_key))), seq, task))
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def pop(self) -> SearchTask:
+        return heapq.heappop(self._heap)[2]
+
+    def drain(self) -> Iterator[SearchTask]:
+        while self._heap:
+            yield self.pop()
+
+
+def expected_yield(stat: Optional[SearchStat]) -> float:
+    if stat is None or not stat.runs:
+        return UNSEEN_YIELD
+    return stat.yield_ewma + DEFERRAL_BOOST * (stat.deferred_count or 0)
+
+
+def within_budget(tasks: List[SearchTask], stats: Dict[StatKey, SearchStat],
+                  budget_seconds: float) -> Tuple[List[SearchTask], List[SearchTask]]:
+    """
+    Splits prioritised tasks into those whose recorded search times fit the budget and the rest.
+    Searches without history count as the agent's mean search time. The first task always fits.
+    """
+    known = [stat.duration_ewma for stat in stats.values() if stat.runs]
+    unseen = sum(known) / len(known) if known else 0.0
+    spent = 0.0
+    for i, task in enumerate(tasks):
+        stat = stats.get((task.source, task.vehicle_key))
+        cost = stat.duration_ewma if stat is not None and stat.runs else unseen
+        if i and spent + cost > budget_seconds:
+            return tasks[:i], tasks[i:]
+        spent += cost
+    return tasks, []
+
+
+def is_due(stat: Optional[SearchStat], now: datetime.datetime) -> bool:
+    return stat is None or stat.next_due_at is None or stat.next_due_at <= now
+
+
+class SearchStats:
+    """
+    Reads and updates the per-(agent, source, vehicle) yield history in `search_stats`.
+
+    With adaptive polling, each search also gets its own interval: the time in which it is
+    expected to turn up `target_new` new listings at its observed arrival rate, clamped to
+    [min_interval, max_interval] minutes. A search that has not found anything for a while
+    drifts to the maximum; a busy one is polled as often as the minimum allows.
+    """
+
+    def __init__(self, session_factory, adaptive: bool = False, min_interval: float = 60,
+                 max_interval: float = 1440, target_new: float = 1.0):
+        self.session_factory = session_factory
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new = target_new
+
+    def poll_interval(self, arrival_rate: Optional[float]) -> float:
+        """Minutes until the next poll for a search finding `arrival_rate` new listings per day."""
+        if arrival_rate is None:
+            # Not enough history yet; poll again soon to measure it
+            return self.min_interval
+        if arrival_rate <= 0:
+            return self.max_interval
+        minutes = self.target_new / arrival_rate * 24 * 60
+        return min(self.max_interval, max(self.min_interval, minutes))
+
+    def due(self, tasks: List[SearchTask], stats: Dict[StatKey, SearchStat]) -> List[SearchTask]:
+        if not self.adaptive:
+            return tasks
+        now = utcnow()
+        return [task for task in tasks if is_due(stats.get((task.source, task.vehicle_key)), now)]
+
+    async def load(self, agent_id: str) -> Dict[StatKey, SearchStat]:
+        async with self.session_factory() as session:
+            result = await session.execute(select(SearchStat).where(SearchStat.agent_id == agent_id))
+            return {(row.source, row.vehicle_key): row for row in result.scalars()}
+
+    async def record(self, task: SearchTask, new_listings: int, duration: float):
+        async with self.session_factory() as session:
+            stat = await self._get_or_create(session, task)
+            now = utcnow()
+            if stat.runs:
+                stat.yield_ewma = YIELD_ALPHA * new_listings + (1 - YIELD_ALPHA) * stat.yield_ewma
+                stat.duration_ewma = YIELD_ALPHA * duration + (1 - YIELD_ALPHA) * stat.duration_ewma
+            else:
+                stat.yield_ewma = float(new_listings)
+                stat.duration_ewma = duration
+            # Arrival rate needs the gap since the previous search; the first search only finds the backlog
+            if stat.last_run_at is not None:
+                elapsed_days = max((now - stat.last_run_at).total_seconds() / 86400, 1e-3)
+                sample = new_listings / elapsed_days
+                if stat.arrival_rate is None:
+                    stat.arrival_rate = sample
+                else:
+                    stat.arrival_rate = YIELD_ALPHA * sample + (1 - YIELD_ALPHA) * stat.arrival_rate
+            stat.interval_minutes = self.poll_interval(stat.arrival_rate)
+            stat.next_due_at = now + datetime.timedelta(minutes=stat.interval_minutes)
+
+            stat.runs += 1
+            stat.new_listings += new_listings
+            stat.deferred_count = 0
+            stat.last_run_at = now
+            if new_listings:
+                stat.last_new_at = now
+            await session.commit()
+
+    async def postpone(self, tasks: List[SearchTask]):
+        """Holds back failed or blocked searches for the minimum interval instead of retrying them every tick."""
+        if not self.adaptive or not tasks:
+            return
+        async with self.session_factory() as session:
+            due_at = utcnow() + datetime.timedelta(minutes=self.min_interval)
+            for task in tasks:
+                stat = await self._get_or_create(session, task)
+                stat.next_due_at = due_at
+            await session.commit()
+
+    async def record_deferred(self, tasks: List[SearchTask]):
+        if not tasks:
+            return
+        async with self.session_factory() as session:
+            for task in tasks:
+                stat = await self._get_or_create(session, task)
+                stat.deferred_count += 1
+            await session.commit()
+
+    async def _get_or_create(self, session, task: SearchTask) -> SearchStat:
+        stat = await session.get(SearchStat, (task.agent_id, task.source, task.vehicle_key))
+        if stat is None:
+            stat = SearchStat(
+                agent_id=task.agent_id,
+                source=task.source,
+                vehicle_key=task.vehicle_key,
+                runs=0,
+                new_listings=0,
+                yield_ewma=0.0,
+                duration_ewma=0.0,
+                deferred_count=0,
+            )
+            session.add(stat)
+        return stat
@@ -0,0 +1,197 @@
+import datetime
+from typing import List, Optional
+from sqlalchemy import and_, func, or_, select, update
+from src.core.search_plan import SearchTask, plan_searches
+from src.storage.database import Job, utcnow
+from src.utils.config import AgentConfig
+import structlog
+
+logger = structlog.get_logger()
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class LeaseLost(Exception):
+    """The worker's lease on a job expired or was taken over; the job may be running elsewhere."""
+
+
+class WorkQueue:
+    """
+    DB-backed queue of provider searches. Workers claim one job at a time with a lease;
+    a job whose lease expires (worker crashed or hung) becomes claimable again.
+
+    Claiming uses SELECT ... FOR UPDATE SKIP LOCKED on Postgres. Other databases (SQLite)
+    use a conditional UPDATE on the candidate row, which only one transaction can win.
+    """
+
+    def __init__(self, session_factory, lease_seconds: int = 300, max_attempts: int = 3, retry_backoff_seconds: int = 30):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    async def enqueue_agent(self, agent_cfg: AgentConfig, tasks: Optional[List[SearchTask]] = None) -> int:
+        """
+        Queues the searches of an agent run (default: all of them), in the given order.
+        Skipped while a previous run of the agent is unfinished.
+        """
+        async with self.session_factory() as session:
+            stmt = select(Job.id).where(Job.agent_id == agent_cfg.id, Job.status.in_([PENDING, LEASED])).limit(1)
+            if (await session.execute(stmt)).first():
+                logger.info("agent_run_already_queued", agent_id=agent_cfg.id)
+                return 0
+
+            if tasks is None:
+                tasks = plan_searches(agent_cfg)
+            if not tasks:
+                return 0
+            now = utcnow()
+            session.add_all([
+                Job(
+                    agent_id=task.agent_id,
+                    source=task.source,
+                    query_json=task.to_dict(),
+                    status=PENDING,
+                    attempts=0,
+                    max_attempts=self.max_attempts,
+                    available_at=now,
+                )
+                for task in tasks
+            ])
+            await session.commit()
+
+        logger.info("agent_run_enqueued", agent_id=agent_cfg.id, jobs=len(tasks))
+        return len(tasks)
+
+    def _claimable(self, now: datetime.datetime):
+        return or_(
+            and_(Job.status == PENDING, Job.available_at <= now),
+            and_(Job.status == LEASED, Job.lease_expires_at < now, Job.attempts < Job.max_attempts),
+        )
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        """Leases the oldest available job to worker_id, or returns None if there is nothing to do."""
+        async with self.session_factory() as session:
+            now = utcnow()
+            lease = {
+                "status": LEASED,
+                "lease_owner": worker_id,
+                "lease_expires_at": now + datetime.timedelta(seconds=self.lease_seconds),
+                "attempts": Job.attempts + 1,
+            }
+
+            if session.bind.dialect.name == "postgresql":
+                stmt = (
+                    select(Job.id)
+                    .where(self._claimable(now))
+                    .order_by(Job.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                job_id = (await session.execute(stmt)).scalar_one_or_none()
+                if job_id is None:
+                    return None
+                await session.execute(update(Job).where(Job.id == job_id).values(**lease))
+                await session.commit()
+                return await session.get(Job, job_id, populate_existing=True)
+
+            # Compare-and-set: if another worker took the candidate first, try the next one
+            for _ in range(5):
+                stmt = select(Job.id).where(self._claimable(now)).order_by(Job.id).limit(1)
+                job_id = (await session.execute(stmt)).scalar_one_or_none()
+                if job_id is None:
+                    return None
+                result = await session.execute(
+                    update(Job).where(Job.id == job_id, self._claimable(now)).values(**lease)
+                )
+                await session.commit()
+                if result.rowcount == 1:
+                    return await session.get(Job, job_id, populate_existing=True)
+            return None
+
+    async def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Extends the lease. False means the lease was lost and the job may be running elsewhere."""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.lease_owner == worker_id, Job.status == LEASED)
+                .values(lease_expires_at=utcnow() + datetime.timedelta(seconds=self.lease_seconds))
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def complete(self, job_id: int, worker_id: str, listings_found: int = 0, new_listings: int = 0) -> bool:
+        """Marks the job done; False if the lease was lost first (another worker owns the job now)."""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.lease_owner == worker_id)
+                .values(
+                    status=DONE,
+                    lease_expires_at=None,
+                    finished_at=utcnow(),
+                    listings_found=listings_found,
+                    new_listings=new_listings,
+                )
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def defer(self, job_id: int, worker_id: str, delay_seconds: float):
+        """Puts the job back for later without using up an attempt (e.g. its source looks blocked)."""
+        async with self.session_factory() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.lease_owner == worker_id, Job.status == LEASED)
+                .values(
+                    status=PENDING,
+                    lease_expires_at=None,
+                    attempts=Job.attempts - 1,
+                    available_at=utcnow() + datetime.timedelta(seconds=delay_seconds),
+                )
+            )
+            await session.commit()
+
+    async def fail(self, job_id: int, worker_id: str, error: str):
+        """Requeues the job with exponential backoff, or marks it failed once it is out of attempts."""
+        async with self.session_factory() as session:
+            job = await session.get(Job, job_id)
+            if not job or job.lease_owner != worker_id:
+                return
+            job.last_error = error[:1000]
+            job.lease_expires_at = None
+            if job.attempts >= job.max_attempts:
+                job.status = FAILED
+                job.finished_at = utcnow()
+            else:
+                job.status = PENDING
+                delay = self.retry_backoff_seconds * 2 ** (job.attempts - 1)
+                job.available_at = utcnow() + datetime.timedelta(seconds=delay)
+            await session.commit()
+        logger.warn("job_failed", job_id=job_id, attempts=job.attempts, status=job.status, error=error)
+
+    async def reap(self) -> int:
+        """Marks jobs failed whose lease expired on their last attempt (they are no longer claimable)."""
+        async with self.session_factory() as session:
+            now = utcnow()
+            result = await session.execute(
+                update(Job)
+                .where(Job.status == LEASED, Job.lease_expires_at < now, Job.attempts >= Job.max_attempts)
+                .values(status=FAILED, finished_at=now, last_error="lease expired")
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def pending_count(self, agent_id: Optional[str] = None) -> int:
+        async with self.session_factory() as session:
+            stmt = select(func.count()).select_from(Job).where(Job.status.in_([PENDING, LEASED]))
+            if agent_id:
+                stmt = stmt.where(Job.agent_id == agent_id)
+            return (await session.execute(stmt)).scalar_one()
+
+
+def job_task(job: Job) -> SearchTask:
+    return SearchTask.from_dict(job.query_json)
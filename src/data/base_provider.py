@@ -1,8 +1,20 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from pydantic import BaseModel
+from dataclasses import asdict, dataclass, field, fields
+from typing import TYPE_CHECKING, List, Optional, Tuple
+import httpx
+from pydantic import BaseModel, Field
+from src.utils import metrics, tracing
+import structlog
+
+if TYPE_CHECKING:
+    from src.data.fixtures import ProviderFixtures
+
+logger = structlog.get_logger()
 
 class RawListing(BaseModel):
+    """Validated listing schema, applied at the persistence boundary."""
     external_id: str
     source: str
     url: str
@@ -13,10 +25,203 @@ class RawListing(BaseModel):
     make: Optional[str] = None
     model: Optional[str] = None
     location: Optional[str] = None
-    images: List[str] = []
-    raw_data: dict = {}
+    images: List[str] = Field(default_factory=list)
+    raw_data: dict = Field(default_factory=dict)
+
+@dataclass(slots=True)
+class ListingRecord:
+    """
+    Lightweight listing produced by providers and passed through the in-process pipeline.
+    Most scraped cards are rejected by the filter, so they are never fully validated;
+    only matches are turned into a RawListing (see `validate`) before they are stored.
+    The string fields the filter reads are checked on construction, so a bad card raises
+    ValueError where the provider builds it and is skipped on its own.
+    """
+    external_id: str
+    source: str
+    url: str
+    title: str
+    price: Optional[float] = None
+    mileage: Optional[int] = None
+    year: Optional[int] = None
+    make: Optional[str] = None
+    model: Optional[str] = None
+    location: Optional[str] = None
+    images: List[str] = field(default_factory=list)
+    raw_data: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        for name in _REQUIRED_STR_FIELDS:
+            if not isinstance(getattr(self, name), str):
+                raise ValueError(f"listing {name} must be a string, got {getattr(self, name)!r}")
+
+    def validate(self) -> RawListing:
+        return RawListing.model_validate(asdict(self))
+
+    def to_row(self) -> Tuple:
+        """Plain tuple in field order; the compact form sent between processes."""
+        return tuple(getattr(self, name) for name in _RECORD_FIELDS)
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "ListingRecord":
+        return cls(*row)
+
+_RECORD_FIELDS = tuple(f.name for f in fields(ListingRecord))
+_REQUIRED_STR_FIELDS = ("external_id", "source", "url", "title")
+
+# Headers a desktop Chrome sends for a top-level navigation; used by the browserless fetch path
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Windows"',
+}
+
+# Text of bot-protection interstitials served with a 200
+BOT_WALL_MARKERS = ("Pardon Our Interruption", "Access Denied", "captcha-delivery", "cf-challenge", "px-captcha")
+
+
+class FastPathUnavailable(Exception):
+    """The browserless fetch can't serve this search (blocked, or results rendered on the client)."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
 
 class BaseProvider(ABC):
+    source_name: str = ""
+    # Record/replay of this provider's HTTP traffic (see src/data/fixtures.py); None for live traffic
+    fixtures: Optional["ProviderFixtures"] = None
+    # Try a plain HTTP fetch + HTML/JSON parse before starting a browser (providers that implement search_http)
+    http_fast_path: bool = False
+    _shared_client: Optional[httpx.AsyncClient] = None
+
     @abstractmethod
-    async def search(self, params: dict) -> List[RawListing]:
+    async def search(self, params: dict) -> List[ListingRecord]:
         pass
+
+    async def search_http(self, params: dict) -> List[ListingRecord]:
+        """Browserless search; raises FastPathUnavailable when the page needs a real browser."""
+        raise FastPathUnavailable("unsupported")
+
+    async def search_fast_or_browser(self, params: dict, browser_search) -> List[ListingRecord]:
+        """Uses search_http when enabled and possible, otherwise (or on fallback) awaits browser_search(params)."""
+        if self.http_fast_path:
+            try:
+                listings = await self.search_http(params)
+                metrics.FAST_PATH.labels(self.source_name, "used").inc()
+                return listings
+            except FastPathUnavailable as e:
+                metrics.FAST_PATH.labels(self.source_name, e.reason).inc()
+                logger.info("fast_path_fallback", source=self.source_name, reason=e.reason)
+            except httpx.HTTPError as e:
+                metrics.FAST_PATH.labels(self.source_name, "http_error").inc()
+                logger.info("fast_path_fallback", source=self.source_name, reason="http_error", error=str(e))
+        return await browser_search(params)
+
+    # Pooled HTTP client for the fast path: one keep-alive connection pool per provider
+
+    def shared_http_client(self) -> httpx.AsyncClient:
+        if self._shared_client is None or self._shared_client.is_closed:
+            self._shared_client = self.http_client(
+                headers=BROWSER_HEADERS,
+                timeout=httpx.Timeout(20.0, connect=10.0),
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=60),
+            )
+        return self._shared_client
+
+    async def close(self):
+        """Closes the pooled HTTP client (if one was opened); the next fetch_page opens a new one."""
+        if self._shared_client is not None:
+            await self._shared_client.aclose()
+            self._shared_client = None
+
+    async def fetch_page(self, url: str) -> str:
+        """GETs a results page with the pooled client; raises FastPathUnavailable if it looks blocked."""
+        response = await self.fetch(self.shared_http_client(), url)
+        if response.status_code in (401, 403, 429, 503):
+            self.record_block(f"http_{response.status_code}")
+            raise FastPathUnavailable(f"http_{response.status_code}")
+        if response.status_code != 200:
+            raise FastPathUnavailable(f"http_{response.status_code}")
+        html = response.text
+        if any(marker in html for marker in BOT_WALL_MARKERS):
+            self.record_block("bot_wall")
+            raise FastPathUnavailable("bot_wall")
+        return html
+
+    # Instrumented Playwright helpers; providers use these instead of calling Playwright directly
+
+    async def launch_browser(self, playwright, **kwargs):
+        metrics.BROWSER_LAUNCHES.labels(self.source_name).inc()
+        return await playwright.chromium.launch(**kwargs)
+
+    async def new_context(self, browser, **kwargs):
+        context = await browser.new_context(**kwargs)
+        gauge = metrics.BROWSER_CONTEXTS.labels(self.source_name)
+        gauge.inc()
+        # Fires on context.close(), browser.close() and browser crashes alike
+        context.once("close", lambda _: gauge.dec())
+        if self.fixtures:
+            await self.fixtures.attach(self.source_name, context)
+        return context
+
+    def http_client(self, **kwargs) -> httpx.AsyncClient:
+        if self.fixtures:
+            kwargs["transport"] = self.fixtures.transport(self.source_name, kwargs.get("transport"))
+        return httpx.AsyncClient(**kwargs)
+
+    async def pause(self, seconds: float):
+        """Human-like wait between page actions; skipped when replaying recorded pages."""
+        if self.fixtures and self.fixtures.replaying:
+            return
+        await asyncio.sleep(seconds)
+
+    async def goto(self, page, url: str, **kwargs):
+        started = time.perf_counter()
+        metrics.count_search("pages_loaded")
+        with self.trace_stage("navigation", url=url) as stage:
+            try:
+                response = await page.goto(url, **kwargs)
+            finally:
+                metrics.PAGE_LOAD_SECONDS.labels(self.source_name).observe(time.perf_counter() - started)
+            if response is not None:
+                stage.set_attribute("http.status_code", response.status)
+            return response
+
+    async def wait_for_selector(self, page, selector: str, **kwargs):
+        with self.trace_stage("wait_for_selector", selector=selector) as stage:
+            try:
+                element = await page.wait_for_selector(selector, **kwargs)
+            except Exception:
+                stage.set_attribute("found", False)
+                raise
+            stage.set_attribute("found", element is not None)
+            return element
+
+    async def fetch(self, client, url: str, **kwargs):
+        """httpx GET, timed like a page load."""
+        started = time.perf_counter()
+        metrics.count_search("pages_loaded")
+        with self.trace_stage("navigation", url=url) as stage:
+            try:
+                response = await client.get(url, **kwargs)
+            finally:
+                metrics.PAGE_LOAD_SECONDS.labels(self.source_name).observe(time.perf_counter() - started)
+            stage.set_attribute("http.status_code", response.status_code)
+            return response
+
+    def trace_stage(self, stage: str, **attributes):
+        """Tracing span for one step of a search (navigation, wait_for_selector, extraction)."""
+        return tracing.span(f"provider.{stage}", source=self.source_name, **attributes)
+
+    def record_block(self, kind: str):
+        metrics.BLOCKS_DETECTED.labels(self.source_name, kind).inc()
+        metrics.count_search("blocks")
@@ -0,0 +1,171 @@
+"""
+Record-and-replay of provider HTTP traffic.
+
+In record mode every response a provider receives (Playwright documents, scripts, XHR, and httpx
+API calls) is saved under PROVIDER_FIXTURES_DIR, one body file plus a small JSON header per URL.
+In replay mode the same requests are answered from those files through Playwright `route` and an
+httpx transport, so providers and the whole run_agent pipeline run offline and repeatably.
+Requests with no recording are aborted (Playwright) or answered 404 (httpx).
+"""
+import hashlib
+import json
+import os
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+# Query parameters that don't identify the results (credentials); anything that filters results,
+# such as a search zip, stays in the key
+VOLATILE_PARAMS = {"api_key"}
+# Resource types not worth recording; replay aborts them
+SKIPPED_RESOURCES = {"image", "media", "font"}
+
+# Headers describing the wire form of a body, dropped once the body has been read and decoded
+_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+_EXTENSIONS = {"text/html": ".html", "application/json": ".json", "text/javascript": ".js",
+               "application/javascript": ".js", "text/css": ".css"}
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in VOLATILE_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+
+class FixtureStore:
+    """Directory of recorded responses, keyed by source and normalized URL."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _paths(self, source: str, url: str):
+        key = hashlib.sha1(f"GET {normalize_url(url)}".encode()).hexdigest()[:20]
+        base = os.path.join(self.root, source, key)
+        return base + ".meta.json", base
+
+    def save(self, source: str, url: str, status: int, content_type: str, body: bytes):
+        meta_path, base = self._paths(source, url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        media_type = (content_type or "").split(";")[0].strip().lower()
+        body_path = base + _EXTENSIONS.get(media_type, ".bin")
+        with open(body_path, "wb") as f:
+            f.write(body)
+        with open(meta_path, "w") as f:
+            json.dump(
+                {"url": url, "status": status, "content_type": content_type, "body_file": os.path.basename(body_path)},
+                f,
+                indent=2,
+            )
+
+    def load(self, source: str, url: str) -> Optional[dict]:
+        """{"url", "status", "content_type", "body"} or None if the URL was never recorded."""
+        meta_path, _ = self._paths(source, url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(os.path.join(os.path.dirname(meta_path), meta["body_file"]), "rb") as f:
+                meta["body"] = f.read()
+        except FileNotFoundError:
+            return None
+        return meta
+
+
+class ProviderFixtures:
+    """A provider's view of the store in a given mode; attached to BaseProvider.fixtures."""
+
+    def __init__(self, store: FixtureStore, mode: str):
+        self.store = store
+        self.mode = mode
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    async def attach(self, source: str, context):
+        """Hooks a Playwright browser context up for recording or replay."""
+        if self.mode == RECORD:
+            context.on("response", lambda response: self._record_response(source, response))
+        elif self.mode == REPLAY:
+            await context.route("**/*", lambda route: self._replay_route(source, route))
+
+    async def _record_response(self, source: str, response):
+        request = response.request
+        if request.method != "GET" or request.resource_type in SKIPPED_RESOURCES:
+            return
+        try:
+            body = await response.body()
+        except Exception:
+            return # redirects and aborted responses have no body
+        self.store.save(source, response.url, response.status, response.headers.get("content-type", ""), body)
+
+    async def _replay_route(self, source: str, route):
+        request = route.request
+        recorded = None
+        if request.method == "GET" and request.resource_type not in SKIPPED_RESOURCES:
+            recorded = self.store.load(source, request.url)
+        if recorded is None:
+            await route.abort()
+            return
+        await route.fulfill(status=recorded["status"], content_type=recorded["content_type"], body=recorded["body"])
+
+    def transport(self, source: str, inner: Optional[httpx.AsyncBaseTransport] = None) -> Optional[httpx.AsyncBaseTransport]:
+        """httpx transport for the current mode, or None to use httpx's default."""
+        if self.mode == RECORD:
+            return _RecordingTransport(self.store, source, inner or httpx.AsyncHTTPTransport())
+        if self.mode == REPLAY:
+            return _ReplayTransport(self.store, source)
+        return None
+
+
+class _RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, store: FixtureStore, source: str, inner: httpx.AsyncBaseTransport):
+        self.store = store
+        self.source = source
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.inner.handle_async_request(request)
+        body = await response.aread()
+        if request.method == "GET":
+            self.store.save(self.source, str(request.url), response.status_code, response.headers.get("content-type", ""), body)
+        # aread() decoded the body, so the framing and encoding headers no longer describe it
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _BODY_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class _ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, store: FixtureStore, source: str):
+        self.store = store
+        self.source = source
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        recorded = self.store.load(self.source, str(request.url))
+        if recorded is None:
+            logger.warn("fixture_missing", source=self.source, url=normalize_url(str(request.url)))
+            return httpx.Response(404, content=b"", request=request)
+        return httpx.Response(
+            recorded["status"],
+            headers={"content-type": recorded["content_type"]},
+            content=recorded["body"],
+            request=request,
+        )
+
+
+def fixtures_from_settings(settings) -> Optional[ProviderFixtures]:
+    mode = (settings.PROVIDER_FIXTURES_MODE or OFF).lower()
+    if mode == OFF:
+        return None
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"PROVIDER_FIXTURES_MODE must be off, record or replay (got {mode!r})")
+    return ProviderFixtures(FixtureStore(settings.PROVIDER_FIXTURES_DIR), mode)
@@ -2,7 +2,7 @@ import asyncio
 import re
 from typing import List, Optional
 from playwright.async_api import async_playwright
-from src.data.base_provider import BaseProvider, RawListing
+from src.data.base_provider import BaseProvider, ListingRecord
 import structlog
 
 logger = structlog.get_logger()
@@ -10,17 +10,19 @@ logger = structlog.get_logger()
 class AutoNationProvider(BaseProvider):
     def __init__(self):
         self.source_name = "autonation"
-        self.base_url = "https://www.autonation.com/cars-for-sale"
+        self.site_url = "https://www.autonation.com"
+        self.base_url = self.site_url + "/cars-for-sale"
 
-    async def search(self, params: dict) -> List[RawListing]:
+    async def search(self, params: dict) -> List[ListingRecord]:
         listings = []
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True, args=[
+            browser = await self.launch_browser(p, headless=True, args=[
                 "--disable-blink-features=AutomationControlled",
                 "--no-sandbox",
                 "--disable-setuid-sandbox"
             ])
-            context = await browser.new_context(
+            context = await self.new_context(
+                browser,
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
             )
             page = await context.new_page()
@@ -40,54 +42,56 @@ class AutoNationProvider(BaseProvider):
             
             try:
                 # Use domcontentloaded instead of networkidle to avoid timeouts from background trackers
-                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                await self.goto(page, url, wait_until="domcontentloaded", timeout=60000)
                 
                 # Wait for results
                 try:
-                    await page.wait_for_selector(".vehicle-card, [class*='vehicle-card'], .inventory-item", timeout=30000)
+                    await self.wait_for_selector(page, ".vehicle-card, [class*='vehicle-card'], .inventory-item", timeout=30000)
                 except Exception:
                     logger.warn("no_results_found_on_autonation")
                     return []
 
-                items = await page.query_selector_all(".vehicle-card, [class*='vehicle-card'], .inventory-item")
+                with self.trace_stage("extraction") as stage:
+                    items = await page.query_selector_all(".vehicle-card, [class*='vehicle-card'], .inventory-item")
                 
-                for item in items:
-                    try:
-                        title_el = await item.query_selector(".vehicle-title, [class*='title'], h3")
-                        title = (await title_el.inner_text()).strip() if title_el else ""
+                    for item in items:
+                        try:
+                            title_el = await item.query_selector(".vehicle-title, [class*='title'], h3")
+                            title = (await title_el.inner_text()).strip() if title_el else ""
                         
-                        link_el = await item.query_selector("a")
-                        url_attr = await link_el.get_attribute("href") if link_el else ""
-                        if url_attr and not url_attr.startswith("http"):
-                            url_attr = "https://www.autonation.com" + url_attr
+                            link_el = await item.query_selector("a")
+                            url_attr = await link_el.get_attribute("href") if link_el else ""
+                            if url_attr and not url_attr.startswith("http"):
+                                url_attr = self.site_url + url_attr
                         
-                        price_el = await item.query_selector(".price, [class*='price']")
-                        price_text = (await price_el.inner_text()).strip() if price_el else ""
-                        price = self._parse_price(price_text)
+                            price_el = await item.query_selector(".price, [class*='price']")
+                            price_text = (await price_el.inner_text()).strip() if price_el else ""
+                            price = self._parse_price(price_text)
                         
-                        mileage_el = await item.query_selector(".mileage, [class*='mileage']")
-                        mileage_text = (await mileage_el.inner_text()).strip() if mileage_el else ""
-                        mileage = self._parse_mileage(mileage_text)
+                            mileage_el = await item.query_selector(".mileage, [class*='mileage']")
+                            mileage_text = (await mileage_el.inner_text()).strip() if mileage_el else ""
+                            mileage = self._parse_mileage(mileage_text)
                         
-                        year_match = re.search(r'(\d{4})', title)
-                        year = int(year_match.group(1)) if year_match else None
+                            year_match = re.search(r'(\d{4})', title)
+                            year = int(year_match.group(1)) if year_match else None
                         
-                        ext_id = url_attr.split("/")[-1] if url_attr else title
+                            ext_id = url_attr.split("/")[-1] if url_attr else title
                         
-                        if title:
-                            listings.append(RawListing(
-                                external_id=ext_id,
-                                source=self.source_name,
-                                url=url_attr,
-                                title=title,
-                                year=year,
-                                price=price,
-                                mileage=mileage,
-                                raw_data={"price_text": price_text, "mileage_text": mileage_text}
-                            ))
-                    except Exception as e:
-                        logger.error("error_parsing_autonation_item", error=str(e))
-                        continue
+                            if title:
+                                listings.append(ListingRecord(
+                                    external_id=ext_id,
+                                    source=self.source_name,
+                                    url=url_attr,
+                                    title=title,
+                                    year=year,
+                                    price=price,
+                                    mileage=mileage,
+                                    raw_data={"price_text": price_text, "mileage_text": mileage_text}
+                                ))
+                        except Exception as e:
+                            logger.error("error_parsing_autonation_item", error=str(e))
+                            continue
+                    stage.set_attribute("cards", len(listings))
                         
             except Exception as e:
                 logger.error("autonation_search_failed", error=str(e))
@@ -1,30 +1,99 @@
 import asyncio
+import json
 import re
 from typing import List, Optional
 from playwright.async_api import async_playwright
-from src.data.base_provider import BaseProvider, RawListing
+from src.data.base_provider import BaseProvider, FastPathUnavailable, ListingRecord
 import structlog
 
 logger = structlog.get_logger()
 
+# The auctions page ships every live auction as JSON in an inline script under this variable
+_INITIAL_DATA_MARKER = "auctionsCurrentInitialData"
+
 class BringATrailerProvider(BaseProvider):
     def __init__(self):
         self.source_name = "bringatrailer"
-        self.base_url = "https://bringatrailer.com/auctions/"
+        self.site_url = "https://bringatrailer.com"
+        self.base_url = self.site_url + "/auctions/"
+
+    async def search(self, params: dict) -> List[ListingRecord]:
+        return await self.search_fast_or_browser(params, self._search_browser)
+
+    async def search_http(self, params: dict) -> List[ListingRecord]:
+        """Reads the live auctions from the JSON embedded in the auctions page instead of rendering the cards."""
+        logger.info("searching_bat_http", url=self.base_url)
+        html = await self.fetch_page(self.base_url)
+        with self.trace_stage("extraction") as stage:
+            marker = html.find(_INITIAL_DATA_MARKER)
+            start = html.find("{", marker) if marker != -1 else -1
+            if start == -1:
+                raise FastPathUnavailable("client_rendered")
+            try:
+                data, _ = json.JSONDecoder().raw_decode(html, start)
+            except ValueError:
+                raise FastPathUnavailable("client_rendered")
+
+            listings = []
+            for item in data.get("items") or []:
+                title = (item.get("title") or "").strip()
+                url_attr = item.get("url") or ""
+                if not title or not url_attr:
+                    continue
+                if not url_attr.startswith("http"):
+                    url_attr = self.site_url + url_attr
+                price_text = item.get("current_bid_formatted") or ""
+                price = item.get("current_bid")
+                record = self._record(title, url_attr, price_text)
+                if isinstance(item.get("year"), (int, str)) and str(item["year"]).isdigit():
+                    record.year = int(item["year"])
+                if isinstance(price, (int, float)) and price > 0:
+                    record.price = float(price)
+                if item.get("thumbnail_url"):
+                    record.images = [item["thumbnail_url"]]
+                listings.append(record)
+            stage.set_attribute("cards", len(listings))
+        logger.info("bat_items_found", count=len(listings), fast_path=True)
+        return listings
+
+    def _record(self, title: str, url_attr: str, price_text: str) -> ListingRecord:
+        # BaT titles usually look like "2022 Porsche 911 GT3"
+        year_match = re.search(r'(\d{4})', title)
+        year = int(year_match.group(1)) if year_match else None
 
-    async def search(self, params: dict) -> List[RawListing]:
+        # Fallback: try to get year from URL if title fails
+        if not year and url_attr:
+            url_year_match = re.search(r'/(\d{4})-', url_attr)
+            if url_year_match:
+                year = int(url_year_match.group(1))
+
+        # External ID for BaT can be the URL slug
+        ext_id = url_attr.strip("/").split("/")[-1] if url_attr else title
+
+        return ListingRecord(
+            external_id=ext_id,
+            source=self.source_name,
+            url=url_attr,
+            title=title,
+            year=year,
+            price=self._parse_price(price_text),
+            raw_data={"full_title": title, "price_text": price_text}
+        )
+
+    async def _search_browser(self, params: dict) -> List[ListingRecord]:
         """
         Scrapes Bring A Trailer auctions. 
         Note: BaT is dynamic, so we use Playwright.
         """
         listings = []
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True, args=[
+            browser = await self.launch_browser(p, headless=True, args=[
                 "--disable-blink-features=AutomationControlled",
                 "--no-sandbox",
                 "--disable-setuid-sandbox"
             ])
-            context = await browser.new_context(
+            context = await self.new_context(
+                browser,
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
             )
             page = await context.new_page()
@@ -39,84 +108,63 @@ class BringATrailerProvider(BaseProvider):
             
             try:
                 # Use 'domcontentloaded' for faster response and to avoid background request timeouts
-                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                await self.goto(page, url, wait_until="domcontentloaded", timeout=60000)
                 
                 # Wait for any listing card to appear
                 try:
-                    await page.wait_for_selector(".listing-card", timeout=30000)
+                    await self.wait_for_selector(page, ".listing-card", timeout=30000)
                 except Exception:
                     logger.warn("listing_cards_not_found_trying_alternate")
                     # Sometimes BaT uses different layouts
-                    await page.wait_for_selector("main", timeout=10000)
+                    await self.wait_for_selector(page, "main", timeout=10000)
 
                 # Scroll to trigger lazy loading
                 await page.evaluate("window.scrollTo(0, document.body.scrollHeight / 2)")
-                await asyncio.sleep(2)
+                await self.pause(2)
                 await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(2)
+                await self.pause(2)
 
                 # Extract listing items
-                items = await page.query_selector_all(".listing-card, [class*='listing-card']")
+                with self.trace_stage("extraction") as stage:
+                    items = await page.query_selector_all(".listing-card, [class*='listing-card']")
                 
-                for item in items:
-                    try:
-                        # Try multiple title selectors
-                        title_el = await item.query_selector(".listing-card-title, .item-title, h3")
-                        title = (await title_el.inner_text()).strip() if title_el else ""
+                    for item in items:
+                        try:
+                            # Try multiple title selectors
+                            title_el = await item.query_selector(".listing-card-title, .item-title, h3")
+                            title = (await title_el.inner_text()).strip() if title_el else ""
                         
-                        # BaT links: The listing card itself is often an 'a' or contains one
-                        url_attr = ""
-                        tag_name = await item.evaluate("el => el.tagName")
-                        if tag_name.lower() == "a":
-                            url_attr = await item.get_attribute("href")
-                        else:
-                            link_el = await item.query_selector("a")
-                            if link_el:
-                                url_attr = await link_el.get_attribute("href")
+                            # BaT links: The listing card itself is often an 'a' or contains one
+                            url_attr = ""
+                            tag_name = await item.evaluate("el => el.tagName")
+                            if tag_name.lower() == "a":
+                                url_attr = await item.get_attribute("href")
+                            else:
+                                link_el = await item.query_selector("a")
+                                if link_el:
+                                    url_attr = await link_el.get_attribute("href")
                             
-                        if url_attr and not url_attr.startswith("http"):
-                            url_attr = "https://bringatrailer.com" + url_attr
-                        
-                        # BaT titles usually look like "2022 Porsche 911 GT3"
-                        year_match = re.search(r'(\d{4})', title)
-                        year = int(year_match.group(1)) if year_match else None
-                        
-                        # Fallback: try to get year from URL if title fails
-                        if not year and url_attr:
-                            url_year_match = re.search(r'/(\d{4})-', url_attr)
-                            if url_year_match:
-                                year = int(url_year_match.group(1))
-                        
-                        # Price extraction - BaT often uses .listing-card-price or .price
-                        # Also check for current bid. Use a more generic search for price-like text
-                        price_text = ""
-                        price_el = await item.query_selector(".listing-card-price, .price, .bid-price, .current-bid, .no-reserve")
-                        if price_el:
-                            price_text = (await price_el.inner_text()).strip()
-                        else:
-                            # Fallback: search all text in the card for a dollar sign
-                            all_text = await item.inner_text()
-                            price_match = re.search(r'\$[\d,]+', all_text)
-                            if price_match:
-                                price_text = price_match.group(0)
-                                
-                        price = self._parse_price(price_text)
+                            if url_attr and not url_attr.startswith("http"):
+                                url_attr = self.site_url + url_attr
                         
-                        # External ID for BaT can be the URL slug
-                        ext_id = url_attr.strip("/").split("/")[-1] if url_attr else title
+                            # Price extraction - BaT often uses .listing-card-price or .price
+                            # Also check for current bid. Use a more generic search for price-like text
+                            price_text = ""
+                            price_el = await item.query_selector(".listing-card-price, .price, .bid-price, .current-bid, .no-reserve")
+                            if price_el:
+                                price_text = (await price_el.inner_text()).strip()
+                            else:
+                                # Fallback: search all text in the card for a dollar sign
+                                all_text = await item.inner_text()
+                                price_match = re.search(r'\$[\d,]+', all_text)
+                                if price_match:
+                                    price_text = price_match.group(0)
                         
-                        listings.append(RawListing(
-                            external_id=ext_id,
-                            source=self.source_name,
-                            url=url_attr,
-                            title=title,
-                            year=year,
-                            price=price,
-                            raw_data={"full_title": title, "price_text": price_text}
-                        ))
-                    except Exception as e:
-                        logger.error("error_parsing_bat_item", error=str(e))
-                        continue
+                            listings.append(self._record(title, url_attr, price_text))
+                        except Exception as e:
+                            logger.error("error_parsing_bat_item", error=str(e))
+                            continue
+                    stage.set_attribute("cards", len(listings))
                         
             except Exception as e:
                 logger.error("bat_search_failed", error=str(e))
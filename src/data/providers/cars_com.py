@@ -3,7 +3,8 @@ import re
 import random
 from typing import List, Optional
 from playwright.async_api import async_playwright
-from src.data.base_provider import BaseProvider, RawListing
+from parsel import Selector
+from src.data.base_provider import BaseProvider, FastPathUnavailable, ListingRecord
 import structlog
 
 logger = structlog.get_logger()
@@ -11,20 +12,81 @@ logger = structlog.get_logger()
 class CarsComProvider(BaseProvider):
     def __init__(self):
         self.source_name = "cars_com"
-        self.base_url = "https://www.cars.com/shopping/results/"
+        self.site_url = "https://www.cars.com"
+        self.base_url = self.site_url + "/shopping/results/"
 
-    async def search(self, params: dict) -> List[RawListing]:
+    async def search(self, params: dict) -> List[ListingRecord]:
+        return await self.search_fast_or_browser(params, self._search_browser)
+
+    def _search_url(self, params: dict) -> str:
+        make = params.get("makes", [""])[0].lower()
+        model = params.get("models", [""])[0].lower().replace(" ", "-")
+        year_min = params.get("year_min", "")
+
+        if make == "ford" and "raptor" in model:
+            search_model = "ford-f-150-raptor"
+        else:
+            search_model = f"{make}-{model}"
+
+        url = f"{self.base_url}?makes[]={make}&models[]={search_model}&zip=60601&distance=all"
+        if year_min:
+            url += f"&year_min={year_min}"
+        return url
+
+    async def search_http(self, params: dict) -> List[ListingRecord]:
+        """cars.com renders the result cards on the server, so the HTML has everything we need."""
+        url = self._search_url(params)
+        logger.info("searching_cars_com_http", url=url)
+        selector = Selector(text=await self.fetch_page(url))
+        with self.trace_stage("extraction") as stage:
+            cards = selector.css(".vehicle-card, [data-testid='vehicle-card']")
+            if not cards:
+                if selector.css(".no-results, [data-testid='no-results']"):
+                    return []
+                raise FastPathUnavailable("client_rendered")
+
+            listings = []
+            for card in cards:
+                title = _text(card.css(".title, [class*='title']"))
+                if not title:
+                    continue
+                url_attr = card.css("a.vehicle-card-link::attr(href), a[href*='/vehicledetail/']::attr(href)").get() or ""
+                if url_attr and not url_attr.startswith("http"):
+                    url_attr = self.site_url + url_attr
+                price_text = _text(card.css(".primary-price, [class*='price']"))
+                mileage_text = _text(card.css(".mileage, [class*='mileage']"))
+                listings.append(self._record(title, url_attr, price_text, mileage_text))
+            stage.set_attribute("cards", len(listings))
+        logger.info("cars_com_items_found", count=len(listings), fast_path=True)
+        return listings
+
+    def _record(self, title: str, url_attr: str, price_text: str, mileage_text: str) -> ListingRecord:
+        year_match = re.search(r'(\d{4})', title)
+        ext_id_match = re.search(r'listing/(\d+)', url_attr)
+        return ListingRecord(
+            external_id=ext_id_match.group(1) if ext_id_match else url_attr,
+            source=self.source_name,
+            url=url_attr,
+            title=title,
+            year=int(year_match.group(1)) if year_match else None,
+            price=self._parse_price(price_text),
+            mileage=self._parse_mileage(mileage_text),
+            raw_data={"price_text": price_text, "mileage_text": mileage_text}
+        )
+
+    async def _search_browser(self, params: dict) -> List[ListingRecord]:
         listings = []
         async with async_playwright() as p:
             # Enhanced stealth arguments
-            browser = await p.chromium.launch(headless=True, args=[
+            browser = await self.launch_browser(p, headless=True, args=[
                 "--disable-blink-features=AutomationControlled",
                 "--no-sandbox",
                 "--disable-setuid-sandbox",
                 "--window-size=1920,1080"
             ])
             
-            context = await browser.new_context(
+            context = await self.new_context(
+                browser,
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
                 viewport={'width': 1920, 'height': 1080},
                 extra_http_headers={
@@ -43,85 +105,59 @@ class CarsComProvider(BaseProvider):
             # Mask automation
             await page.evaluate("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
-            make = params.get("makes", [""])[0].lower()
-            model = params.get("models", [""])[0].lower().replace(" ", "-")
-            year_min = params.get("year_min", "")
-            
-            if make == "ford" and "raptor" in model:
-                search_model = "ford-f-150-raptor"
-            else:
-                search_model = f"{make}-{model}"
-            
-            url = f"{self.base_url}?makes[]={make}&models[]={search_model}&zip=60601&distance=all"
-            if year_min:
-                url += f"&year_min={year_min}"
-            
+            url = self._search_url(params)
             logger.info("searching_cars_com", url=url)
             
             try:
                 # WARM-UP: Visit the home page first to get cookies and look like a real user
                 try:
-                    await page.goto("https://www.cars.com/", wait_until="domcontentloaded", timeout=20000)
-                    await asyncio.sleep(random.uniform(1, 2))
+                    await self.goto(page, self.site_url + "/", wait_until="domcontentloaded", timeout=20000)
+                    await self.pause(random.uniform(1, 2))
                 except Exception:
                     pass # Continue even if warm-up fails
 
                 # Navigate to search results
-                response = await page.goto(url, wait_until="domcontentloaded", timeout=45000)
+                response = await self.goto(page, url, wait_until="domcontentloaded", timeout=45000)
                 
                 if response and response.status == 403:
                     logger.error("cars_com_blocked_403")
+                    self.record_block("http_403")
                     return []
 
                 # Wait for results or no-results indicator
                 try:
-                    await page.wait_for_selector(".vehicle-card, [data-testid='vehicle-card'], .no-results", timeout=15000)
+                    await self.wait_for_selector(page, ".vehicle-card, [data-testid='vehicle-card'], .no-results", timeout=15000)
                 except Exception:
                     cards = await page.query_selector_all(".vehicle-card")
                     if not cards:
                         logger.warn("no_results_found_on_cars_com_timeout")
                         return []
 
-                items = await page.query_selector_all(".vehicle-card, [data-testid='vehicle-card']")
-                logger.info("cars_com_items_found", count=len(items))
+                with self.trace_stage("extraction") as stage:
+                    items = await page.query_selector_all(".vehicle-card, [data-testid='vehicle-card']")
+                    logger.info("cars_com_items_found", count=len(items))
                 
-                for item in items:
-                    try:
-                        title_el = await item.query_selector(".title, [class*='title']")
-                        title = (await title_el.inner_text()).strip() if title_el else ""
-                        if not title: continue
-
-                        link_el = await item.query_selector("a.vehicle-card-link, a[href*='/vehicledetail/']")
-                        url_attr = await link_el.get_attribute("href") if link_el else ""
-                        if url_attr and not url_attr.startswith("http"):
-                            url_attr = "https://www.cars.com" + url_attr
-                        
-                        price_el = await item.query_selector(".primary-price, [class*='price']")
-                        price_text = (await price_el.inner_text()).strip() if price_el else ""
-                        price = self._parse_price(price_text)
-                        
-                        mileage_el = await item.query_selector(".mileage, [class*='mileage']")
-                        mileage_text = (await mileage_el.inner_text()).strip() if mileage_el else ""
-                        mileage = self._parse_mileage(mileage_text)
+                    for item in items:
+                        try:
+                            title_el = await item.query_selector(".title, [class*='title']")
+                            title = (await title_el.inner_text()).strip() if title_el else ""
+                            if not title: continue
+
+                            link_el = await item.query_selector("a.vehicle-card-link, a[href*='/vehicledetail/']")
+                            url_attr = await link_el.get_attribute("href") if link_el else ""
+                            if url_attr and not url_attr.startswith("http"):
+                                url_attr = self.site_url + url_attr
                         
-                        year_match = re.search(r'(\d{4})', title)
-                        year = int(year_match.group(1)) if year_match else None
+                            price_el = await item.query_selector(".primary-price, [class*='price']")
+                            price_text = (await price_el.inner_text()).strip() if price_el else ""
                         
-                        ext_id_match = re.search(r'listing/(\d+)', url_attr)
-                        ext_id = ext_id_match.group(1) if ext_id_match else url_attr
+                            mileage_el = await item.query_selector(".mileage, [class*='mileage']")
+                            mileage_text = (await mileage_el.inner_text()).strip() if mileage_el else ""
                         
-                        listings.append(RawListing(
-                            external_id=ext_id,
-                            source=self.source_name,
-                            url=url_attr,
-                            title=title,
-                            year=year,
-                            price=price,
-                            mileage=mileage,
-                            raw_data={"price_text": price_text, "mileage_text": mileage_text}
-                        ))
-                    except Exception:
-                        continue
+                            listings.append(self._record(title, url_attr, price_text, mileage_text))
+                        except Exception:
+                            continue
+                    stage.set_attribute("cards", len(listings))
                         
             except Exception as e:
                 logger.error("cars_com_search_failed", error=str(e))
@@ -149,3 +185,11 @@ class CarsComProvider(BaseProvider):
         cleaned = re.sub(r'[^\d]', '', mileage_str)
         try: return int(cleaned)
         except ValueError: return None
+
+
+def _text(selection) -> str:
+    """Visible text of the first matched element, whitespace-collapsed (like Playwright's inner_text)."""
+    first = selection[:1]
+    if not first:
+        return ""
+    return " ".join(" ".join(first.css("*::text").getall()).split())
@@ -1,7 +1,6 @@
-import httpx
 import datetime
 from typing import List, Optional
-from src.data.base_provider import BaseProvider, RawListing
+from src.data.base_provider import BaseProvider, ListingRecord
 import structlog
 
 logger = structlog.get_logger()
@@ -28,7 +27,7 @@ class MarketcheckProvider(BaseProvider):
         self.api_key = api_key
         self.base_url = "https://api.marketcheck.com/v2/search/car/active"
 
-    async def search(self, params: dict) -> List[RawListing]:
+    async def search(self, params: dict) -> List[ListingRecord]:
         if not self.api_key:
             logger.error("marketcheck_api_key_missing")
             return []
@@ -46,6 +45,9 @@ class MarketcheckProvider(BaseProvider):
         hour = now.hour
         # This formula ensures that if the agent runs every 4 hours, it increments the hub index by 1
         hub_index = (day_of_year * 6 + (hour // 4)) % len(STRATEGIC_HUBS)
+        if self.fixtures:
+            # Recorded responses are keyed by their zip; pin the hub so a recording replays at any hour
+            hub_index = 0
         selected_zip = STRATEGIC_HUBS[hub_index]
 
         query_params = {
@@ -65,28 +67,30 @@ class MarketcheckProvider(BaseProvider):
                     hub_index=hub_index)
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(self.base_url, params=query_params)
+            async with self.http_client(timeout=30.0) as client:
+                response = await self.fetch(client, self.base_url, params=query_params)
                 response.raise_for_status()
                 data = response.json()
 
-                for item in data.get("listings", []):
-                    try:
-                        listings.append(RawListing(
-                            external_id=str(item.get("id", "")),
-                            source=self.source_name,
-                            url=item.get("vdp_url", ""),
-                            title=item.get("heading", f"{item.get('year')} {item.get('make')} {item.get('model')}"),
-                            price=float(item.get("price")) if item.get("price") else None,
-                            mileage=int(item.get("miles")) if item.get("miles") else None,
-                            year=int(item.get("year")) if item.get("year") else None,
-                            make=item.get("make"),
-                            model=item.get("model"),
-                            location=f"{item.get('city')}, {item.get('state')}",
-                            raw_data=item
-                        ))
-                    except Exception:
-                        continue
+                with self.trace_stage("extraction") as stage:
+                    for item in data.get("listings", []):
+                        try:
+                            listings.append(ListingRecord(
+                                external_id=str(item.get("id", "")),
+                                source=self.source_name,
+                                url=item.get("vdp_url") or "",
+                                title=item.get("heading") or f"{item.get('year')} {item.get('make')} {item.get('model')}",
+                                price=float(item.get("price")) if item.get("price") else None,
+                                mileage=int(item.get("miles")) if item.get("miles") else None,
+                                year=int(item.get("year")) if item.get("year") else None,
+                                make=item.get("make"),
+                                model=item.get("model"),
+                                location=f"{item.get('city')}, {item.get('state')}",
+                                raw_data=item
+                            ))
+                        except Exception:
+                            continue
+                    stage.set_attribute("cards", len(listings))
         except Exception as e:
             logger.error("marketcheck_search_failed", error=str(e))
 
@@ -1,62 +1,89 @@
-import aiosmtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List
+from html import escape
+from string import Template
+from typing import Dict, List
+from src.notifications.smtp_sender import SmtpSender
 from src.storage.database import Listing
-import structlog
+from src.utils import metrics
+
+# Parsed once; a digest is rendered with one substitute() per listing and per section
+_LISTING_HTML = Template("""
+                <li>
+                    <strong>$year $title</strong><br>
+                    Price: $price | Mileage: $mileage$deal<br>
+                    Source: $source<br>
+                    <a href="$url">View Listing</a>
+                </li>
+                <hr>
+            """)
+_SECTION_HTML = Template("<h2>New Vehicle Matches for $agent_name</h2><ul>$items</ul>")
+
+
+def _listing_html(l: Listing) -> str:
+    return _LISTING_HTML.substitute(
+        year=f"{int(l.year)}" if l.year else "",
+        title=escape(l.title or ""),
+        price=f"${l.price:,.2f}" if l.price else "Contact for Price",
+        mileage=f"{int(l.mileage):,} miles" if l.mileage else "N/A",
+        deal=f" | Deal score: {l.deal_score:.0f}/100" if l.deal_score is not None else "",
+        source=escape(l.source),
+        url=escape(l.url or ""),
+    )
 
-logger = structlog.get_logger()
 
 class EmailClient:
-    def __init__(self, hostname: str, port: int, username: str, password: str, use_tls: bool = True):
+    def __init__(self, hostname: str, port: int, username: str, password: str, use_tls: bool = True,
+                 max_per_minute: float = 0, keepalive_seconds: float = 60, idle_close_seconds: float = 300):
         self.hostname = hostname
         self.port = port
         self.username = username
         self.password = password
         self.use_tls = use_tls
+        # Every alert goes through one shared SMTP session (see SmtpSender)
+        self.sender = SmtpSender(
+            hostname, port, username, password,
+            max_per_minute=max_per_minute,
+            keepalive_seconds=keepalive_seconds,
+            idle_close_seconds=idle_close_seconds,
+            use_tls=use_tls,
+        )
 
-    async def send_listing_alerts(self, to_emails: List[str], agent_name: str, listings: List[Listing]):
-        if not listings:
-            return
-
-        subject = f"New Matches for {agent_name}: {len(listings)} vehicles found"
-        
-        # Create HTML body
-        html_content = f"<h2>New Vehicle Matches for {agent_name}</h2>"
-        html_content += "<ul>"
-        for l in listings:
-            price_fmt = f"${l.price:,.2f}" if l.price else "Contact for Price"
-            mileage_fmt = f"{int(l.mileage):,} miles" if l.mileage else "N/A"
-            html_content += f"""
-                <li>
-                    <strong>{l.year} {l.title}</strong><br>
-                    Price: {price_fmt} | Mileage: {mileage_fmt}<br>
-                    Source: {l.source}<br>
-                    <a href="{l.url}">View Listing</a>
-                </li>
-                <hr>
-            """
-        html_content += "</ul>"
+    def build_listing_alert(self, to_emails: List[str], agent_name: str, listings: List[Listing]) -> MIMEMultipart:
+        return self.build_digest(to_emails, {agent_name: listings})
+
+    def build_digest(self, to_emails: List[str], sections: Dict[str, List[Listing]]) -> MIMEMultipart:
+        """One email with a section of listings per agent (profile) name."""
+        total = sum(len(listings) for listings in sections.values())
+        if len(sections) == 1:
+            agent_name = next(iter(sections))
+            subject = f"New Matches for {agent_name}: {total} vehicles found"
+        else:
+            subject = f"New Matches: {total} vehicles found across {len(sections)} search profiles"
+
+        html_content = "".join(
+            _SECTION_HTML.substitute(agent_name=escape(agent_name), items="".join(map(_listing_html, listings)))
+            for agent_name, listings in sections.items()
+        )
 
         message = MIMEMultipart("alternative")
         message["From"] = self.username
         message["To"] = ", ".join(to_emails)
         message["Subject"] = subject
         message.attach(MIMEText(html_content, "html"))
+        return message
 
+    async def deliver(self, message: MIMEMultipart):
+        """Sends a built message over the shared session; raises if it was not delivered."""
+        started = time.perf_counter()
         try:
-            # For port 587, we should use STARTTLS instead of direct TLS
-            # aiosmtplib.send handles this automatically if use_tls=False and we call starttls later,
-            # or we can use the explicit parameters.
-            await aiosmtplib.send(
-                message,
-                hostname=self.hostname,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                start_tls=True if self.port == 587 else False,
-                use_tls=True if self.port == 465 else False,
-            )
-            logger.info("email_sent", to=to_emails, count=len(listings))
-        except Exception as e:
-            logger.error("email_failed", error=str(e))
+            await self.sender.send(message)
+        except Exception:
+            metrics.EMAILS_SENT.labels("failed").inc()
+            raise
+        metrics.EMAIL_SEND_SECONDS.observe(time.perf_counter() - started)
+        metrics.EMAILS_SENT.labels("sent").inc()
+
+    async def close(self):
+        await self.sender.close()
@@ -0,0 +1,321 @@
+"""
+Durable outbox for listing alerts, delivered as per-recipient digests.
+
+AgentManager.ingest writes one `notification_outbox` row per (recipient, alert-worthy new listing) in
+the same transaction that stores the listing, so an alert exists exactly when its listing does,
+whatever happens to the process afterwards, and scraping never waits on SMTP. OutboxDispatcher
+delivers them in the background: it leases due rows in batches, sends one email per recipient and
+only then marks the rows sent, and a listing `alerted` once none of its alerts is left unsent. A
+failed send is retried with exponential backoff until OUTBOX_MAX_ATTEMPTS, after which the rows are
+left `failed` with the last error.
+
+Digests: each recipient has one window (hourly by default, see DigestPolicy), whichever agents
+their alerts come from. A row is due at once if its listing's deal score reaches the agent's
+immediate threshold, otherwise at the end of the recipient's window. Windows end on UTC clock
+boundaries, so every agent a recipient is on fills the same digest. Only rows that are due are
+sent; the rest wait for their window. Within a digest the same car is listed once, even when
+several profiles matched it or several sites list it.
+
+Each row's idempotency key (recipient + listing) is unique, so a retried ingest or a resumed run
+never queues the same alert twice. Delivery is at-least-once: if the process dies after the SMTP
+server accepted a message but before its rows were marked sent, the lease expires and the message is
+sent again with the same Message-ID, which mail clients use to drop the duplicate.
+"""
+import asyncio
+import datetime
+import hashlib
+import os
+import socket
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from sqlalchemy import and_, exists, or_, select, update
+from src.notifications.email_client import EmailClient
+from src.storage.database import Agent, Listing, OutboxMessage, utcnow
+from src.utils import tracing
+import structlog
+
+logger = structlog.get_logger()
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+IMMEDIATE = "immediate"
+HOURLY = "hourly"
+DAILY = "daily"
+
+
+@dataclass
+class DigestPolicy:
+    """
+    When alerts are due. The window is per recipient: recipient_windows (lower-case address to
+    window) or else `window`. "immediate" sends every alert at once. With "hourly" or "daily",
+    listings with a deal score of at least immediate_deal_score still go out at once and the rest
+    wait for the end of the current hour or the next daily_hour (UTC).
+    """
+    window: str = HOURLY
+    immediate_deal_score: Optional[float] = 80
+    daily_hour: int = 8
+    recipient_windows: Dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for window in (self.window, *self.recipient_windows.values()):
+            if window not in (IMMEDIATE, HOURLY, DAILY):
+                raise ValueError(f"digest window must be immediate, hourly or daily (got {window!r})")
+
+    @classmethod
+    def for_agent(cls, notifications: dict, default: "DigestPolicy") -> "DigestPolicy":
+        """The agent's `notifications.immediate_deal_score` override of the default."""
+        if "digest" in notifications:
+            logger.warn("agent_digest_setting_ignored", reason="digest windows are set per recipient in DIGEST_RECIPIENT_WINDOWS")
+        if "immediate_deal_score" not in notifications:
+            return default
+        return cls(
+            window=default.window,
+            immediate_deal_score=notifications["immediate_deal_score"],
+            daily_hour=default.daily_hour,
+            recipient_windows=default.recipient_windows,
+        )
+
+    def window_for(self, recipient: str) -> str:
+        return self.recipient_windows.get(recipient, self.window)
+
+    def due_at(self, listing: Listing, now: datetime.datetime, recipient: str = "") -> datetime.datetime:
+        window = self.window_for(recipient)
+        if window == IMMEDIATE:
+            return now
+        threshold = self.immediate_deal_score
+        if threshold is not None and listing.deal_score is not None and listing.deal_score >= threshold:
+            return now
+        if window == DAILY:
+            due = now.replace(hour=self.daily_hour, minute=0, second=0, microsecond=0)
+            return due if due > now else due + datetime.timedelta(days=1)
+        return now.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+
+
+def recipient_windows(setting: str) -> Dict[str, str]:
+    """DIGEST_RECIPIENT_WINDOWS ("a@example.com=daily,b@example.com=immediate") as a dict."""
+    windows = {}
+    for item in (setting or "").split(","):
+        recipient, _, window = item.partition("=")
+        if recipient.strip():
+            windows[recipient.strip().lower()] = window.strip().lower()
+    return windows
+
+
+def idempotency_key(recipient: str, listing_id: int) -> str:
+    return f"listing_alert:{recipient}:{listing_id}"
+
+
+def enqueue_alerts(session, agent_id: str, listings: List[Listing], recipients: List[str], policy: DigestPolicy):
+    """Adds an outbox row per recipient and listing to the caller's transaction (the listings must be flushed)."""
+    now = utcnow()
+    recipients = list(dict.fromkeys(r.strip().lower() for r in recipients if r and r.strip()))
+    session.add_all([
+        OutboxMessage(
+            idempotency_key=idempotency_key(recipient, listing.id),
+            agent_id=agent_id,
+            listing_id=listing.id,
+            recipient=recipient,
+            status=PENDING,
+            attempts=0,
+            available_at=policy.due_at(listing, now, recipient),
+        )
+        for listing in listings
+        for recipient in recipients
+    ])
+
+
+def vehicle_identity(listing: Listing):
+    """
+    Identifies the car behind a listing, to list it once per digest: the VIN when the source
+    provides one, else year/make/model/mileage (an exact odometer match on the same model is
+    the same car on another site), else the listing itself.
+    """
+    raw = listing.raw_json if isinstance(listing.raw_json, dict) else {}
+    if raw.get("vin"):
+        return ("vin", str(raw["vin"]).strip().upper())
+    if listing.year and listing.make and listing.model and listing.mileage:
+        return ("car", int(listing.year), listing.make.lower(), listing.model.lower(), int(listing.mileage))
+    return ("listing", listing.id)
+
+
+class OutboxDispatcher:
+    """
+    Drains the outbox in the daemon, one digest email per recipient. Rows are claimed with a lease like WorkQueue jobs
+    (SKIP LOCKED on Postgres, a conditional UPDATE elsewhere), so several dispatchers never send
+    the same row at once and a row held by a crashed one becomes claimable again.
+    """
+
+    def __init__(self, session_factory, email_client: EmailClient, batch_size: int = 1000, poll_interval: float = 5.0,
+                 max_attempts: int = 8, retry_backoff_seconds: int = 30, max_backoff_seconds: int = 3600,
+                 lease_seconds: int = 300):
+        self.session_factory = session_factory
+        self.email_client = email_client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = asyncio.Event()
+        self._poller: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._poller = asyncio.create_task(self._poll())
+
+    def shutdown(self):
+        if self._poller:
+            self._poller.cancel()
+
+    def wake(self):
+        """Checks the outbox now instead of at the next poll (called when a run queued alerts)."""
+        self._wake.set()
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error("outbox_dispatch_failed", error=str(e))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def drain(self) -> int:
+        """Delivers batches until nothing is due; returns the number of rows processed."""
+        total = 0
+        while True:
+            processed = await self.dispatch_once()
+            if not processed:
+                return total
+            total += processed
+
+    async def dispatch_once(self) -> int:
+        """Claims one batch of due rows and delivers it; returns the number of rows claimed."""
+        rows = await self._claim()
+        if not rows:
+            return 0
+
+        digests = defaultdict(list)
+        for row in rows:
+            digests[row.recipient].append(row)
+        async with self.session_factory() as session:
+            result = await session.execute(select(Listing).where(Listing.id.in_({row.listing_id for row in rows})))
+            listings = {listing.id: listing for listing in result.scalars()}
+            result = await session.execute(select(Agent.id, Agent.name).where(Agent.id.in_({row.agent_id for row in rows})))
+            names = dict(result.all())
+
+        for recipient, digest_rows in digests.items():
+            await self._deliver(recipient, digest_rows, listings, names)
+        return len(rows)
+
+    def _claimable(self, now: datetime.datetime):
+        return or_(
+            and_(OutboxMessage.status == PENDING, OutboxMessage.available_at <= now),
+            and_(OutboxMessage.status == SENDING, OutboxMessage.lease_expires_at < now),
+        )
+
+    async def _claim(self) -> List[OutboxMessage]:
+        async with self.session_factory() as session:
+            now = utcnow()
+            stmt = select(OutboxMessage.id).where(self._claimable(now)).order_by(OutboxMessage.id).limit(self.batch_size)
+            if session.bind.dialect.name == "postgresql":
+                stmt = stmt.with_for_update(skip_locked=True)
+            ids = (await session.execute(stmt)).scalars().all()
+            if not ids:
+                return []
+            # Re-checked in the UPDATE, so rows another dispatcher claimed meanwhile are left to it
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids), self._claimable(now))
+                .values(
+                    status=SENDING,
+                    lease_owner=self.owner,
+                    lease_expires_at=now + datetime.timedelta(seconds=self.lease_seconds),
+                    attempts=OutboxMessage.attempts + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            result = await session.execute(
+                select(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids), OutboxMessage.status == SENDING, OutboxMessage.lease_owner == self.owner)
+                .order_by(OutboxMessage.id)
+            )
+            return list(result.scalars())
+
+    async def _deliver(self, recipient: str, rows: List[OutboxMessage], listings: Dict[int, Listing],
+                       names: Dict[str, str]):
+        sections = defaultdict(list)
+        seen = set()
+        for row in rows:
+            listing = listings.get(row.listing_id)
+            if listing is None:
+                continue
+            identity = vehicle_identity(listing)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            sections[names.get(row.agent_id, row.agent_id)].append(listing)
+        count = sum(len(section) for section in sections.values())
+
+        with tracing.span("send_listing_alerts", alerts=len(rows), listings=count, profiles=len(sections)) as current:
+            if sections:
+                message = self.email_client.build_digest([recipient], dict(sections))
+                message["Message-ID"] = self._message_id(rows)
+                try:
+                    await self.email_client.deliver(message)
+                except Exception as e:
+                    tracing.set_status(current, "error")
+                    await self._failed(rows, str(e))
+                    return
+            tracing.set_status(current, "ok")
+        await self._sent(rows)
+        logger.info("email_sent", to=recipient, count=count, alerts=len(rows), profiles=len(sections))
+
+    def _message_id(self, rows: List[OutboxMessage]) -> str:
+        digest = hashlib.sha1("\n".join(row.idempotency_key for row in rows).encode()).hexdigest()
+        domain = self.email_client.username.rpartition("@")[2] or "luxelink"
+        return f"<{digest}@{domain}>"
+
+    async def _sent(self, rows: List[OutboxMessage]):
+        async with self.session_factory() as session:
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_([row.id for row in rows]), OutboxMessage.lease_owner == self.owner)
+                .values(status=SENT, sent_at=utcnow(), lease_expires_at=None, last_error=None)
+            )
+            # A listing counts as alerted only when every recipient's alert for it has gone out
+            unsent = exists().where(OutboxMessage.listing_id == Listing.id, OutboxMessage.status != SENT)
+            await session.execute(
+                update(Listing)
+                .where(Listing.id.in_({row.listing_id for row in rows}), ~unsent)
+                .values(alerted=True)
+            )
+            await session.commit()
+
+    async def _failed(self, rows: List[OutboxMessage], error: str):
+        """Requeues the rows with exponential backoff, or marks them failed once they are out of attempts."""
+        async with self.session_factory() as session:
+            now = utcnow()
+            for row in rows:
+                values = {"lease_expires_at": None, "last_error": error[:1000]}
+                if row.attempts >= self.max_attempts:
+                    values["status"] = FAILED
+                else:
+                    delay = min(self.retry_backoff_seconds * 2 ** (row.attempts - 1), self.max_backoff_seconds)
+                    values.update(status=PENDING, available_at=now + datetime.timedelta(seconds=delay))
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id == row.id, OutboxMessage.lease_owner == self.owner)
+                    .values(**values)
+                )
+            await session.commit()
+        logger.warn("outbox_delivery_failed", rows=len(rows), attempts=max(row.attempts for row in rows), error=error)
@@ -0,0 +1,142 @@
+"""
+One long-lived, authenticated SMTP session shared by every alert the process sends.
+
+Messages are queued and delivered in order by a single sender task, so all the alerts produced by a
+run (across agents) go over one TLS handshake and one login. While idle the session is kept alive
+with NOOPs every `keepalive_seconds` and closed after `idle_close_seconds`, so it is not held open
+between scheduled runs. A dropped connection (the server timing it out, a network blip) is reopened
+and the message retried once. `max_per_minute` spaces sends out to stay under the provider's rate
+limits (Gmail throttles bursts from one account).
+"""
+import asyncio
+import time
+from email.message import Message
+from typing import Optional
+import aiosmtplib
+import structlog
+from src.utils import metrics
+
+logger = structlog.get_logger()
+
+# Errors after which the session is assumed dead and reopened
+_CONNECTION_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError, OSError)
+
+
+class SmtpSender:
+    def __init__(self, hostname: str, port: int, username: str, password: str, max_per_minute: float = 0,
+                 keepalive_seconds: float = 60, idle_close_seconds: float = 300, use_tls: bool = True):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.min_interval = 60 / max_per_minute if max_per_minute > 0 else 0
+        self.keepalive_seconds = keepalive_seconds
+        self.idle_close_seconds = idle_close_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._last_send = 0.0
+        self._last_used = 0.0
+
+    async def send(self, message: Message):
+        """Queues the message and waits until it has been delivered; raises if delivery failed."""
+        self._ensure_started()
+        delivered = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, delivered))
+        await delivered
+
+    async def close(self):
+        """Stops the sender task and ends the session; messages still queued fail."""
+        task, self._task = self._task, None
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, delivered = self._queue.get_nowait()
+            if not delivered.done():
+                delivered.set_exception(aiosmtplib.SMTPServerDisconnected("SMTP sender closed"))
+        await self._disconnect()
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        # First use, or the previous event loop is gone (a new asyncio.run); its connection went with it
+        self._smtp = None
+        self._queue = asyncio.Queue()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=self.keepalive_seconds)
+            except asyncio.TimeoutError:
+                await self._keepalive()
+                continue
+            await self._deliver(*item)
+
+    async def _deliver(self, message: Message, delivered: asyncio.Future):
+        wait = self._last_send + self.min_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            try:
+                await self._send_once(message)
+            except _CONNECTION_ERRORS as e:
+                logger.warn("smtp_reconnecting", error=str(e))
+                await self._disconnect()
+                await self._send_once(message)
+        except Exception as e:
+            if not delivered.done():
+                delivered.set_exception(e)
+        else:
+            if not delivered.done():
+                delivered.set_result(None)
+        finally:
+            self._last_send = self._last_used = time.monotonic()
+
+    async def _send_once(self, message: Message):
+        if self._smtp is None or not self._smtp.is_connected:
+            await self._connect()
+        await self._smtp.send_message(message)
+
+    async def _connect(self):
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            # 587 = STARTTLS, 465 = implicit TLS, anything else = plain (local relays); use_tls=False is always plain
+            start_tls=self.use_tls and self.port == 587,
+            use_tls=self.use_tls and self.port == 465,
+        )
+        await smtp.connect()
+        self._smtp = smtp
+        metrics.SMTP_CONNECTIONS.inc()
+        logger.info("smtp_connected", host=self.hostname, port=self.port)
+
+    async def _keepalive(self):
+        if self._smtp is None:
+            return
+        if time.monotonic() - self._last_used >= self.idle_close_seconds:
+            await self._disconnect()
+            return
+        try:
+            await self._smtp.noop()
+        except Exception:
+            # Reopened on the next send
+            await self._disconnect()
+
+    async def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
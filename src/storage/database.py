@@ -1,6 +1,8 @@
 import datetime
+import os
 from typing import Optional
-from sqlalchemy import String, DateTime, Boolean, Float, JSON, ForeignKey
+from sqlalchemy import String, DateTime, Boolean, Float, Integer, JSON, ForeignKey, Index, inspect
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -8,6 +10,13 @@ from sqlalchemy.sql import func
 class Base(DeclarativeBase):
     pass
 
+# On SQLite, server_default=func.now() stores "YYYY-MM-DD HH:MM:SS" while bound datetimes get
+# microseconds; binding in the same format keeps comparisons against those values exact
+# (the listings browser's keyset cursors sit on first_seen)
+ServerTimestamp = DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"), "sqlite"
+)
+
 class Agent(Base):
     __tablename__ = "agents"
 
@@ -34,14 +43,196 @@ class Listing(Base):
     make: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     model: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     raw_json: Mapped[dict] = mapped_column(JSON)
-    first_seen: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
-    last_seen: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+    first_seen: Mapped[datetime.datetime] = mapped_column(ServerTimestamp, server_default=func.now())
+    last_seen: Mapped[datetime.datetime] = mapped_column(ServerTimestamp, server_default=func.now(), onupdate=func.now())
     alerted: Mapped[bool] = mapped_column(Boolean, default=False)
     match_score: Mapped[float] = mapped_column(Float, default=0.0)
+    # 0-100 percentile-based deal score against the listing's market (see src/core/market_stats.py)
+    deal_score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    market_key: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
     agent = relationship("Agent", back_populates="listings")
 
-async def init_db(database_url: str):
+    # Keyset pagination of the dashboard's listings browser: one (sort column, id) index per sort
+    __table_args__ = (
+        Index("ix_listings_first_seen_id", "first_seen", "id"),
+        Index("ix_listings_price_id", "price", "id"),
+        Index("ix_listings_mileage_id", "mileage", "id"),
+        Index("ix_listings_match_score_id", "match_score", "id"),
+        Index("ix_listings_deal_score_id", "deal_score", "id"),
+        Index("ix_listings_source", "source"),
+    )
+
+class MarketStat(Base):
+    __tablename__ = "market_stats"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True) # make|model|year band
+    make: Mapped[str] = mapped_column(String)
+    model: Mapped[str] = mapped_column(String)
+    year_band: Mapped[str] = mapped_column(String)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    price_sketch: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    mileage_sketch: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class MarketObservation(Base):
+    """A scraped listing whose price and mileage are already in its market's sketches (each listing counts once)."""
+    __tablename__ = "market_observations"
+
+    external_id: Mapped[str] = mapped_column(String, primary_key=True) # Listing.external_id of the card
+    market_key: Mapped[str] = mapped_column(String)
+    observed_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
+
+class Job(Base):
+    """One (agent, source, query) search in the work queue, claimed by workers with a time-limited lease."""
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    agent_id: Mapped[str] = mapped_column(String, index=True)
+    source: Mapped[str] = mapped_column(String)
+    query_json: Mapped[dict] = mapped_column(JSON) # serialized SearchTask
+    status: Mapped[str] = mapped_column(String, default="pending", index=True) # pending | leased | done | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3)
+    available_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
+    lease_owner: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    lease_expires_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    listings_found: Mapped[int] = mapped_column(Integer, default=0)
+    new_listings: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+class SearchStat(Base):
+    """Recent yield of one (agent, source, vehicle) search, used to prioritise searches within a run."""
+    __tablename__ = "search_stats"
+
+    agent_id: Mapped[str] = mapped_column(String, primary_key=True)
+    source: Mapped[str] = mapped_column(String, primary_key=True)
+    vehicle_key: Mapped[str] = mapped_column(String, primary_key=True) # SearchTask.vehicle_key
+    runs: Mapped[int] = mapped_column(Integer, default=0)
+    new_listings: Mapped[int] = mapped_column(Integer, default=0) # lifetime total
+    yield_ewma: Mapped[float] = mapped_column(Float, default=0.0) # new listings per search, recent-weighted
+    duration_ewma: Mapped[float] = mapped_column(Float, default=0.0) # seconds per search
+    deferred_count: Mapped[int] = mapped_column(Integer, default=0) # runs skipped in a row for lack of time
+    last_run_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    last_new_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    arrival_rate: Mapped[Optional[float]] = mapped_column(Float, nullable=True) # new listings per day, recent-weighted
+    interval_minutes: Mapped[Optional[float]] = mapped_column(Float, nullable=True) # adaptive polling interval
+    next_due_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+class Run(Base):
+    """One in-process run of an agent. A run left 'running' by a crashed process is resumed on the next start."""
+    __tablename__ = "runs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    agent_id: Mapped[str] = mapped_column(String, index=True)
+    status: Mapped[str] = mapped_column(String, default="running", index=True) # running | completed | abandoned
+    started_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    resumed_count: Mapped[int] = mapped_column(Integer, default=0)
+    profile_path: Mapped[Optional[str]] = mapped_column(String, nullable=True) # speedscope file, if the run was profiled
+
+    searches = relationship("RunSearch", back_populates="run")
+
+class RunSearch(Base):
+    """Checkpoint of one planned search in a run, committed together with the listings it ingested."""
+    __tablename__ = "run_searches"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    run_id: Mapped[int] = mapped_column(Integer, ForeignKey("runs.id"), index=True)
+    seq: Mapped[int] = mapped_column(Integer) # position in the run's search order
+    source: Mapped[str] = mapped_column(String)
+    vehicle_key: Mapped[str] = mapped_column(String)
+    task_json: Mapped[dict] = mapped_column(JSON) # serialized SearchTask
+    status: Mapped[str] = mapped_column(String, default="pending") # pending | done | failed | deferred | skipped
+    listings_found: Mapped[int] = mapped_column(Integer, default=0)
+    new_listing_ids: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True) # why it failed or was skipped
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+    run = relationship("Run", back_populates="searches")
+
+class RunSourceStat(Base):
+    """Execution stats of one run's searches for one (source, vehicle), written in bulk when the run's searches end."""
+    __tablename__ = "run_source_stats"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    run_id: Mapped[int] = mapped_column(Integer, ForeignKey("runs.id"), index=True)
+    agent_id: Mapped[str] = mapped_column(String, index=True)
+    source: Mapped[str] = mapped_column(String)
+    vehicle_key: Mapped[str] = mapped_column(String)
+    started_at: Mapped[datetime.datetime] = mapped_column(DateTime, index=True) # of the first search, for time-series queries
+    searches: Mapped[int] = mapped_column(Integer, default=0)
+    duration_seconds: Mapped[float] = mapped_column(Float, default=0.0)
+    pages_loaded: Mapped[int] = mapped_column(Integer, default=0)
+    cards_parsed: Mapped[int] = mapped_column(Integer, default=0)
+    matches: Mapped[int] = mapped_column(Integer, default=0)
+    new_listings: Mapped[int] = mapped_column(Integer, default=0)
+    errors: Mapped[int] = mapped_column(Integer, default=0)
+    blocks: Mapped[int] = mapped_column(Integer, default=0)
+
+class OutboxMessage(Base):
+    """
+    One listing alert owed to one recipient, written in the same transaction as the listing.
+    Delivered (and retried) in per-recipient digests by the outbox dispatcher; see src/notifications/outbox.py.
+    """
+    __tablename__ = "notification_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    idempotency_key: Mapped[str] = mapped_column(String, unique=True) # listing_alert:<recipient>:<listing_id>
+    agent_id: Mapped[str] = mapped_column(String, index=True)
+    listing_id: Mapped[int] = mapped_column(Integer, ForeignKey("listings.id"))
+    recipient: Mapped[str] = mapped_column(String, index=True)
+    status: Mapped[str] = mapped_column(String, default="pending", index=True) # pending | sending | sent | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # When the alert is due: now for immediate alerts, else the end of the recipient's digest window
+    available_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
+    lease_owner: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    lease_expires_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
+    sent_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+class ControlCommand(Base):
+    """Request from the dashboard to the running daemon (e.g. run one agent now), with its live progress."""
+    __tablename__ = "control_commands"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    command: Mapped[str] = mapped_column(String) # run_agent
+    agent_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    status: Mapped[str] = mapped_column(String, default="queued", index=True) # queued | running | done | failed
+    message: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    searches_total: Mapped[int] = mapped_column(Integer, default=0)
+    searches_done: Mapped[int] = mapped_column(Integer, default=0)
+    new_listings: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=func.now())
+    started_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+def utcnow() -> datetime.datetime:
+    # Naive UTC, matching the naive DateTime columns
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# The schema create_all built before migrations existed (agents, listings)
+BASELINE_REVISION = "0001"
+
+def run_migrations(sync_conn):
+    """Upgrades the schema to the latest alembic revision in src/storage/migrations."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.attributes["connection"] = sync_conn
+    tables = inspect(sync_conn).get_table_names()
+    if "listings" in tables and "alembic_version" not in tables:
+        # Created by create_all before migrations existed
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+def make_engine(database_url: str):
     # asyncpg does not support 'sslmode' or 'channel_binding' in the connection string.
     # We strip these out and handle SSL via connect_args.
     if "?" in database_url:
@@ -51,15 +242,18 @@ async def init_db(database_url: str):
         filtered_params = [p for p in params if not p.startswith(("sslmode=", "channel_binding="))]
         database_url = base_url + ("?" + "&".join(filtered_params) if filtered_params else "")
 
-    engine = create_async_engine(
+    return create_async_engine(
         database_url, 
         echo=False,
         pool_pre_ping=True,
         pool_recycle=300,
         connect_args={"ssl": True} if "neon.tech" in database_url else {}
     )
+
+async def init_db(database_url: str):
+    engine = make_engine(database_url)
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
     return engine
 
 def get_session_factory(engine):
@@ -0,0 +1,37 @@
+"""
+Alembic environment for the LuxeLink schema.
+
+init_db runs the migrations on its own connection (see run_migrations in src/storage/database.py).
+From the repo root, `alembic upgrade head` connects to DATABASE_URL, and
+`alembic revision --autogenerate -m "..."` writes a new revision from the models.
+"""
+import asyncio
+from alembic import context
+from src.storage.database import Base, make_engine
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def do_run_migrations(connection):
+    # Batch mode lets ALTERs SQLite can't do natively run as a table copy
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations():
+    from src.utils.config import AppSettings
+
+    engine = make_engine(AppSettings().DATABASE_URL)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+        await connection.commit()
+    await engine.dispose()
+
+
+connection = config.attributes.get("connection")
+if connection is not None:
+    do_run_migrations(connection)
+else:
+    asyncio.run(run_async_migrations())
@@ -0,0 +1,50 @@
+"""Baseline schema: agents and listings, as create_all built them before migrations existed
+
+Revision ID: 0001
+Revises: None
+Create Date: 2026-10-19 09:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('agents',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('enabled', sa.Boolean(), nullable=False),
+    sa.Column('config_json', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('listings',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('external_id', sa.String(), nullable=False),
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('mileage', sa.Float(), nullable=True),
+    sa.Column('year', sa.Float(), nullable=True),
+    sa.Column('make', sa.String(), nullable=True),
+    sa.Column('model', sa.String(), nullable=True),
+    sa.Column('raw_json', sa.JSON(), nullable=False),
+    sa.Column('first_seen', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('last_seen', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('alerted', sa.Boolean(), nullable=False),
+    sa.Column('match_score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('external_id')
+    )
+
+
+def downgrade():
+    op.drop_table('listings')
+    op.drop_table('agents')
@@ -0,0 +1,36 @@
+"""Market stats: price/mileage sketches per market, and deal_score/market_key on listings
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 23:37:04
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('market_stats',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('make', sa.String(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('year_band', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('price_sketch', sa.JSON(), nullable=True),
+    sa.Column('mileage_sketch', sa.JSON(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.add_column('listings', sa.Column('deal_score', sa.Float(), nullable=True))
+    op.add_column('listings', sa.Column('market_key', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('listings') as batch_op:
+        batch_op.drop_column('market_key')
+        batch_op.drop_column('deal_score')
+    op.drop_table('market_stats')
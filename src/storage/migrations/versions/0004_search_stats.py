@@ -0,0 +1,33 @@
+"""Per-search yield stats for prioritising searches within a run
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 23:43:39
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_stats',
+    sa.Column('agent_id', sa.String(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('vehicle_key', sa.String(), nullable=False),
+    sa.Column('runs', sa.Integer(), nullable=False),
+    sa.Column('new_listings', sa.Integer(), nullable=False),
+    sa.Column('yield_ewma', sa.Float(), nullable=False),
+    sa.Column('duration_ewma', sa.Float(), nullable=False),
+    sa.Column('deferred_count', sa.Integer(), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.Column('last_new_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('agent_id', 'source', 'vehicle_key')
+    )
+
+
+def downgrade():
+    op.drop_table('search_stats')
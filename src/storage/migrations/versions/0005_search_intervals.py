@@ -0,0 +1,26 @@
+"""Adaptive polling interval per search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 23:44:59
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('search_stats', sa.Column('arrival_rate', sa.Float(), nullable=True))
+    op.add_column('search_stats', sa.Column('interval_minutes', sa.Float(), nullable=True))
+    op.add_column('search_stats', sa.Column('next_due_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('search_stats') as batch_op:
+        batch_op.drop_column('next_due_at')
+        batch_op.drop_column('interval_minutes')
+        batch_op.drop_column('arrival_rate')
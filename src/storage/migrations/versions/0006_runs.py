@@ -0,0 +1,50 @@
+"""Run checkpoints: runs and their planned searches
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 23:46:25
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('runs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('resumed_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_runs_agent_id'), 'runs', ['agent_id'], unique=False)
+    op.create_index(op.f('ix_runs_status'), 'runs', ['status'], unique=False)
+    op.create_table('run_searches',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('vehicle_key', sa.String(), nullable=False),
+    sa.Column('task_json', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('listings_found', sa.Integer(), nullable=False),
+    sa.Column('new_listing_ids', sa.JSON(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['runs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_run_searches_run_id'), 'run_searches', ['run_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_run_searches_run_id'), table_name='run_searches')
+    op.drop_table('run_searches')
+    op.drop_index(op.f('ix_runs_status'), table_name='runs')
+    op.drop_index(op.f('ix_runs_agent_id'), table_name='runs')
+    op.drop_table('runs')
@@ -0,0 +1,36 @@
+"""Control commands from the dashboard to the daemon
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 23:48:04
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('control_commands',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('command', sa.String(), nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('message', sa.String(), nullable=True),
+    sa.Column('searches_total', sa.Integer(), nullable=False),
+    sa.Column('searches_done', sa.Integer(), nullable=False),
+    sa.Column('new_listings', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_control_commands_status'), 'control_commands', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_control_commands_status'), table_name='control_commands')
+    op.drop_table('control_commands')
@@ -0,0 +1,22 @@
+"""Profile file of a profiled run
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:06:09
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('runs', sa.Column('profile_path', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.drop_column('profile_path')
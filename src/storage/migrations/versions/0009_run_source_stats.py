@@ -0,0 +1,44 @@
+"""Per-run execution stats by source and vehicle
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:09:26
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('run_source_stats',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('vehicle_key', sa.String(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('searches', sa.Integer(), nullable=False),
+    sa.Column('duration_seconds', sa.Float(), nullable=False),
+    sa.Column('pages_loaded', sa.Integer(), nullable=False),
+    sa.Column('cards_parsed', sa.Integer(), nullable=False),
+    sa.Column('matches', sa.Integer(), nullable=False),
+    sa.Column('new_listings', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.Integer(), nullable=False),
+    sa.Column('blocks', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['run_id'], ['runs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_run_source_stats_agent_id'), 'run_source_stats', ['agent_id'], unique=False)
+    op.create_index(op.f('ix_run_source_stats_run_id'), 'run_source_stats', ['run_id'], unique=False)
+    op.create_index(op.f('ix_run_source_stats_started_at'), 'run_source_stats', ['started_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_run_source_stats_started_at'), table_name='run_source_stats')
+    op.drop_index(op.f('ix_run_source_stats_run_id'), table_name='run_source_stats')
+    op.drop_index(op.f('ix_run_source_stats_agent_id'), table_name='run_source_stats')
+    op.drop_table('run_source_stats')
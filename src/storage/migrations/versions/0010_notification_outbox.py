@@ -0,0 +1,42 @@
+"""Notification outbox
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:17:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_outbox',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('idempotency_key', sa.String(), nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=False),
+    sa.Column('listing_id', sa.Integer(), nullable=False),
+    sa.Column('recipients', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('lease_owner', sa.String(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['listing_id'], ['listings.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index(op.f('ix_notification_outbox_agent_id'), 'notification_outbox', ['agent_id'], unique=False)
+    op.create_index(op.f('ix_notification_outbox_status'), 'notification_outbox', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_notification_outbox_status'), table_name='notification_outbox')
+    op.drop_index(op.f('ix_notification_outbox_agent_id'), table_name='notification_outbox')
+    op.drop_table('notification_outbox')
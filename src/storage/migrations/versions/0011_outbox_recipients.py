@@ -0,0 +1,88 @@
+"""One outbox row per recipient, for per-recipient digests
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:20:04
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+outbox = sa.table(
+    'notification_outbox',
+    sa.column('id', sa.Integer),
+    sa.column('idempotency_key', sa.String),
+    sa.column('agent_id', sa.String),
+    sa.column('listing_id', sa.Integer),
+    sa.column('recipients', sa.JSON),
+    sa.column('recipient', sa.String),
+    sa.column('status', sa.String),
+    sa.column('attempts', sa.Integer),
+    sa.column('available_at', sa.DateTime),
+    sa.column('lease_owner', sa.String),
+    sa.column('lease_expires_at', sa.DateTime),
+    sa.column('last_error', sa.String),
+    sa.column('created_at', sa.DateTime),
+    sa.column('sent_at', sa.DateTime),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.add_column(sa.Column('recipient', sa.String(), nullable=True))
+
+    # Split each queued alert into one row per recipient, keyed by recipient + listing
+    conn = op.get_bind()
+    for row in conn.execute(sa.select(outbox)).mappings().all():
+        recipients = list(dict.fromkeys(r.strip().lower() for r in row['recipients'] or [] if r and r.strip()))
+        if not recipients:
+            conn.execute(outbox.delete().where(outbox.c.id == row['id']))
+            continue
+        first, *rest = recipients
+        conn.execute(
+            outbox.update()
+            .where(outbox.c.id == row['id'])
+            .values(recipient=first, idempotency_key=f"listing_alert:{first}:{row['listing_id']}")
+        )
+        copy = {k: v for k, v in row.items() if k not in ('id', 'recipient', 'idempotency_key')}
+        for recipient in rest:
+            conn.execute(outbox.insert().values(
+                dict(copy, recipient=recipient, idempotency_key=f"listing_alert:{recipient}:{row['listing_id']}")
+            ))
+
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.alter_column('recipient', existing_type=sa.String(), nullable=False)
+        batch_op.drop_column('recipients')
+        batch_op.create_index(batch_op.f('ix_notification_outbox_recipient'), ['recipient'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notification_outbox_recipient'))
+        batch_op.add_column(sa.Column('recipients', sa.JSON(), nullable=True))
+
+    # Fold the per-recipient rows of a listing back into one row, keyed by agent + listing
+    conn = op.get_bind()
+    kept = {}
+    for row in conn.execute(sa.select(outbox).order_by(outbox.c.id)).mappings().all():
+        key = (row['agent_id'], row['listing_id'])
+        if key in kept:
+            kept[key][1].append(row['recipient'])
+            conn.execute(outbox.delete().where(outbox.c.id == row['id']))
+        else:
+            kept[key] = (row['id'], [row['recipient']])
+    for (agent_id, listing_id), (row_id, recipients) in kept.items():
+        conn.execute(
+            outbox.update()
+            .where(outbox.c.id == row_id)
+            .values(recipients=recipients, idempotency_key=f"listing_alert:{agent_id}:{listing_id}")
+        )
+
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.alter_column('recipients', existing_type=sa.JSON(), nullable=False)
+        batch_op.drop_column('recipient')
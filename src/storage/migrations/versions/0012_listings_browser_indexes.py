@@ -0,0 +1,31 @@
+"""Listings browser indexes: (sort column, id) per sort, and source
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:35:33
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_listings_deal_score_id', 'listings', ['deal_score', 'id'], unique=False)
+    op.create_index('ix_listings_first_seen_id', 'listings', ['first_seen', 'id'], unique=False)
+    op.create_index('ix_listings_match_score_id', 'listings', ['match_score', 'id'], unique=False)
+    op.create_index('ix_listings_mileage_id', 'listings', ['mileage', 'id'], unique=False)
+    op.create_index('ix_listings_price_id', 'listings', ['price', 'id'], unique=False)
+    op.create_index('ix_listings_source', 'listings', ['source'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_listings_source', table_name='listings')
+    op.drop_index('ix_listings_price_id', table_name='listings')
+    op.drop_index('ix_listings_mileage_id', table_name='listings')
+    op.drop_index('ix_listings_match_score_id', table_name='listings')
+    op.drop_index('ix_listings_first_seen_id', table_name='listings')
+    op.drop_index('ix_listings_deal_score_id', table_name='listings')
@@ -0,0 +1,26 @@
+"""Listings already counted in the market sketches
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 00:45:41
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('market_observations',
+    sa.Column('external_id', sa.String(), nullable=False),
+    sa.Column('market_key', sa.String(), nullable=False),
+    sa.Column('observed_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('external_id')
+    )
+
+
+def downgrade():
+    op.drop_table('market_observations')
@@ -0,0 +1,22 @@
+"""Why a run's search failed or was skipped
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19 01:02:17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('run_searches', sa.Column('error', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('run_searches') as batch_op:
+        batch_op.drop_column('error')
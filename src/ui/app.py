@@ -1,15 +1,19 @@
 import streamlit as st
 import pandas as pd
-import asyncio
 import os
 import sys
 import math
+import time
+import datetime
+from dataclasses import replace
 
 # Add project root to sys.path to handle imports when running from subdirectories
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from sqlalchemy import select
-from src.storage.database import init_db, get_session_factory, Listing, Agent
+from src.core.control import PROFILE_AGENT, RUN_AGENT, submit_command, get_command
+from src.ui import data_access
+from src.ui.data_access import DashboardDB
+from src.storage.database import utcnow
 from src.utils.config import AppSettings
 
 
@@ -20,22 +24,67 @@ st.set_page_config(page_title="LuxeLink", page_icon="💎", layout="wide")
 settings = AppSettings()
 
 
-async def get_listings():
-    engine = await init_db(settings.DATABASE_URL)
-    session_factory = get_session_factory(engine)
-    async with session_factory() as session:
-        stmt = select(Listing).order_by(Listing.first_seen.desc())
-        result = await session.execute(stmt)
-        return result.scalars().all()
-
-
-async def get_agents():
-    engine = await init_db(settings.DATABASE_URL)
-    session_factory = get_session_factory(engine)
-    async with session_factory() as session:
-        stmt = select(Agent)
-        result = await session.execute(stmt)
-        return result.scalars().all()
+# Listings browser sort options: (Listing column, descending); missing values always sort last
+SORT_OPTIONS = {
+    "Newest": ("first_seen", True),
+    "Oldest": ("first_seen", False),
+    "Price: low → high": ("price", False),
+    "Price: high → low": ("price", True),
+    "Mileage: low → high": ("mileage", False),
+    "Mileage: high → low": ("mileage", True),
+    "Match score: high → low": ("match_score", True),
+    "Deal score: high → low": ("deal_score", True),
+}
+
+
+@st.cache_resource
+def get_db() -> DashboardDB:
+    """One engine and connection pool per dashboard process, shared by every session and rerun."""
+    return DashboardDB(settings.DATABASE_URL)
+
+
+def with_rates(df):
+    """Adds per-search averages and error/block rates to a summed run_source_stats frame."""
+    searches = df["searches"].where(df["searches"] > 0)
+    df["seconds_per_search"] = df["duration_seconds"] / searches
+    df["new_per_search"] = df["new_listings"] / searches
+    df["error_rate"] = df["errors"] / searches
+    df["block_rate"] = df["blocks"] / searches
+    return df
+
+
+def follow_run(command_id, agent_name, timeout_seconds=300):
+    """Shows a Run Now request's progress as the daemon reports it."""
+    with st.status(f"Running {agent_name}...", expanded=True) as status:
+        bar = st.progress(0.0)
+        line = st.empty()
+        deadline = time.monotonic() + timeout_seconds
+        cmd = None
+        while time.monotonic() < deadline:
+            cmd = get_db().run(get_command, command_id)
+            if cmd is None:
+                break
+            if cmd.status == "queued":
+                line.write("Waiting for the agent daemon to pick up the request...")
+            else:
+                if cmd.searches_total:
+                    bar.progress(min(1.0, cmd.searches_done / cmd.searches_total))
+                line.write(f"{cmd.message or ''} · {cmd.new_listings} new listing(s)")
+            if cmd.status in ("done", "failed"):
+                break
+            time.sleep(1)
+
+        if cmd is None:
+            status.update(label="Run request not found", state="error")
+        elif cmd.status == "done":
+            bar.progress(1.0)
+            status.update(label=f"{agent_name}: {cmd.message} · {cmd.new_listings} new listing(s)", state="complete")
+        elif cmd.status == "failed":
+            status.update(label=f"{agent_name}: {cmd.message}", state="error")
+        elif cmd.status == "queued":
+            status.update(label="The agent daemon has not picked up the request. Is main.py running?", state="error")
+        else:
+            status.update(label=f"{agent_name} is still running; refresh later for results", state="running")
 
 
 def main():
@@ -58,21 +107,17 @@ def main():
         st.rerun()
 
     # Tabs
-    tab1, tab2, tab3, tab4 = st.tabs(
-        ["📋 Found Listings", "🤖 Search Profiles", "➕ Add Profile", "⚙️ Configuration"]
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["📋 Found Listings", "🤖 Search Profiles", "➕ Add Profile", "📈 Performance", "⚙️ Configuration"]
     )
 
     with tab1:
         st.header("Recent Matches")
-        listings = asyncio.run(get_listings())
+        total, sources, latest_seen = get_db().run(data_access.get_listing_summary)
 
-        if not listings:
+        if not total:
             st.info("No listings found yet. Run an agent to start searching!")
         else:
-            total = len(listings)
-            sources = sorted({l.source for l in listings})
-            latest_seen = max(l.first_seen for l in listings)
-
             m1, m2, m3 = st.columns(3)
             m1.metric("Total matches", total)
             m2.metric("Sources", ", ".join(sources) if sources else "—")
@@ -80,34 +125,6 @@ def main():
 
             st.markdown("### Browse listings")
 
-            # Build a typed dataframe for filtering/sorting (keep numerics as numerics).
-            rows = []
-            for l in listings:
-                rows.append(
-                    {
-                        "listing_id": l.id,
-                        "agent_id": l.agent_id,
-                        "external_id": l.external_id,
-                        "first_seen": l.first_seen,
-                        "year": l.year,
-                        "make": l.make,
-                        "model": l.model,
-                        "title": l.title,
-                        "price": l.price,
-                        "mileage": l.mileage,
-                        "source": l.source,
-                        "match_score": l.match_score,
-                        "url": l.url,
-                        "raw_json": l.raw_json,
-                    }
-                )
-            df = pd.DataFrame(rows)
-            if not df.empty:
-                df["year"] = pd.to_numeric(df["year"], errors="coerce")
-                df["price"] = pd.to_numeric(df["price"], errors="coerce")
-                df["mileage"] = pd.to_numeric(df["mileage"], errors="coerce")
-                df["match_score"] = pd.to_numeric(df["match_score"], errors="coerce")
-
             with st.expander("Filters & view options", expanded=False):
                 qf1, qf2, qf3, qf4 = st.columns(4)
                 with qf1:
@@ -139,15 +156,7 @@ def main():
                 with c4:
                     sort_option = st.selectbox(
                         "Sort by",
-                        options=[
-                            "Newest",
-                            "Oldest",
-                            "Price: low → high",
-                            "Price: high → low",
-                            "Mileage: low → high",
-                            "Mileage: high → low",
-                            "Match score: high → low",
-                        ],
+                        options=list(SORT_OPTIONS),
                         index=0,
                     )
 
@@ -162,79 +171,55 @@ def main():
                     miles_min = st.number_input("Mileage min", min_value=0, value=0, step=1000)
                     miles_max = st.number_input("Mileage max", min_value=0, value=0, step=1000, help="0 = no max")
 
-            # Apply filters
-            f = df.copy()
-
-            # Quick filters
+            # Filters, sort and paging run in the database; only the current page is loaded
+            filter_sources = selected_sources or None
             if q_marketcheck_only:
-                f = f[f["source"] == "marketcheck"]
-            if q_under_100k:
-                f = f[(f["price"].isna()) | (f["price"] <= 100_000)]
-            if q_under_30k_miles:
-                f = f[(f["mileage"].isna()) | (f["mileage"] <= 30_000)]
-            if q_last_7_days:
-                cutoff = pd.Timestamp.utcnow() - pd.Timedelta(days=7)
-                f = f[f["first_seen"] >= cutoff.to_pydatetime()]
-
-            if selected_sources:
-                f = f[f["source"].isin(selected_sources)]
-
-            if keyword:
-                needle = keyword.lower()
-                text = (
-                    f["make"].fillna("").astype(str)
-                    + " "
-                    + f["model"].fillna("").astype(str)
-                    + " "
-                    + f["title"].fillna("").astype(str)
-                ).str.lower()
-                f = f[text.str.contains(needle, na=False)]
-
-            if year_min:
-                f = f[(f["year"].isna()) | (f["year"] >= year_min)]
-            if year_max and year_max < 2100:
-                f = f[(f["year"].isna()) | (f["year"] <= year_max)]
-
-            if price_min and price_min > 0:
-                f = f[(f["price"].isna()) | (f["price"] >= price_min)]
-            if price_max and price_max > 0:
-                f = f[(f["price"].isna()) | (f["price"] <= price_max)]
-
-            if miles_min and miles_min > 0:
-                f = f[(f["mileage"].isna()) | (f["mileage"] >= miles_min)]
-            if miles_max and miles_max > 0:
-                f = f[(f["mileage"].isna()) | (f["mileage"] <= miles_max)]
-
-            # Sorting
-            if sort_option == "Newest":
-                f = f.sort_values("first_seen", ascending=False)
-            elif sort_option == "Oldest":
-                f = f.sort_values("first_seen", ascending=True)
-            elif sort_option == "Price: low → high":
-                f = f.sort_values(["price", "first_seen"], ascending=[True, False], na_position="last")
-            elif sort_option == "Price: high → low":
-                f = f.sort_values(["price", "first_seen"], ascending=[False, False], na_position="last")
-            elif sort_option == "Mileage: low → high":
-                f = f.sort_values(["mileage", "first_seen"], ascending=[True, False], na_position="last")
-            elif sort_option == "Mileage: high → low":
-                f = f.sort_values(["mileage", "first_seen"], ascending=[False, False], na_position="last")
-            elif sort_option == "Match score: high → low":
-                f = f.sort_values(["match_score", "first_seen"], ascending=[False, False], na_position="last")
+                filter_sources = ["marketcheck"] if filter_sources is None or "marketcheck" in filter_sources else []
+            filters = data_access.ListingFilters(
+                keyword=keyword,
+                sources=filter_sources,
+                year_min=year_min or None,
+                year_max=year_max if year_max and year_max < 2100 else None,
+                price_min=price_min or None,
+                price_max=min(filter(None, [price_max, 100_000 if q_under_100k else 0]), default=None),
+                mileage_min=miles_min or None,
+                mileage_max=min(filter(None, [miles_max, 30_000 if q_under_30k_miles else 0]), default=None),
+                since=utcnow() - datetime.timedelta(days=7) if q_last_7_days else None,
+            )
+            sort_column, sort_descending = SORT_OPTIONS[sort_option]
 
             # Pagination controls
             p1, p2, p3 = st.columns([0.25, 0.25, 0.5])
             with p1:
                 page_size = st.selectbox("Rows per page", options=[25, 50, 100, 200], index=1)
-            total_rows = int(len(f))
+            total_rows = get_db().run(data_access.count_listings, filters)
             total_pages = max(1, math.ceil(total_rows / page_size))
+
+            # Keyset paging: the cursor each visited page started at, reset when the query changes
+            query_key = repr((replace(filters, since=None), q_last_7_days, sort_option, page_size))
+            if st.session_state.get("listing_query") != query_key:
+                st.session_state["listing_query"] = query_key
+                st.session_state["listing_cursors"] = [None]
+            cursors = st.session_state["listing_cursors"]
+            page_rows, next_cursor = get_db().run(
+                data_access.get_listing_page, filters, sort_column, sort_descending, page_size, cursors[-1]
+            )
+            page = len(cursors)
             with p2:
-                page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1)
+                b1, b2 = st.columns(2)
+                if b1.button("← Previous", disabled=page == 1):
+                    cursors.pop()
+                    st.rerun()
+                if b2.button("Next →", disabled=next_cursor is None):
+                    cursors.append(next_cursor)
+                    st.rerun()
             with p3:
-                st.caption(f"Showing {total_rows:,} match(es) • Page {int(page)} of {total_pages}")
+                st.caption(f"Showing {total_rows:,} match(es) • Page {page} of {total_pages}")
 
-            start = (int(page) - 1) * page_size
-            end = start + page_size
-            page_df = f.iloc[start:end].copy()
+            page_df = pd.DataFrame(page_rows, columns=[column.key for column in data_access.LISTING_COLUMNS])
+            for column in ("year", "price", "mileage", "match_score", "deal_score"):
+                page_df[column] = pd.to_numeric(page_df[column], errors="coerce")
+            page_df["first_seen"] = pd.to_datetime(page_df["first_seen"])
 
             def extract_image_urls(raw_json: object) -> list[str]:
                 urls: list[str] = []
@@ -318,18 +303,29 @@ def main():
                 if url:
                     st.markdown(f"[Open listing]({url})")
 
-                d1, d2, d3, d4 = st.columns([0.25, 0.25, 0.25, 0.25])
+                d1, d2, d3, d4, d5 = st.columns(5)
                 d1.metric("Year", fmt_int(row.get("year")))
                 d2.metric("Price", fmt_money(row.get("price")))
                 d3.metric("Mileage", fmt_int(row.get("mileage"), " mi"))
                 d4.metric("Score", fmt_int(row.get("match_score")) if not pd.isna(row.get("match_score")) else "—")
+                d5.metric("Deal", fmt_int(row.get("deal_score")) if not pd.isna(row.get("deal_score")) else "—")
+
+                market_key = row.get("market_key")
+                market = get_db().run(data_access.get_market_summary, market_key) if market_key else None
+                if market and market["count"]:
+                    st.caption(
+                        f"Market ({market_key.split('|')[-1]}, {market['count']:,} listings): "
+                        f"median {fmt_money(market['price_median'])} • "
+                        f"middle half {fmt_money(market['price_p25'])}–{fmt_money(market['price_p75'])} • "
+                        f"median mileage {fmt_int(market['mileage_median'], ' mi')}"
+                    )
 
                 meta1, meta2, meta3 = st.columns([0.4, 0.3, 0.3])
                 meta1.caption(f"Source: {row.get('source') or '—'}")
                 meta2.caption(f"Agent: {row.get('agent_id') or '—'}")
                 meta3.caption(f"Found: {row.get('first_seen')}")
 
-                raw_json = row.get("raw_json")
+                raw_json = get_db().run(data_access.get_listing_raw_json, int(row["listing_id"]))
                 imgs = extract_image_urls(raw_json)
                 if imgs:
                     st.markdown("**Photos**")
@@ -350,6 +346,7 @@ def main():
                         "Mileage": page_df["mileage"].apply(lambda x: fmt_int(x, " mi")),
                         "Source": page_df["source"].fillna(""),
                         "Score": page_df["match_score"].apply(lambda x: fmt_int(x) if not pd.isna(x) else "—"),
+                        "Deal": page_df["deal_score"].apply(lambda x: fmt_int(x) if not pd.isna(x) else "—"),
                         "URL": page_df["url"].fillna(""),
                     }
                 )
@@ -412,12 +409,16 @@ def main():
                                 st.caption(f"Source: {source_str}")
                                 if url:
                                     st.markdown(f"[View listing]({url})")
-                                with st.expander("Details"):
-                                    render_listing_details(row)
+                                # Details (photos, market, raw data) are only queried once the expander is opened
+                                with st.expander(
+                                    "Details", key=f"details_{row['listing_id']}", on_change="rerun"
+                                ) as details:
+                                    if details.open:
+                                        render_listing_details(row)
 
     with tab2:
         st.header("Active Search Profiles")
-        agents = asyncio.run(get_agents())
+        agents = get_db().run(data_access.get_agents)
         if not agents:
             st.warning("No search profiles found. Create one in the 'Add Profile' tab!")
         else:
@@ -462,40 +463,21 @@ def main():
                             st.markdown(f"**Emails:** {', '.join(emails)}")
 
                 with col2:
+                    profile_run = st.checkbox("Profile", key=f"profile_{agent.id}", help="Save a sampling profile of this run")
                     if st.button(f"Run Now", key=f"run_{agent.id}"):
-                        st.info(f"Triggering run for {agent.name}...")
-                        # In a real app, we'd use a task queue.
-                        st.success("Run triggered!")
+                        # The running daemon (main.py) picks this up and runs the agent on its warm state
+                        command = PROFILE_AGENT if profile_run else RUN_AGENT
+                        command_id = get_db().run(submit_command, command, agent.id)
+                        follow_run(command_id, agent.name)
 
                 with col3:
                     status_label = "Disable" if agent.enabled else "Enable"
                     if st.button(status_label, key=f"toggle_{agent.id}"):
-                        async def toggle_agent(aid, current_status):
-                            engine = await init_db(settings.DATABASE_URL)
-                            session_factory = get_session_factory(engine)
-                            async with session_factory() as session:
-                                db_agent = await session.get(Agent, aid)
-                                if db_agent:
-                                    db_agent.enabled = not current_status
-                                    cfg = db_agent.config_json.copy()
-                                    cfg["enabled"] = not current_status
-                                    db_agent.config_json = cfg
-                                    await session.commit()
-
-                        asyncio.run(toggle_agent(agent.id, agent.enabled))
+                        get_db().run(data_access.set_agent_enabled, agent.id, not agent.enabled)
                         st.rerun()
 
                     if st.button("🗑️ Delete", key=f"del_{agent.id}"):
-                        async def delete_agent(aid):
-                            engine = await init_db(settings.DATABASE_URL)
-                            session_factory = get_session_factory(engine)
-                            async with session_factory() as session:
-                                db_agent = await session.get(Agent, aid)
-                                if db_agent:
-                                    await session.delete(db_agent)
-                                    await session.commit()
-
-                        asyncio.run(delete_agent(agent.id))
+                        get_db().run(data_access.delete_agent, agent.id)
                         st.success("Profile deleted!")
                         st.rerun()
 
@@ -546,24 +528,48 @@ def main():
                     "notifications": {"email_to": [settings.GMAIL_USER]},
                 }
 
-                async def save_profile(cfg):
-                    engine = await init_db(settings.DATABASE_URL)
-                    session_factory = get_session_factory(engine)
-                    async with session_factory() as session:
-                        new_agent = Agent(
-                            id=cfg["id"],
-                            name=cfg["name"],
-                            enabled=True,
-                            config_json=cfg,
-                        )
-                        session.add(new_agent)
-                        await session.commit()
-
-                asyncio.run(save_profile(new_config))
+                get_db().run(data_access.create_agent, new_config)
                 st.success(f"Profile '{profile_name}' created successfully!")
                 st.rerun()
 
     with tab4:
+        st.header("Search Performance")
+        days = st.select_slider("Period (days)", options=[1, 7, 14, 30, 90], value=14)
+        daily, by_vehicle = get_db().run(data_access.get_source_stats, days)
+        daily, by_vehicle = pd.DataFrame(daily), pd.DataFrame(by_vehicle)
+
+        if daily.empty:
+            st.info("No search statistics recorded in this period yet.")
+        else:
+            daily = with_rates(daily)
+            totals = daily[["searches", "pages_loaded", "new_listings", "errors", "blocks"]].sum()
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Searches", int(totals["searches"]))
+            m2.metric("Pages loaded", int(totals["pages_loaded"]))
+            m3.metric("New listings", int(totals["new_listings"]))
+            m4.metric("Errors / blocks", f"{int(totals['errors'])} / {int(totals['blocks'])}")
+
+            for column, label in [
+                ("seconds_per_search", "Average seconds per search"),
+                ("new_per_search", "New listings per search"),
+                ("error_rate", "Errors per search"),
+                ("block_rate", "Block detections per search"),
+            ]:
+                st.subheader(label)
+                st.line_chart(daily.pivot(index="day", columns="source", values=column))
+
+            st.subheader("By source and vehicle")
+            by_vehicle = with_rates(by_vehicle).sort_values("seconds_per_search", ascending=False)
+            st.dataframe(
+                by_vehicle[[
+                    "source", "vehicle_key", "searches", "seconds_per_search", "pages_loaded", "cards_parsed",
+                    "matches", "new_per_search", "error_rate", "block_rate",
+                ]],
+                width="stretch",
+                hide_index=True,
+            )
+
+    with tab5:
         st.header("System Configuration")
         st.write(
             "**Database URL (masked):**", settings.DATABASE_URL.split("@")[-1]
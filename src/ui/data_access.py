@@ -0,0 +1,211 @@
+"""
+Data access for the Streamlit dashboard.
+
+Streamlit reruns app.py on every interaction, so the dashboard keeps one DashboardDB per process
+(cached with st.cache_resource): a single engine and connection pool, created (and the schema
+migrated) once. An async engine's pooled connections belong to the event loop that opened them,
+so the engine lives on its own background loop thread instead of a fresh asyncio.run() per call.
+The UI calls `db.run(fn, *args)` with one of the coroutines below, each taking the session factory
+first.
+"""
+import asyncio
+import atexit
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import Row, and_, func, or_, select
+from src.core.market_stats import summarize
+from src.storage.database import Agent, Listing, MarketStat, RunSourceStat, get_session_factory, init_db, utcnow
+
+
+class DashboardDB:
+    """A process-wide engine and session factory on a background event loop."""
+
+    def __init__(self, database_url: str):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="dashboard-db", daemon=True)
+        self._thread.start()
+        self.engine = self._call(init_db(database_url))
+        self.session_factory = get_session_factory(self.engine)
+        atexit.register(self.dispose)
+
+    def run(self, fn, *args, **kwargs):
+        """Runs the coroutine fn(session_factory, *args, **kwargs) on the background loop and returns its result."""
+        return self._call(fn(self.session_factory, *args, **kwargs))
+
+    def dispose(self):
+        if self._loop.is_closed():
+            return
+        self._call(self.engine.dispose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+@dataclass
+class ListingFilters:
+    """The listings browser's filters, as SQL. None leaves a filter off; listings missing a year, price or mileage pass it."""
+    keyword: str = ""
+    sources: Optional[List[str]] = None # [] matches nothing
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    mileage_min: Optional[float] = None
+    mileage_max: Optional[float] = None
+    since: Optional[datetime.datetime] = None
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.sources is not None:
+            conditions.append(Listing.source.in_(self.sources))
+        if self.keyword:
+            text = func.coalesce(Listing.make, "") + " " + func.coalesce(Listing.model, "") + " " + func.coalesce(Listing.title, "")
+            conditions.append(func.lower(text).contains(self.keyword.lower(), autoescape=True))
+        for column, low, high in (
+            (Listing.year, self.year_min, self.year_max),
+            (Listing.price, self.price_min, self.price_max),
+            (Listing.mileage, self.mileage_min, self.mileage_max),
+        ):
+            if low is not None:
+                conditions.append(or_(column.is_(None), column >= low))
+            if high is not None:
+                conditions.append(or_(column.is_(None), column <= high))
+        if self.since is not None:
+            conditions.append(Listing.first_seen >= self.since)
+        return conditions
+
+
+# Keyset cursor: the (sort value, id) of the last row of the previous page
+Cursor = Tuple[Any, int]
+
+# What the list views show; raw_json (photos, provider details) is loaded per listing on demand
+LISTING_COLUMNS = (
+    Listing.id.label("listing_id"), Listing.agent_id, Listing.first_seen, Listing.year, Listing.make, Listing.model,
+    Listing.title, Listing.price, Listing.mileage, Listing.source, Listing.match_score, Listing.deal_score,
+    Listing.market_key, Listing.url,
+)
+
+
+async def get_listing_summary(session_factory) -> Tuple[int, List[str], Optional[datetime.datetime]]:
+    """Total listings, their sources and the newest first_seen, without loading any listing."""
+    async with session_factory() as session:
+        total, latest = (await session.execute(select(func.count(), func.max(Listing.first_seen)).select_from(Listing))).one()
+        sources = (await session.execute(select(Listing.source).distinct().order_by(Listing.source))).scalars().all()
+        return total, list(sources), latest
+
+
+async def count_listings(session_factory, filters: ListingFilters) -> int:
+    async with session_factory() as session:
+        stmt = select(func.count()).select_from(Listing).where(*filters.conditions())
+        return (await session.execute(stmt)).scalar_one()
+
+
+async def get_listing_page(session_factory, filters: ListingFilters, sort: str = "first_seen", descending: bool = True,
+                           page_size: int = 50, after: Optional[Cursor] = None) -> Tuple[List[Row], Optional[Cursor]]:
+    """
+    One page of listings (LISTING_COLUMNS rows) ordered by `sort`, then id in the same direction, starting after the cursor;
+    listings missing the sort value come last. Returns the page and the cursor of the next one (None
+    on the last page). Each part is an index seek on (sort column, id), so any page costs the same
+    however many listings there are.
+    """
+    column = getattr(Listing, sort)
+    beyond = (lambda c, v: c < v) if descending else (lambda c, v: c > v)
+    by_id = Listing.id.desc() if descending else Listing.id.asc()
+    limit = page_size + 1
+    stmt = select(*LISTING_COLUMNS).where(*filters.conditions())
+
+    rows = []
+    async with session_factory() as session:
+        if after is None or after[0] is not None:
+            valued = stmt.where(column.is_not(None))
+            if after is not None:
+                value, last_id = after
+                valued = valued.where(or_(beyond(column, value), and_(column == value, beyond(Listing.id, last_id))))
+            valued = valued.order_by(column.desc() if descending else column.asc(), by_id).limit(limit)
+            rows += (await session.execute(valued)).all()
+        if len(rows) < limit:
+            missing = stmt.where(column.is_(None))
+            if after is not None and after[0] is None:
+                missing = missing.where(beyond(Listing.id, after[1]))
+            rows += (await session.execute(missing.order_by(by_id).limit(limit - len(rows)))).all()
+
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (getattr(rows[-1], sort), rows[-1].listing_id)
+
+
+async def get_listing_raw_json(session_factory, listing_id: int) -> Optional[dict]:
+    """The provider payload of one listing, for its details view."""
+    async with session_factory() as session:
+        return (await session.execute(select(Listing.raw_json).where(Listing.id == listing_id))).scalar_one_or_none()
+
+
+async def get_market_summary(session_factory, key: str) -> Optional[dict]:
+    async with session_factory() as session:
+        return summarize(await session.get(MarketStat, key))
+
+
+async def get_agents(session_factory) -> List[Agent]:
+    async with session_factory() as session:
+        result = await session.execute(select(Agent))
+        return list(result.scalars())
+
+
+async def set_agent_enabled(session_factory, agent_id: str, enabled: bool):
+    async with session_factory() as session:
+        db_agent = await session.get(Agent, agent_id)
+        if db_agent:
+            db_agent.enabled = enabled
+            cfg = db_agent.config_json.copy()
+            cfg["enabled"] = enabled
+            db_agent.config_json = cfg
+            await session.commit()
+
+
+async def delete_agent(session_factory, agent_id: str):
+    async with session_factory() as session:
+        db_agent = await session.get(Agent, agent_id)
+        if db_agent:
+            await session.delete(db_agent)
+            await session.commit()
+
+
+async def create_agent(session_factory, cfg: dict):
+    async with session_factory() as session:
+        session.add(Agent(id=cfg["id"], name=cfg["name"], enabled=True, config_json=cfg))
+        await session.commit()
+
+
+async def get_source_stats(session_factory, days: int):
+    """run_source_stats summed per day and source, and per source and vehicle, over the last `days` days."""
+    since = utcnow() - datetime.timedelta(days=days)
+    totals = (
+        func.sum(RunSourceStat.searches).label("searches"),
+        func.sum(RunSourceStat.duration_seconds).label("duration_seconds"),
+        func.sum(RunSourceStat.pages_loaded).label("pages_loaded"),
+        func.sum(RunSourceStat.cards_parsed).label("cards_parsed"),
+        func.sum(RunSourceStat.matches).label("matches"),
+        func.sum(RunSourceStat.new_listings).label("new_listings"),
+        func.sum(RunSourceStat.errors).label("errors"),
+        func.sum(RunSourceStat.blocks).label("blocks"),
+    )
+    day = func.date(RunSourceStat.started_at).label("day")
+    async with session_factory() as session:
+        daily = await session.execute(
+            select(day, RunSourceStat.source, *totals)
+            .where(RunSourceStat.started_at >= since)
+            .group_by(day, RunSourceStat.source)
+            .order_by(day)
+        )
+        by_vehicle = await session.execute(
+            select(RunSourceStat.source, RunSourceStat.vehicle_key, *totals)
+            .where(RunSourceStat.started_at >= since)
+            .group_by(RunSourceStat.source, RunSourceStat.vehicle_key)
+        )
+        return daily.mappings().all(), by_vehicle.mappings().all()
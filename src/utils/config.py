@@ -26,6 +26,8 @@ class AgentParameters(BaseModel):
     features_any: List[str] = Field(default_factory=list)
     features_all: List[str] = Field(default_factory=list)
     exclude_keywords: List[str] = Field(default_factory=list)
+    # Only alert on listings whose deal score (0-100, market percentile) is at least this
+    deal_score_min: Optional[float] = None
 
 class AgentConfig(BaseModel):
     id: str
@@ -40,8 +42,81 @@ class AppSettings(BaseSettings):
     DATABASE_URL: str
     GMAIL_USER: str
     GMAIL_APP_PASSWORD: str
+    SMTP_HOST: str = "smtp.gmail.com"
+    SMTP_PORT: int = 587 # 587 = STARTTLS, 465 = implicit TLS, anything else = plain (local relays)
+    SMTP_USE_TLS: bool = True # False = plain SMTP on any port (e.g. a local test server on 587)
+    SMTP_MAX_PER_MINUTE: float = 20 # Alert emails sent per minute at most over the shared session (0 = no limit)
+    SMTP_KEEPALIVE_SECONDS: float = 60 # NOOP interval that keeps an idle SMTP session open
+    SMTP_IDLE_CLOSE_SECONDS: float = 300 # Close the SMTP session after this long without sending
     MARKETCHECK_API_KEY: Optional[str] = None
     LOG_LEVEL: str = "INFO"
+    # Re-rank the filter rules by measured cost and rejection rate (the static order already runs
+    # price/year/mileage before the fuzzy make/model match)
+    FILTER_ADAPTIVE_ORDER: bool = False
+    FILTER_COLLECT_STATS: bool = False # Count and sample-time each filter rule; logged after every run_all_agents
+    # Run provider searches in this many worker processes (0 = on the main event loop)
+    SCRAPER_PROCESSES: int = 0
+    # Try a plain HTTP fetch + parse (cars.com, Bring a Trailer) before launching a browser; falls back when blocked
+    HTTP_FAST_PATH: bool = True
+    SCRAPE_DELAY_SECONDS: float = 2.0 # Human-like pause between a scraper's vehicle searches
+
+    # Scheduling: each agent runs on its own cron schedule
+    RUN_TIME_BUDGET_MINUTES: int = 180 # Per agent run; searches left over are deferred to the next run (0 = no limit)
+    RUN_RESUME_MAX_AGE_HOURS: int = 12 # Interrupted runs older than this start over instead of resuming
+    MAX_CONCURRENT_AGENT_RUNS: int = 2
+    SCHEDULE_SPREAD_SECONDS: int = 900 # Deterministic per-agent start offset window
+    SCHEDULE_JITTER_SECONDS: int = 60 # Extra random jitter per run
+    SCHEDULE_REFRESH_MINUTES: int = 5 # How often dashboard profile changes are picked up
+
+    # Adaptive polling: agents are checked every POLL_TICK_MINUTES instead of on their cron schedule,
+    # and each (source, vehicle) search runs when its own interval, learned from new-listing arrivals, is due
+    ADAPTIVE_POLLING: bool = False
+    POLL_TICK_MINUTES: int = 15
+    POLL_INTERVAL_MIN_MINUTES: int = 60
+    POLL_INTERVAL_MAX_MINUTES: int = 1440
+    POLL_TARGET_NEW_LISTINGS: float = 1.0 # Expected new listings per poll the interval aims for
+
+    # Provider traffic: "off" (live), "record" (live, saved to the fixtures dir) or "replay" (offline from the fixtures dir)
+    PROVIDER_FIXTURES_MODE: str = "off"
+    PROVIDER_FIXTURES_DIR: str = "fixtures/providers"
+
+    # Tracing of the run pipeline (see src/utils/tracing.py): "off", "file" (OTLP/JSON lines) or "otlp" (OTLP/HTTP)
+    TRACING_EXPORTER: str = "off"
+    TRACING_FILE: str = "traces/spans.otlp.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://127.0.0.1:4318/v1/traces"
+
+    # Sampling profiles of agent runs (see src/utils/profiling.py), saved as speedscope JSON next to the run record
+    PROFILE_AGENTS: str = "" # Comma-separated agent ids profiled on every run, "*" for all (one-off: the dashboard's Profile option)
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL_MS: float = 5.0
+
+    # Prometheus /metrics endpoint of the daemon (disabled unless a port is set)
+    METRICS_PORT: Optional[int] = None
+    METRICS_HOST: str = "127.0.0.1"
+
+    # How often the daemon checks for dashboard commands ("Run Now") and edits to config/agents.yaml
+    CONTROL_POLL_SECONDS: float = 1.0
+    CONFIG_WATCH_SECONDS: float = 5.0
+
+    # Work queue: the daemon enqueues searches and `python -m src.worker` processes run them
+    WORK_QUEUE_ENABLED: bool = False
+    WORK_LEASE_SECONDS: int = 300
+    WORK_MAX_ATTEMPTS: int = 3
+    WORKER_CONCURRENCY: int = 1
+    WORKER_POLL_SECONDS: float = 5.0
+    WORKER_BLOCKED_SOURCE_MINUTES: float = 30 # A worker holds back a source's jobs this long after an empty streak
+
+    # Notification outbox: alerts are queued with their listings and emailed by the daemon's dispatcher
+    OUTBOX_POLL_SECONDS: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 1000 # Rows claimed at once; also caps the listings in one email
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BACKOFF_SECONDS: int = 30 # Doubles per failed attempt
+    OUTBOX_MAX_BACKOFF_SECONDS: int = 3600
+    # Per-recipient digests (agents can override the deal score with notifications.immediate_deal_score)
+    DIGEST_WINDOW: str = "hourly" # immediate | hourly | daily
+    DIGEST_RECIPIENT_WINDOWS: str = "" # Per-recipient windows, e.g. "ops@example.com=daily,me@example.com=immediate"
+    DIGEST_IMMEDIATE_DEAL_SCORE: Optional[float] = 80 # Deals scoring at least this skip the digest (unset = never)
+    DIGEST_DAILY_HOUR: int = 8 # UTC hour daily digests go out
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
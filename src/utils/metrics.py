@@ -0,0 +1,148 @@
+"""
+Prometheus metrics for the agent daemon, served on http://METRICS_HOST:METRICS_PORT/metrics.
+
+Metric objects live at module level (the prometheus_client convention) and are updated from
+AgentManager, the providers (via BaseProvider helpers), EmailClient, the scheduler and the DB engine.
+When searches run in a process pool (SCRAPER_PROCESSES), set PROMETHEUS_MULTIPROC_DIR to an empty
+directory so the worker processes' provider metrics are aggregated into the same endpoint; without it
+they stay in the workers and the pool logs a warning at startup. The directory must be set before
+the daemon starts (prometheus_client picks the mode at import) and emptied between restarts.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Optional
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, start_http_server
+from sqlalchemy import event
+import structlog
+
+logger = structlog.get_logger()
+
+_SCRAPE_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+SEARCH_SECONDS = Histogram(
+    "luxelink_provider_search_seconds", "Wall time of one provider search", ["source"], buckets=_SCRAPE_BUCKETS
+)
+PAGE_LOAD_SECONDS = Histogram(
+    "luxelink_page_load_seconds", "Time for page.goto to reach domcontentloaded", ["source"], buckets=_SCRAPE_BUCKETS
+)
+SEARCH_ERRORS = Counter("luxelink_search_errors_total", "Provider searches that raised", ["source"])
+CARDS_PARSED = Counter("luxelink_cards_parsed_total", "Listing cards parsed from provider results", ["source"])
+LISTINGS_MATCHED = Counter("luxelink_listings_matched_total", "Parsed listings that matched an agent", ["source"])
+NEW_LISTINGS = Counter("luxelink_new_listings_total", "Matched listings stored for the first time", ["source"])
+BLOCKS_DETECTED = Counter(
+    "luxelink_blocks_detected_total", "Times a provider looked blocked (403, bot wall, empty streak)", ["source", "kind"]
+)
+FAST_PATH = Counter(
+    "luxelink_fast_path_total", "Browserless fetch attempts: 'used', or why it fell back to the browser", ["source", "outcome"]
+)
+BROWSER_LAUNCHES = Counter("luxelink_browser_launches_total", "Chromium instances started by providers", ["source"])
+BROWSER_CONTEXTS = Gauge(
+    "luxelink_browser_contexts_in_flight", "Open Playwright browser contexts", ["source"], multiprocess_mode="livesum"
+)
+
+AGENT_RUN_SECONDS = Histogram(
+    "luxelink_agent_run_seconds", "Wall time of one agent run", buckets=_SCRAPE_BUCKETS + (600, 1200, 1800, 3600, 7200)
+)
+SCHEDULER_LAG_SECONDS = Histogram(
+    "luxelink_scheduler_lag_seconds", "Delay between a job's scheduled fire time and its submission",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "luxelink_db_query_seconds", "Time per DB statement", ["operation"], buckets=_FAST_BUCKETS
+)
+EMAIL_SEND_SECONDS = Histogram(
+    "luxelink_email_send_seconds", "Time to deliver one alert email over SMTP", buckets=_FAST_BUCKETS + (10, 30)
+)
+EMAILS_SENT = Counter("luxelink_emails_total", "Alert emails by outcome", ["status"])
+SMTP_CONNECTIONS = Counter("luxelink_smtp_connections_total", "SMTP sessions opened (TLS handshake + login)")
+
+
+@dataclass
+class SearchCounters:
+    """Per-search tallies for run_source_stats, collected alongside the Prometheus metrics above."""
+    pages_loaded: int = 0
+    matches: int = 0
+    blocks: int = 0
+
+    def merge(self, other: dict):
+        for name, value in other.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+_search_counters: ContextVar[Optional[SearchCounters]] = ContextVar("search_counters", default=None)
+
+
+@contextmanager
+def counting_search():
+    """Collects count_search() calls made by the current task (provider helpers, ingest) until exit."""
+    counters = SearchCounters()
+    token = _search_counters.set(counters)
+    try:
+        yield counters
+    finally:
+        _search_counters.reset(token)
+
+
+def count_search(name: str, n: int = 1):
+    counters = _search_counters.get()
+    if counters is not None:
+        setattr(counters, name, getattr(counters, name) + n)
+
+
+def current_search_counters() -> Optional[SearchCounters]:
+    return _search_counters.get()
+
+
+def multiprocess_enabled() -> bool:
+    """True when metrics are written to PROMETHEUS_MULTIPROC_DIR and aggregated across processes."""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def mark_process_dead(pid: int):
+    """Removes an exited process's live gauges from the aggregate (no-op outside multiprocess mode)."""
+    if multiprocess_enabled():
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    registry = REGISTRY
+    if multiprocess_enabled():
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, addr=host, registry=registry)
+    logger.info("metrics_server_started", host=host, port=port)
+
+
+def instrument_engine(engine):
+    """Times every statement the engine executes, labelled by its first keyword (select, insert, ...)."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+        DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
@@ -0,0 +1,59 @@
+"""
+Sampling profiles of individual agent runs, for finding hot spots in production without redeploying.
+
+A profile is taken with pyinstrument in async mode, bound to the run's own asyncio task (and the search
+tasks it gathers). Other agents running at the same time are left out. Time the run spends awaiting
+Playwright, HTTP or the database shows up as `[await]` under the awaiting call. The result is written as
+speedscope JSON (open it at https://www.speedscope.app) to PROFILE_DIR, and its path is stored on the
+run's `runs` row.
+
+Profiles are requested with PROFILE_AGENTS (every run of those agents) or with a `profile_agent` control
+command (one run, e.g. from the dashboard). Searches that run in SCRAPER_PROCESSES workers or on queue
+workers are not sampled; only the time spent waiting for them is.
+"""
+import os
+from typing import Optional
+import structlog
+
+logger = structlog.get_logger()
+
+
+def profiled_agents(setting: str) -> set:
+    """PROFILE_AGENTS as a set of agent ids; "*" profiles every agent."""
+    return {agent_id.strip() for agent_id in (setting or "").split(",") if agent_id.strip()}
+
+
+class RunProfiler:
+    """Samples the calling task from start() to save()."""
+
+    def __init__(self, directory: str, interval_ms: float = 5.0):
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self._profiler = None
+
+    def start(self) -> bool:
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warn("profiling_unavailable", reason="pyinstrument is not installed")
+            return False
+        self._profiler = Profiler(interval=self.interval, async_mode="enabled")
+        self._profiler.start()
+        return True
+
+    def save(self, run_id: int, agent_id: str) -> Optional[str]:
+        """Stops sampling and writes the profile; returns its path, or None if nothing was captured."""
+        if self._profiler is None:
+            return None
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        session = self._profiler.stop()
+        self._profiler = None
+        if session is None:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"run-{run_id}-{agent_id}.speedscope.json")
+        with open(path, "w") as f:
+            f.write(SpeedscopeRenderer().render(session))
+        logger.info("run_profile_saved", run_id=run_id, agent_id=agent_id, path=path, seconds=round(session.duration, 1))
+        return path
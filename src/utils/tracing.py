@@ -0,0 +1,146 @@
+"""
+OpenTelemetry tracing of the run pipeline.
+
+    run_all_agents
+      run_agent                      agent.id
+        provider.search              source, vehicle, cards, status
+          provider.navigation        url, http.status_code
+          provider.wait_for_selector selector, found
+          provider.extraction        cards
+        ingest
+          filter                     evaluated, matched, new
+          db.commit                  new_listings
+    send_listing_alerts              alerts, listings, profiles, status (outbox dispatcher, per digest)
+
+Spans are no-ops until `setup_tracing` installs an exporter (TRACING_EXPORTER):
+"file" appends OTLP/JSON (one ExportTraceServiceRequest per line, the format of the OpenTelemetry
+Collector's file exporter and otlpjsonfile receiver) to TRACING_FILE; "otlp" sends OTLP/HTTP to
+TRACING_OTLP_ENDPOINT (e.g. a local collector or Jaeger on :4318).
+"""
+import base64
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional, Sequence
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import Status, StatusCode
+import structlog
+
+logger = structlog.get_logger()
+
+OFF = "off"
+FILE = "file"
+OTLP = "otlp"
+
+# OTLP/JSON writes these ids as hex, where protobuf's JSON mapping would write base64
+_ID_FIELDS = {"traceId", "spanId", "parentSpanId"}
+
+tracer = trace.get_tracer("luxelink")
+
+_provider: Optional[TracerProvider] = None
+
+
+class OtlpJsonFileExporter(SpanExporter):
+    """Appends each batch of spans to a file as one line of OTLP/JSON."""
+
+    def __init__(self, path: str):
+        from google.protobuf.json_format import MessageToDict
+        from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+
+        self.path = path
+        self._encode = encode_spans
+        self._to_dict = MessageToDict
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        request = self._to_dict(self._encode(spans), use_integers_for_enums=True)
+        line = json.dumps(_hex_ids(request), separators=(",", ":"))
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.error("trace_export_failed", path=self.path, error=str(e))
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _hex_ids(value):
+    if isinstance(value, dict):
+        return {
+            k: base64.b64decode(v).hex() if k in _ID_FIELDS and isinstance(v, str) else _hex_ids(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_hex_ids(v) for v in value]
+    return value
+
+
+def setup_tracing(settings, service_name: str = "luxelink-daemon", batch: bool = True):
+    """
+    Installs the exporter chosen by TRACING_EXPORTER; a no-op when it is "off".
+    batch=False exports each span as it ends, for processes that exit without running atexit hooks (pool workers).
+    """
+    global _provider
+    mode = (settings.TRACING_EXPORTER or OFF).lower()
+    if mode == OFF:
+        return
+    if mode == FILE:
+        exporter = OtlpJsonFileExporter(settings.TRACING_FILE)
+    elif mode == OTLP:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        exporter = OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    else:
+        raise ValueError(f"TRACING_EXPORTER must be off, file or otlp (got {mode!r})")
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name, "process.pid": os.getpid()}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter) if batch else SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info("tracing_enabled", exporter=mode)
+
+
+def shutdown_tracing():
+    """Flushes buffered spans; call before the process exits."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def context_carrier() -> dict:
+    """The current span context as W3C trace headers, to parent spans in another process."""
+    carrier = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+@contextmanager
+def attached(carrier: Optional[dict]):
+    """Makes spans started inside children of the span `carrier` was taken from."""
+    token = context.attach(propagate.extract(carrier or {}))
+    try:
+        yield
+    finally:
+        context.detach(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """A child of the current span; None-valued attributes are dropped, exceptions mark it as an error."""
+    with tracer.start_as_current_span(
+        name, attributes={k: v for k, v in attributes.items() if v is not None}
+    ) as current:
+        yield current
+
+
+def set_status(current, status: str):
+    """Sets the span's `status` attribute (ok, empty, blocked, error, ...) and marks errors on the span."""
+    current.set_attribute("status", status)
+    if status == "error":
+        current.set_status(Status(StatusCode.ERROR))
@@ -0,0 +1,194 @@
+"""
+Work-queue worker: claims provider searches from the jobs table and runs them.
+
+    python -m src.worker --concurrency 2
+
+Start as many worker processes, on as many machines, as the scraping load needs;
+they only share the database. The daemon (main.py with WORK_QUEUE_ENABLED=true) enqueues the work.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+from src.utils.config import AgentConfig, AppSettings
+from src.storage.database import init_db, get_session_factory, Job
+from src.core.agent_manager import AgentManager, SourceHealth
+from src.core.search_plan import SearchTask
+from src.core.work_queue import LeaseLost, WorkQueue, job_task
+from src.utils.metrics import instrument_engine, start_metrics_server
+from src.utils.tracing import setup_tracing, shutdown_tracing
+import structlog
+
+logger = structlog.get_logger()
+
+
+class QueueWorker:
+    """
+    Runs claimed jobs the way an in-process run runs its searches: the same SCRAPE_DELAY_SECONDS
+    pause after a scraper search, and the same empty-streak block detection (SourceHealth), after
+    which the source's jobs are deferred for WORKER_BLOCKED_SOURCE_MINUTES. A job whose lease is
+    lost is abandoned, since another worker may be running it. Database errors are logged and
+    retried; they never stop a worker slot.
+    """
+
+    def __init__(self, manager: AgentManager, queue: WorkQueue, worker_id: str,
+                 concurrency: int = 1, poll_interval: float = 5.0, blocked_source_seconds: float = 1800):
+        self.manager = manager
+        self.queue = queue
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.health = SourceHealth(cooldown_seconds=blocked_source_seconds)
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        logger.info("worker_started", worker_id=self.worker_id, concurrency=self.concurrency)
+        await asyncio.gather(*(self._loop(f"{self.worker_id}:{i}") for i in range(self.concurrency)))
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _loop(self, slot_id: str):
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(slot_id)
+                if job is not None:
+                    await self.process(job, slot_id)
+                    continue
+                await self.queue.reap()
+            except Exception as e:
+                # A DB outage or a failing job must not stop the worker. A job left leased is
+                # claimable again once its lease expires.
+                logger.error("worker_iteration_failed", worker_id=slot_id, error=str(e))
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process(self, job: Job, slot_id: str):
+        task = job_task(job)
+        logger.info("job_started", job_id=job.id, agent_id=task.agent_id, source=task.source,
+                    vehicle=task.vehicle_key, attempt=job.attempts)
+
+        agent_cfg = await self.manager.load_agent(task.agent_id)
+        if agent_cfg is None or task.source not in self.manager.providers:
+            await self.queue.complete(job.id, slot_id)
+            return
+
+        if self.health.is_blocked(task.source):
+            await self.queue.defer(job.id, slot_id, self.health.cooldown_seconds)
+            try:
+                await self.manager.search_stats.postpone([task])
+            except Exception as e:
+                logger.error("search_stats_update_failed", agent_id=task.agent_id, source=task.source, error=str(e))
+            logger.info("job_deferred_source_blocked", job_id=job.id, source=task.source)
+            return
+
+        work = asyncio.create_task(self._run_job(agent_cfg, task, job.id, slot_id))
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, slot_id))
+        try:
+            await asyncio.wait({work, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            heartbeat.cancel()
+        if not work.done():
+            # The heartbeat lost the lease
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            return
+
+        try:
+            found, new = work.result()
+        except LeaseLost:
+            return
+        except Exception as e:
+            self.health.failed(task)
+            await self.queue.fail(job.id, slot_id, str(e))
+            return
+
+        if not await self.queue.complete(job.id, slot_id, listings_found=found, new_listings=new):
+            logger.warn("job_lease_lost", job_id=job.id, worker_id=slot_id)
+            return
+        logger.info("job_finished", job_id=job.id, found=found, new=new)
+
+        if not self.health.finished(task, found):
+            await self.manager.pause_between_searches(task)
+
+    async def _run_job(self, agent_cfg: AgentConfig, task: SearchTask, job_id: int, slot_id: str):
+        started = time.monotonic()
+        raw = await self.manager.execute_search(task)
+        # Only store the results if the job is still ours
+        if not await self.queue.heartbeat(job_id, slot_id):
+            logger.warn("job_lease_lost", job_id=job_id, worker_id=slot_id)
+            raise LeaseLost()
+        new_matches = await self.manager.ingest(agent_cfg, raw)
+        await self.manager.record_search(task, len(new_matches), time.monotonic() - started)
+        self.manager.notify(agent_cfg, len(new_matches))
+        return len(raw), len(new_matches)
+
+    async def _heartbeat(self, job_id: int, slot_id: str):
+        """Extends the job's lease until cancelled; returns only once the lease is known to be lost."""
+        interval = max(1, self.queue.lease_seconds // 3)
+        delay = interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                renewed = await self.queue.heartbeat(job_id, slot_id)
+            except Exception as e:
+                # A failed update doesn't mean the lease is gone; retry well before it would expire
+                logger.warn("job_heartbeat_failed", job_id=job_id, worker_id=slot_id, error=str(e))
+                delay = max(1, interval // 5)
+                continue
+            if not renewed:
+                logger.warn("job_lease_lost", job_id=job_id, worker_id=slot_id)
+                return
+            delay = interval
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="LuxeLink work-queue worker")
+    parser.add_argument("--concurrency", type=int, default=None, help="jobs processed at once (default: WORKER_CONCURRENCY)")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}:{os.getpid()}")
+    args = parser.parse_args()
+
+    settings = AppSettings()
+    structlog.configure(
+        processors=[
+            structlog.processors.JSONRenderer()
+        ]
+    )
+
+    engine = await init_db(settings.DATABASE_URL)
+    instrument_engine(engine)
+    session_factory = get_session_factory(engine)
+
+    if settings.METRICS_PORT:
+        start_metrics_server(settings.METRICS_PORT, settings.METRICS_HOST)
+    setup_tracing(settings, "luxelink-worker")
+    manager = AgentManager(session_factory, settings, [])
+    queue = WorkQueue(
+        session_factory,
+        lease_seconds=settings.WORK_LEASE_SECONDS,
+        max_attempts=settings.WORK_MAX_ATTEMPTS,
+    )
+    worker = QueueWorker(
+        manager,
+        queue,
+        args.worker_id,
+        concurrency=args.concurrency or settings.WORKER_CONCURRENCY,
+        poll_interval=settings.WORKER_POLL_SECONDS,
+        blocked_source_seconds=settings.WORKER_BLOCKED_SOURCE_MINUTES * 60,
+    )
+
+    try:
+        await worker.run()
+    except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
+        logger.info("worker_shutting_down", worker_id=args.worker_id)
+    finally:
+        await manager.email_client.close()
+        await manager.close()
+        await engine.dispose()
+        shutdown_tracing()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+import pytest
+from src.storage.database import Agent, Listing, get_session_factory, init_db
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    """A migrated SQLite database in a temporary directory."""
+    engine = await init_db(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    yield get_session_factory(engine)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def agent(session_factory):
+    async with session_factory() as session:
+        session.add(Agent(id="agent_1", name="Test Agent", config_json={}))
+        await session.commit()
+    return "agent_1"
+
+
+def make_listing(external_id: str, agent_id: str = "agent_1", **fields) -> Listing:
+    values = dict(
+        agent_id=agent_id,
+        source="cars_com",
+        external_id=external_id,
+        url=f"https://example.com/{external_id}",
+        title=f"Listing {external_id}",
+        raw_json={},
+    )
+    values.update(fields)
+    return Listing(**values)
@@ -0,0 +1,80 @@
+import datetime
+import random
+import pytest
+from src.ui.data_access import ListingFilters, count_listings, get_listing_page
+from conftest import make_listing
+
+SORTS = ["first_seen", "price", "mileage", "match_score", "deal_score"]
+
+
+@pytest.fixture
+async def listings(session_factory, agent):
+    """60 listings with ties and missing (NULL) values in every nullable sort column."""
+    rng = random.Random(5)
+    start = datetime.datetime(2026, 1, 1)
+    rows = [
+        make_listing(
+            f"car-{i}",
+            agent,
+            source=rng.choice(["cars_com", "carfax"]),
+            first_seen=start + datetime.timedelta(hours=rng.randrange(10)),
+            price=rng.choice([None, 50000, 75000, 75000, 99000.5]),
+            mileage=rng.choice([None, 1200, 8000, 8000]),
+            year=rng.choice([None, 2018, 2022]),
+            match_score=rng.choice([0.0, 10.0, 10.0, 30.0]),
+            deal_score=rng.choice([None, None, 40.0, 85.0]),
+        )
+        for i in range(60)
+    ]
+    async with session_factory() as session:
+        session.add_all(rows)
+        await session.commit()
+    return rows
+
+
+def expected_ids(rows, sort, descending, keep=lambda row: True):
+    """Sorted by the column, ties by id in the same direction, rows missing the value last."""
+    rows = [row for row in rows if keep(row)]
+    valued = sorted((r for r in rows if getattr(r, sort) is not None), key=lambda r: (getattr(r, sort), r.id), reverse=descending)
+    missing = sorted((r for r in rows if getattr(r, sort) is None), key=lambda r: r.id, reverse=descending)
+    return [row.id for row in valued + missing]
+
+
+async def all_pages(session_factory, filters, sort, descending, page_size):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor = await get_listing_page(session_factory, filters, sort, descending, page_size, cursor)
+        assert len(page) <= page_size
+        ids += [row.listing_id for row in page]
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("page_size", [1, 7, 60, 100])
+async def test_pages_follow_the_sort_across_ties_and_nulls(session_factory, listings, sort, descending, page_size):
+    ids, pages = await all_pages(session_factory, ListingFilters(), sort, descending, page_size)
+    assert ids == expected_ids(listings, sort, descending)
+    assert pages == max(1, -(-len(listings) // page_size))
+
+
+async def test_pages_of_a_filtered_view(session_factory, listings):
+    filters = ListingFilters(sources=["carfax"], price_max=80000)
+    keep = lambda row: row.source == "carfax" and (row.price is None or row.price <= 80000)
+    ids, _ = await all_pages(session_factory, filters, "price", False, 4)
+    assert ids == expected_ids(listings, "price", False, keep)
+    assert await count_listings(session_factory, filters) == len(ids)
+
+
+async def test_cursor_inside_the_null_tail(session_factory, listings):
+    tail = expected_ids(listings, "deal_score", True)[-5:]
+    page, cursor = await get_listing_page(session_factory, ListingFilters(), "deal_score", True, 2, (None, tail[0]))
+    assert [row.listing_id for row in page] == tail[1:3]
+    assert cursor == (None, tail[2])
+
+
+async def test_empty_result(session_factory, listings):
+    page, cursor = await get_listing_page(session_factory, ListingFilters(sources=[]), "price", True, 10)
+    assert (page, cursor) == ([], None)
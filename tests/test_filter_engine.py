@@ -0,0 +1,78 @@
+import pytest
+from benchmarks.synthetic import SyntheticListingGenerator, default_parameters
+from src.core.filter_engine import FilterEngine
+from src.data.base_provider import ListingRecord
+from src.utils.config import AgentParameters, VehicleCriteria
+
+PROFILES = {
+    "vehicles": default_parameters(),
+    "makes_models": AgentParameters(
+        makes=["Porsche", "Ferrari", "BMW"],
+        models=["911", "M3", "488 GTB"],
+        year_min=2012,
+        price_max=250000,
+        mileage_max=60000,
+        exclude_keywords=["salvage", "rebuilt"],
+    ),
+}
+
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_adaptive_order_gives_the_same_results(profile):
+    params = PROFILES[profile]
+    listings = SyntheticListingGenerator(seed=7).listings(4000)
+    static = FilterEngine()
+    adaptive = FilterEngine(adaptive_order=True, reorder_interval=100)
+    timed = FilterEngine(collect_stats=True)
+
+    expected = [static.evaluate(listing, params) for listing in listings]
+    assert [adaptive.evaluate(listing, params) for listing in listings] == expected
+    assert [timed.evaluate(listing, params) for listing in listings] == expected
+    # The mix exercises both outcomes
+    assert {passed for passed, _ in expected} == {True, False}
+
+
+def test_stats_are_only_collected_when_asked_for():
+    params = PROFILES["vehicles"]
+    listings = SyntheticListingGenerator(seed=7).listings(200)
+    engine = FilterEngine()
+    for listing in listings:
+        engine.evaluate(listing, params)
+    assert engine.stats() == {}
+
+    engine = FilterEngine(collect_stats=True)
+    for listing in listings:
+        engine.evaluate(listing, params)
+    assert sum(rule["evaluations"] for rule in engine.stats().values()) > 0
+
+
+@pytest.mark.parametrize("field", ["external_id", "source", "url", "title"])
+def test_cards_missing_a_required_string_are_rejected_on_construction(field):
+    values = dict(external_id="1", source="cars_com", url="https://example.com/1", title="2019 Porsche 911")
+    values[field] = None
+    with pytest.raises(ValueError):
+        ListingRecord(**values)
+
+
+def test_check_reports_the_vehicle_and_skips_fuzzy_matching_after_a_cheap_rejection(monkeypatch):
+    params = AgentParameters(
+        vehicles=[VehicleCriteria(make="Porsche", model="911"), VehicleCriteria(make="BMW", model="M3")],
+        price_max=100000,
+    )
+    engine = FilterEngine()
+    calls = []
+    match_vehicle = engine.match_vehicle
+    monkeypatch.setattr(engine, "match_vehicle", lambda *args: calls.append(args) or match_vehicle(*args))
+
+    matched = engine.check(ListingRecord(external_id="1", source="cars_com", url="u", title="2019 BMW M3", price=60000), params)
+    assert (matched.is_match, matched.vehicle, matched.rejected_by) == (True, params.vehicles[1], None)
+    assert len(calls) == 1
+
+    expensive = engine.check(ListingRecord(external_id="2", source="cars_com", url="u", title="2019 BMW M3", price=150000), params)
+    assert (expensive.is_match, expensive.vehicle, expensive.rejected_by) == (False, None, "price")
+    assert not expensive.passed_cheap_checks
+    assert len(calls) == 1
+
+    other = engine.check(ListingRecord(external_id="3", source="cars_com", url="u", title="2019 Audi R8", price=90000), params)
+    assert (other.is_match, other.vehicle, other.rejected_by) == (False, None, "vehicles")
+    assert other.passed_cheap_checks
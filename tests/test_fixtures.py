@@ -0,0 +1,50 @@
+import gzip
+import httpx
+from src.data.fixtures import FixtureStore, ProviderFixtures, RECORD, REPLAY
+
+URL = "https://api.example.com/search?make=Porsche&api_key=secret"
+BODY = b'{"listings": [{"id": "1", "heading": "2019 Porsche 911"}]}'
+
+
+def gzip_upstream(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200,
+        headers={"content-type": "application/json", "content-encoding": "gzip"},
+        content=gzip.compress(BODY),
+    )
+
+
+async def test_records_gzip_response_and_replays_it(tmp_path):
+    store = FixtureStore(str(tmp_path))
+
+    recorder = ProviderFixtures(store, RECORD).transport("marketcheck", httpx.MockTransport(gzip_upstream))
+    async with httpx.AsyncClient(transport=recorder) as client:
+        recorded = await client.get(URL)
+    assert recorded.status_code == 200
+    assert recorded.content == BODY
+    assert "content-encoding" not in recorded.headers
+
+    replayer = ProviderFixtures(store, REPLAY).transport("marketcheck")
+    async with httpx.AsyncClient(transport=replayer) as client:
+        # The volatile api_key doesn't change which recording answers
+        replayed = await client.get(URL.replace("secret", "other"))
+    assert replayed.status_code == 200
+    assert replayed.headers["content-type"] == "application/json"
+    assert replayed.json() == recorded.json()
+
+
+async def test_replay_answers_unrecorded_urls_with_404(tmp_path):
+    replayer = ProviderFixtures(FixtureStore(str(tmp_path)), REPLAY).transport("marketcheck")
+    async with httpx.AsyncClient(transport=replayer) as client:
+        response = await client.get(URL)
+    assert response.status_code == 404
+
+
+async def test_recordings_of_different_zips_are_kept_apart(tmp_path):
+    store = FixtureStore(str(tmp_path))
+    store.save("marketcheck", f"{URL}&zip=10001", 200, "application/json", b'{"listings": []}')
+    store.save("marketcheck", f"{URL}&zip=90001", 200, "application/json", BODY)
+
+    assert store.load("marketcheck", f"{URL}&zip=10001")["body"] == b'{"listings": []}'
+    assert store.load("marketcheck", f"{URL}&zip=90001")["body"] == BODY
+    assert store.load("marketcheck", f"{URL}&zip=60601") is None
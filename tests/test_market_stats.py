@@ -0,0 +1,126 @@
+import random
+import pytest
+from sqlalchemy import func, select
+from src.core.market_stats import MarketStats, QuantileSketch, market_key
+from src.storage.database import MarketObservation, MarketStat
+
+ACCURACY = 0.01
+
+
+def prices(n: int, seed: int):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(11, 0.6) for _ in range(n)]
+
+
+def true_rank(values, value):
+    return sum(v <= value for v in values) / len(values)
+
+
+def sketch_of(values) -> QuantileSketch:
+    sketch = QuantileSketch(relative_accuracy=ACCURACY)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def test_quantiles_are_within_the_relative_accuracy():
+    values = prices(5000, seed=1)
+    sketch = sketch_of(values)
+    ordered = sorted(values)
+    for q in (0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= ACCURACY * exact * (1 + 1e-9)
+
+
+def test_rank_is_bounded_by_the_neighbouring_buckets():
+    values = prices(5000, seed=2)
+    sketch = sketch_of(values)
+    gamma = (1 + ACCURACY) / (1 - ACCURACY)
+    for value in (20000, 45000, 60000, 120000, 400000):
+        assert true_rank(values, value / gamma) <= sketch.rank(value) <= true_rank(values, value * gamma)
+    assert sketch.rank(1) == 0.0
+    assert sketch.rank(1e9) == 1.0
+
+
+def test_zero_and_negative_values_are_counted_at_the_bottom():
+    sketch = sketch_of([0, -5, 100, 200])
+    assert sketch.count == 4
+    assert sketch.rank(0) == 0.5
+    assert sketch.quantile(0.0) == 0.0
+
+
+def test_merged_sketch_equals_a_sketch_of_all_values():
+    values = prices(3000, seed=3)
+    left, right = sketch_of(values[:1000]), sketch_of(values[1000:])
+    left.merge(right)
+    assert left.to_dict() == sketch_of(values).to_dict()
+
+
+def test_merge_into_an_empty_sketch_and_round_trip():
+    sketch = QuantileSketch(relative_accuracy=ACCURACY)
+    sketch.merge(sketch_of(prices(500, seed=4)))
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.count == 500
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    assert QuantileSketch.from_dict(None).count == 0
+
+
+def test_sketches_of_different_accuracy_do_not_merge():
+    with pytest.raises(ValueError):
+        QuantileSketch(relative_accuracy=0.01).merge(QuantileSketch(relative_accuracy=0.02))
+
+
+def test_collapsing_low_buckets_keeps_upper_quantiles():
+    values = [1.5 ** i for i in range(1, 80)]
+    sketch = QuantileSketch(relative_accuracy=ACCURACY, max_buckets=100)
+    for value in values:
+        sketch.add(value)
+    assert len(sketch.counts) <= 100
+    assert sketch.count == len(values)
+    assert abs(sketch.quantile(1.0) - values[-1]) <= ACCURACY * values[-1] * (1 + 1e-9)
+
+
+CARDS = {f"car-{i}": ("Porsche", "911", 2020, 90000 + 1000 * i, 10000 + 100 * i) for i in range(12)}
+
+
+async def observe(session_factory, stats, cards, commit=True):
+    async with session_factory() as session:
+        batch = await stats.observe_listings(session, cards)
+        await stats.flush(session, batch)
+        if commit:
+            await session.commit()
+            stats.committed(batch)
+        else:
+            await session.rollback()
+            stats.discard(batch)
+    return batch
+
+
+async def stored_count(session_factory):
+    async with session_factory() as session:
+        row = await session.get(MarketStat, market_key("Porsche", "911", 2020))
+        observed = await session.scalar(select(func.count()).select_from(MarketObservation))
+        return (row.count if row else 0), observed
+
+
+async def test_each_listing_is_observed_once(session_factory):
+    stats = MarketStats()
+    await observe(session_factory, stats, CARDS)
+    again = await observe(session_factory, stats, CARDS)
+    assert again.external_ids == []
+    # Another process only knows them from market_observations
+    assert (await observe(session_factory, MarketStats(), CARDS)).external_ids == []
+    assert await stored_count(session_factory) == (12, 12)
+
+    async with session_factory() as session:
+        assert await stats.deal_score(session, "Porsche", "911", 2021, 50000, None) == 100.0
+
+
+async def test_rolled_back_observations_are_observed_on_retry(session_factory):
+    stats = MarketStats()
+    await observe(session_factory, stats, CARDS, commit=False)
+    assert await stored_count(session_factory) == (0, 0)
+
+    retried = await observe(session_factory, stats, CARDS)
+    assert sorted(retried.external_ids) == sorted(CARDS)
+    assert await stored_count(session_factory) == (12, 12)
@@ -0,0 +1,182 @@
+import datetime
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from src.notifications.outbox import (
+    DAILY, HOURLY, IMMEDIATE, DigestPolicy, OutboxDispatcher, enqueue_alerts, recipient_windows,
+)
+from src.storage.database import Listing, OutboxMessage, utcnow
+from conftest import make_listing
+
+NOW = datetime.datetime(2026, 3, 10, 14, 25, 7)
+
+
+class StubEmailClient:
+    """Builds real digests but records deliveries instead of sending; recipients in `failing` raise."""
+
+    username = "alerts@example.com"
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.delivered = []
+
+    def build_digest(self, to_emails, sections):
+        return {"To": to_emails[0], "sections": sections}
+
+    async def deliver(self, message):
+        if message["To"] in self.failing:
+            raise ConnectionError("smtp down")
+        self.delivered.append(message)
+
+
+async def queue_alert(session_factory, agent_id, recipients, policy=DigestPolicy(window=IMMEDIATE),
+                      external_id="car-1", **fields):
+    async with session_factory() as session:
+        listing = make_listing(external_id, agent_id, **fields)
+        session.add(listing)
+        await session.flush()
+        enqueue_alerts(session, agent_id, [listing], recipients, policy)
+        await session.commit()
+        return listing.id
+
+
+async def outbox_rows(session_factory):
+    async with session_factory() as session:
+        return (await session.execute(select(OutboxMessage).order_by(OutboxMessage.id))).scalars().all()
+
+
+@pytest.mark.parametrize("policy, deal_score, due", [
+    (DigestPolicy(), None, datetime.datetime(2026, 3, 10, 15, 0)),
+    (DigestPolicy(window=IMMEDIATE), 10, NOW),
+    (DigestPolicy(window=HOURLY), None, datetime.datetime(2026, 3, 10, 15, 0)),
+    (DigestPolicy(window=HOURLY), 79, datetime.datetime(2026, 3, 10, 15, 0)),
+    (DigestPolicy(window=HOURLY), 80, NOW),
+    (DigestPolicy(window=HOURLY, immediate_deal_score=None), 99, datetime.datetime(2026, 3, 10, 15, 0)),
+    (DigestPolicy(window=DAILY, daily_hour=8), None, datetime.datetime(2026, 3, 11, 8, 0)),
+    (DigestPolicy(window=DAILY, daily_hour=20), None, datetime.datetime(2026, 3, 10, 20, 0)),
+])
+def test_digest_due_at(policy, deal_score, due):
+    assert policy.due_at(Listing(deal_score=deal_score), NOW) == due
+
+
+def test_agent_overrides_the_deal_score_only():
+    default = DigestPolicy(window=HOURLY, immediate_deal_score=80, daily_hour=6, recipient_windows={"a@example.com": DAILY})
+    policy = DigestPolicy.for_agent({"digest": "immediate", "immediate_deal_score": 90}, default)
+    assert (policy.window, policy.immediate_deal_score, policy.daily_hour) == (HOURLY, 90, 6)
+    assert policy.recipient_windows == {"a@example.com": DAILY}
+    assert DigestPolicy.for_agent({"digest": "weekly"}, default) is default
+
+
+def test_recipient_windows():
+    windows = recipient_windows(" Ops@Example.com = daily, me@example.com=immediate,")
+    assert windows == {"ops@example.com": DAILY, "me@example.com": IMMEDIATE}
+    policy = DigestPolicy(recipient_windows=windows)
+    listing = Listing(deal_score=None)
+    assert policy.due_at(listing, NOW, "ops@example.com") == datetime.datetime(2026, 3, 11, 8, 0)
+    assert policy.due_at(listing, NOW, "me@example.com") == NOW
+    assert policy.due_at(listing, NOW, "other@example.com") == datetime.datetime(2026, 3, 10, 15, 0)
+    with pytest.raises(ValueError):
+        DigestPolicy(recipient_windows=recipient_windows("ops@example.com=weekly"))
+
+
+async def test_alerts_are_queued_once_per_recipient_and_listing(session_factory, agent):
+    listing_id = await queue_alert(session_factory, agent, ["A@example.com ", "a@example.com", "b@example.com"])
+    assert [row.recipient for row in await outbox_rows(session_factory)] == ["a@example.com", "b@example.com"]
+
+    # Queuing the same alert again (a retried ingest) violates its idempotency key
+    async with session_factory() as session:
+        listing = await session.get(Listing, listing_id)
+        enqueue_alerts(session, agent, [listing], ["a@example.com"], DigestPolicy())
+        with pytest.raises(IntegrityError):
+            await session.commit()
+
+
+async def test_only_due_alerts_are_sent(session_factory, agent):
+    hourly = DigestPolicy(window=HOURLY)
+    await queue_alert(session_factory, agent, ["a@example.com", "b@example.com"], hourly, external_id="car-1")
+    await queue_alert(session_factory, agent, ["a@example.com"], hourly, external_id="car-2", deal_score=95)
+    client = StubEmailClient()
+
+    assert await OutboxDispatcher(session_factory, client).drain() == 1
+    assert len(client.delivered) == 1
+    digest = client.delivered[0]
+    assert digest["To"] == "a@example.com"
+    assert [l.external_id for l in digest["sections"]["Test Agent"]] == ["car-2"]
+    # car-1 waits for the hour for both recipients
+    assert [row.status for row in await outbox_rows(session_factory)] == ["pending", "pending", "sent"]
+
+
+async def test_recipient_window_applies_across_agents(session_factory, agent):
+    policy = DigestPolicy(window=IMMEDIATE, recipient_windows={"a@example.com": DAILY})
+    await queue_alert(session_factory, agent, ["a@example.com", "b@example.com"], policy, external_id="car-1")
+    other = DigestPolicy.for_agent({"immediate_deal_score": 90}, policy)
+    await queue_alert(session_factory, agent, ["A@example.com"], other, external_id="car-2")
+    rows = await outbox_rows(session_factory)
+    assert [(row.recipient, row.available_at > utcnow()) for row in rows] == [
+        ("a@example.com", True), ("b@example.com", False), ("a@example.com", True),
+    ]
+    assert rows[0].available_at == rows[2].available_at
+
+
+async def test_failed_delivery_backs_off_then_gives_up(session_factory, agent):
+    await queue_alert(session_factory, agent, ["a@example.com"])
+    client = StubEmailClient(failing={"a@example.com"})
+    dispatcher = OutboxDispatcher(session_factory, client, max_attempts=2, retry_backoff_seconds=30)
+
+    before = utcnow()
+    assert await dispatcher.dispatch_once() == 1
+    [row] = await outbox_rows(session_factory)
+    assert (row.status, row.attempts, row.last_error) == ("pending", 1, "smtp down")
+    assert row.available_at >= before + datetime.timedelta(seconds=29)
+    assert await dispatcher.dispatch_once() == 0
+
+    async with session_factory() as session:
+        await session.execute(update(OutboxMessage).values(available_at=utcnow() - datetime.timedelta(seconds=1)))
+        await session.commit()
+    assert await dispatcher.dispatch_once() == 1
+    [row] = await outbox_rows(session_factory)
+    assert (row.status, row.attempts) == ("failed", 2)
+    assert await dispatcher.dispatch_once() == 0
+
+
+async def test_retried_digest_keeps_its_message_id(session_factory, agent):
+    await queue_alert(session_factory, agent, ["a@example.com"])
+    client = StubEmailClient(failing={"a@example.com"})
+    dispatcher = OutboxDispatcher(session_factory, client, retry_backoff_seconds=0)
+    rows = await outbox_rows(session_factory)
+    first = dispatcher._message_id(rows)
+
+    await dispatcher.dispatch_once()
+    client.failing.clear()
+    await dispatcher.dispatch_once()
+    assert client.delivered[0]["Message-ID"] == first
+
+
+async def test_expired_lease_makes_rows_claimable_again(session_factory, agent):
+    await queue_alert(session_factory, agent, ["a@example.com"])
+    crashed = OutboxDispatcher(session_factory, StubEmailClient())
+    assert len(await crashed._claim()) == 1
+    assert await crashed._claim() == []
+
+    async with session_factory() as session:
+        await session.execute(update(OutboxMessage).values(lease_expires_at=utcnow() - datetime.timedelta(seconds=1)))
+        await session.commit()
+    client = StubEmailClient()
+    assert await OutboxDispatcher(session_factory, client).dispatch_once() == 1
+    assert len(client.delivered) == 1
+
+
+async def test_listing_is_alerted_only_once_every_recipient_got_it(session_factory, agent):
+    listing_id = await queue_alert(session_factory, agent, ["a@example.com", "b@example.com"])
+    client = StubEmailClient(failing={"b@example.com"})
+    dispatcher = OutboxDispatcher(session_factory, client, retry_backoff_seconds=0)
+
+    await dispatcher.dispatch_once()
+    async with session_factory() as session:
+        assert (await session.get(Listing, listing_id)).alerted is False
+
+    client.failing.clear()
+    await dispatcher.dispatch_once()
+    async with session_factory() as session:
+        assert (await session.get(Listing, listing_id)).alerted is True
+    assert [row.status for row in await outbox_rows(session_factory)] == ["sent", "sent"]
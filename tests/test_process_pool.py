@@ -0,0 +1,27 @@
+import asyncio
+from src.core import process_pool
+
+
+class StubProvider:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+        if self.fail:
+            raise RuntimeError("browser gone")
+
+
+def test_worker_exit_closes_every_provider(monkeypatch):
+    providers = {"cars_com": StubProvider(fail=True), "marketcheck": StubProvider()}
+    loop = asyncio.new_event_loop()
+    dead = []
+    monkeypatch.setattr(process_pool, "_providers", providers)
+    monkeypatch.setattr(process_pool, "_loop", loop)
+    monkeypatch.setattr(process_pool.metrics, "mark_process_dead", dead.append)
+
+    process_pool._close_worker()
+    assert all(provider.closed for provider in providers.values())
+    assert loop.is_closed()
+    assert len(dead) == 1
@@ -0,0 +1,92 @@
+import asyncio
+import datetime
+import time
+from sqlalchemy import select, update
+from src.core.agent_manager import AgentManager, SourceHealth, _ProgressTracker
+from src.core.run_state import ABANDONED, DEFERRED, DONE, RunLog, SKIPPED
+from src.core.search_plan import SearchTask
+from src.core.search_priority import SearchQueue, SearchStats
+from src.storage.database import Run, RunSearch, SearchStat, utcnow
+
+
+def tasks():
+    return [SearchTask("agent_1", source, {}, vehicle={"make": "BMW", "model": "M3"}) for source in ("cars_com", "carfax", "autonation")]
+
+
+async def test_resume_skips_checkpointed_searches(session_factory):
+    log = RunLog(session_factory)
+    planned = tasks()
+    run = await log.start("agent_1", planned)
+
+    async with session_factory() as session:
+        await log.checkpoint(session, planned[0], listings_found=12, new_listings=[])
+        await session.commit()
+
+    unfinished = await log.find_unfinished("agent_1")
+    assert unfinished.id == run.id
+    resumed = await log.resume(unfinished)
+    assert [task.source for task in resumed] == ["carfax", "autonation"]
+    assert [task.checkpoint_id for task in resumed] == [task.checkpoint_id for task in planned[1:]]
+
+    async with session_factory() as session:
+        assert (await session.get(Run, run.id)).resumed_count == 1
+
+
+async def test_finished_runs_are_not_resumed(session_factory):
+    log = RunLog(session_factory)
+    run = await log.start("agent_1", tasks())
+    await log.finish(run.id)
+    assert await log.find_unfinished("agent_1") is None
+
+
+async def test_old_unfinished_runs_are_abandoned(session_factory):
+    log = RunLog(session_factory, resume_max_age_hours=12)
+    old = await log.start("agent_1", tasks())
+    async with session_factory() as session:
+        started = utcnow() - datetime.timedelta(hours=13)
+        await session.execute(update(Run).where(Run.id == old.id).values(started_at=started))
+        await session.commit()
+
+    assert await log.find_unfinished("agent_1") is None
+    async with session_factory() as session:
+        assert (await session.get(Run, old.id)).status == ABANDONED
+
+
+class EmptyResultsManager(AgentManager):
+    """Runs _run_searches against a real run log, with searches that take a while and find nothing."""
+
+    def __init__(self, session_factory):
+        self.run_log = RunLog(session_factory)
+        self.search_stats = SearchStats(session_factory)
+
+    async def execute_search(self, task):
+        await asyncio.sleep(0.3)
+        return []
+
+    async def ingest(self, agent_cfg, raw, task):
+        await self.run_log.mark([task], DONE)
+        return []
+
+    async def record_search(self, task, new_listings, duration):
+        pass
+
+    async def pause_between_searches(self, task):
+        pass
+
+
+async def test_searches_of_a_blocked_source_are_skipped_at_the_deadline(session_factory, monkeypatch, agent):
+    monkeypatch.setattr(SourceHealth, "EMPTY_STREAK_LIMIT", 1)
+    planned = [SearchTask(agent, source, {}, vehicle={"make": "BMW", "model": model})
+               for source, model in (("cars_com", "M3"), ("carfax", "M3"), ("cars_com", "M5"))]
+    manager = EmptyResultsManager(session_factory)
+    await manager.run_log.start(agent, planned)
+
+    # The first search empties cars_com's streak budget and outlasts the deadline
+    await manager._run_searches(type("Cfg", (), {"id": agent})(), SearchQueue(planned, {}),
+                                time.monotonic() + 0.1, _ProgressTracker(len(planned), None))
+    async with session_factory() as session:
+        rows = (await session.execute(select(RunSearch).order_by(RunSearch.seq))).scalars().all()
+        assert [row.status for row in rows] == [DONE, DEFERRED, SKIPPED]
+        assert rows[2].error == "source looks blocked (1 empty searches in a row)"
+        stat = await session.get(SearchStat, (agent, "carfax", planned[1].vehicle_key))
+        assert stat.deferred_count == 1
@@ -0,0 +1,24 @@
+from src.core.search_plan import SearchTask
+from src.core.search_priority import SearchQueue, within_budget
+from src.storage.database import SearchStat
+
+
+def task(model):
+    return SearchTask("agent_1", "cars_com", {}, vehicle={"make": "BMW", "model": model})
+
+
+def stat(t, yield_ewma, duration):
+    return SearchStat(agent_id="agent_1", source=t.source, vehicle_key=t.vehicle_key, runs=3,
+                      yield_ewma=yield_ewma, duration_ewma=duration, deferred_count=0)
+
+
+def test_queued_run_keeps_the_best_searches_that_fit_the_budget():
+    m3, m5, x5, i4 = task("M3"), task("M5"), task("X5"), task("i4")
+    stats = {(t.source, t.vehicle_key): stat(t, y, d) for t, y, d in ((m3, 0.5, 60), (m5, 2.0, 120), (x5, 0.1, 60))}
+    ordered = list(SearchQueue([m3, m5, x5, i4], stats).drain())
+    assert ordered == [m5, i4, m3, x5]
+
+    # i4 has no history and counts as the mean recorded time (80s)
+    kept, deferred = within_budget(ordered, stats, budget_seconds=300)
+    assert (kept, deferred) == ([m5, i4, m3], [x5])
+    assert within_budget(ordered, stats, budget_seconds=10) == ([m5], [i4, m3, x5])
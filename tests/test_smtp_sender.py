@@ -0,0 +1,34 @@
+import pytest
+from src.notifications import smtp_sender
+from src.notifications.email_client import EmailClient
+
+
+class RecordingSMTP:
+    """Stands in for aiosmtplib.SMTP and records how the session was opened."""
+
+    opened = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.is_connected = False
+
+    async def connect(self):
+        self.is_connected = True
+        self.opened.append(self.kwargs)
+
+
+@pytest.mark.parametrize("port, use_tls, start_tls, implicit_tls", [
+    (587, True, True, False),
+    (465, True, False, True),
+    (25, True, False, False),
+    (587, False, False, False),
+    (465, False, False, False),
+])
+async def test_email_client_tls_setting_reaches_the_session(monkeypatch, port, use_tls, start_tls, implicit_tls):
+    monkeypatch.setattr(smtp_sender.aiosmtplib, "SMTP", RecordingSMTP)
+    RecordingSMTP.opened = []
+    client = EmailClient("smtp.example.com", port, "alerts@example.com", "secret", use_tls=use_tls)
+
+    await client.sender._connect()
+    [opened] = RecordingSMTP.opened
+    assert (opened["start_tls"], opened["use_tls"]) == (start_tls, implicit_tls)
@@ -0,0 +1,25 @@
+from benchmarks.synthetic import SyntheticListingGenerator, default_parameters
+from src.core.filter_engine import FilterEngine
+
+
+def fields(listing):
+    return (listing.external_id, listing.title, listing.price, listing.mileage, listing.year, listing.make, listing.model)
+
+
+def test_the_same_seed_gives_the_same_listings():
+    first = [fields(listing) for listing in SyntheticListingGenerator(seed=3).listings(500)]
+    again = [fields(listing) for listing in SyntheticListingGenerator(seed=3).listings(500)]
+    other = [fields(listing) for listing in SyntheticListingGenerator(seed=4).listings(500)]
+    assert first == again
+    assert first != other
+
+
+def test_the_mix_has_matches_rejections_and_missing_fields():
+    listings = SyntheticListingGenerator(seed=7).listings(2000)
+    params = default_parameters()
+    engine = FilterEngine()
+    passed = sum(engine.evaluate(listing, params)[0] for listing in listings)
+    assert 0 < passed < len(listings)
+    assert any(listing.price is None for listing in listings)
+    assert any(listing.year is None for listing in listings)
+    assert len({listing.source for listing in listings}) > 1
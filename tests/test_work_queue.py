@@ -0,0 +1,124 @@
+import datetime
+import pytest
+from sqlalchemy import update
+from src.core.search_plan import SearchTask
+from src.core.work_queue import DONE, FAILED, LEASED, PENDING, WorkQueue, job_task
+from src.storage.database import Job, utcnow
+from src.utils.config import AgentConfig, AgentParameters
+
+AGENT = AgentConfig(id="agent_1", name="Test Agent", parameters=AgentParameters(), sources=["cars_com"], notifications={})
+
+
+def tasks(count: int):
+    return [SearchTask("agent_1", "cars_com", {}, vehicle={"make": "Porsche", "model": str(i)}) for i in range(count)]
+
+
+async def get_job(session_factory, job_id: int) -> Job:
+    async with session_factory() as session:
+        return await session.get(Job, job_id)
+
+
+async def expire_lease(session_factory, job_id: int):
+    async with session_factory() as session:
+        past = utcnow() - datetime.timedelta(seconds=1)
+        await session.execute(update(Job).where(Job.id == job_id).values(lease_expires_at=past))
+        await session.commit()
+
+
+async def make_available(session_factory, job_id: int):
+    async with session_factory() as session:
+        past = utcnow() - datetime.timedelta(seconds=1)
+        await session.execute(update(Job).where(Job.id == job_id).values(available_at=past))
+        await session.commit()
+
+
+@pytest.fixture
+async def queue(session_factory):
+    return WorkQueue(session_factory, lease_seconds=300, max_attempts=2, retry_backoff_seconds=30)
+
+
+async def test_claims_jobs_in_order_once_each(queue):
+    assert await queue.enqueue_agent(AGENT, tasks(2)) == 2
+    # A run that is still queued is not queued again
+    assert await queue.enqueue_agent(AGENT, tasks(2)) == 0
+
+    first = await queue.claim("w1")
+    second = await queue.claim("w2")
+    assert job_task(first).vehicle_key == "Porsche|0||"
+    assert job_task(second).vehicle_key == "Porsche|1||"
+    assert (first.status, first.lease_owner, first.attempts) == (LEASED, "w1", 1)
+    assert await queue.claim("w3") is None
+    assert await queue.pending_count("agent_1") == 2
+
+    assert await queue.complete(first.id, "w1", listings_found=10, new_listings=2)
+    assert (await get_job(queue.session_factory, first.id)).status == DONE
+    assert await queue.pending_count("agent_1") == 1
+
+
+async def test_expired_lease_moves_the_job_to_another_worker(queue):
+    await queue.enqueue_agent(AGENT, tasks(1))
+    job = await queue.claim("w1")
+    assert await queue.heartbeat(job.id, "w1")
+
+    await expire_lease(queue.session_factory, job.id)
+    retaken = await queue.claim("w2")
+    assert (retaken.id, retaken.lease_owner, retaken.attempts) == (job.id, "w2", 2)
+
+    # The first worker finds out it lost the job and cannot finish it
+    assert not await queue.heartbeat(job.id, "w1")
+    assert not await queue.complete(job.id, "w1")
+    assert await queue.complete(job.id, "w2")
+
+
+async def test_expired_lease_on_the_last_attempt_is_reaped(queue):
+    await queue.enqueue_agent(AGENT, tasks(1))
+    job = await queue.claim("w1")
+    await expire_lease(queue.session_factory, job.id)
+    await queue.claim("w2")
+    await expire_lease(queue.session_factory, job.id)
+
+    assert await queue.claim("w3") is None
+    assert await queue.reap() == 1
+    job = await get_job(queue.session_factory, job.id)
+    assert (job.status, job.last_error) == (FAILED, "lease expired")
+
+
+async def test_failed_job_backs_off_then_fails_for_good(queue):
+    await queue.enqueue_agent(AGENT, tasks(1))
+    job = await queue.claim("w1")
+    before = utcnow()
+    await queue.fail(job.id, "w1", "timeout")
+
+    job = await get_job(queue.session_factory, job.id)
+    assert (job.status, job.last_error, job.lease_expires_at) == (PENDING, "timeout", None)
+    assert before + datetime.timedelta(seconds=29) <= job.available_at <= utcnow() + datetime.timedelta(seconds=30)
+    assert await queue.claim("w1") is None
+
+    await make_available(queue.session_factory, job.id)
+    job = await queue.claim("w1")
+    await queue.fail(job.id, "w1", "timeout again")
+    job = await get_job(queue.session_factory, job.id)
+    assert (job.status, job.attempts, job.last_error) == (FAILED, 2, "timeout again")
+    assert job.finished_at is not None
+
+
+async def test_fail_from_a_worker_that_lost_the_lease_is_ignored(queue):
+    await queue.enqueue_agent(AGENT, tasks(1))
+    job = await queue.claim("w1")
+    await expire_lease(queue.session_factory, job.id)
+    await queue.claim("w2")
+
+    await queue.fail(job.id, "w1", "stale")
+    job = await get_job(queue.session_factory, job.id)
+    assert (job.status, job.lease_owner, job.last_error) == (LEASED, "w2", None)
+
+
+async def test_deferred_job_keeps_its_attempt(queue):
+    await queue.enqueue_agent(AGENT, tasks(1))
+    job = await queue.claim("w1")
+    await queue.defer(job.id, "w1", 600)
+
+    job = await get_job(queue.session_factory, job.id)
+    assert (job.status, job.attempts) == (PENDING, 0)
+    assert job.available_at > utcnow() + datetime.timedelta(seconds=590)
+    assert await queue.claim("w1") is None
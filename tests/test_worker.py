@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+from src.core.search_plan import SearchTask
+from src.worker import QueueWorker
+
+TASK = SearchTask("agent_1", "cars_com", {}, vehicle={"make": "Porsche", "model": "911"})
+
+
+class StubQueue:
+    """Hands out one job; reap and heartbeat fail as many times as asked."""
+
+    lease_seconds = 3
+
+    def __init__(self, reap_errors=0, heartbeat_errors=0):
+        self.reap_errors = reap_errors
+        self.heartbeat_errors = heartbeat_errors
+        self.jobs = [SimpleNamespace(id=1, attempts=1, query_json=TASK.to_dict())]
+        self.heartbeats = 0
+        self.completed = []
+
+    async def claim(self, worker_id):
+        # The job shows up after the first empty polls
+        if self.reap_errors:
+            return None
+        return self.jobs.pop() if self.jobs else None
+
+    async def reap(self):
+        if self.reap_errors:
+            self.reap_errors -= 1
+            raise ConnectionError("db down")
+        return 0
+
+    async def heartbeat(self, job_id, worker_id):
+        self.heartbeats += 1
+        if self.heartbeat_errors:
+            self.heartbeat_errors -= 1
+            raise ConnectionError("db down")
+        return True
+
+    async def complete(self, job_id, worker_id, listings_found=0, new_listings=0):
+        self.completed.append((job_id, listings_found))
+        return True
+
+
+class StubManager:
+    providers = {"cars_com": object()}
+    search_seconds = 0.0
+
+    async def load_agent(self, agent_id):
+        return SimpleNamespace(id=agent_id)
+
+    async def execute_search(self, task):
+        await asyncio.sleep(self.search_seconds)
+        return [object()] * 3
+
+    async def ingest(self, agent_cfg, raw):
+        return []
+
+    async def record_search(self, task, new, seconds):
+        pass
+
+    def notify(self, agent_cfg, new):
+        pass
+
+    async def pause_between_searches(self, task):
+        pass
+
+
+async def run_until_completed(worker, queue, timeout=5.0):
+    running = asyncio.create_task(worker.run())
+    try:
+        async with asyncio.timeout(timeout):
+            while not queue.completed:
+                assert not running.done(), running.exception()
+                await asyncio.sleep(0.01)
+    finally:
+        worker.stop()
+        await running
+
+
+async def test_loop_survives_failing_db_calls():
+    queue = StubQueue(reap_errors=2)
+    worker = QueueWorker(StubManager(), queue, "w", poll_interval=0.01)
+    await run_until_completed(worker, queue)
+    assert queue.completed == [(1, 3)]
+
+
+async def test_failed_heartbeat_is_retried_instead_of_cancelling_the_job():
+    manager = StubManager()
+    manager.search_seconds = 2.5
+    queue = StubQueue(heartbeat_errors=1)
+    worker = QueueWorker(manager, queue, "w", poll_interval=0.01)
+    await run_until_completed(worker, queue)
+    assert queue.completed == [(1, 3)]
+    # The failed heartbeat, its retry, and the check before storing the results
+    assert queue.heartbeats == 3